@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from .models import AuthToken
+
+
+@admin.register(AuthToken)
+class AuthTokenAdmin(admin.ModelAdmin):
+    list_display = ('user', 'created', 'expires')
+    list_select_related = ('user',)
+    search_fields = ('user__username',)
+    readonly_fields = ('digest', 'user', 'created')
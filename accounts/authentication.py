@@ -0,0 +1,107 @@
+"""
+Token authentication with an in-process cache of verified tokens.
+
+A request presenting `Authorization: Token <key>` costs one SHA-256 and a
+dictionary lookup once its token has been verified. The database is only
+consulted on a cache miss, at most every AUTH_TOKEN_CACHE_TTL seconds per
+token and process. A revoked token is evicted at once in the process that
+revoked it; other processes stop accepting it within that TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+from .models import AuthToken
+
+
+class TokenCache:
+    """Thread-safe LRU of verified tokens keyed by digest, each trusted for a TTL."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, digest):
+        with self.lock:
+            entry = self.entries.get(digest)
+            if entry is None:
+                return None
+            token, trusted_until = entry
+            if trusted_until <= time.monotonic():
+                del self.entries[digest]
+                return None
+            self.entries.move_to_end(digest)
+            return token
+
+    def set(self, token):
+        ttl = getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 60)
+        max_size = getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', 10000)
+        with self.lock:
+            self.entries[token.digest] = (token, time.monotonic() + ttl)
+            self.entries.move_to_end(token.digest)
+            while len(self.entries) > max_size:
+                self.entries.popitem(last=False)
+
+    def evict(self, digest):
+        with self.lock:
+            self.entries.pop(digest, None)
+
+    def evict_user(self, user_id):
+        with self.lock:
+            for digest in [d for d, (token, _) in self.entries.items() if token.user_id == user_id]:
+                del self.entries[digest]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+token_cache = TokenCache()
+
+
+def revoke_token(token):
+    AuthToken.objects.filter(digest=token.digest).delete()
+    token_cache.evict(token.digest)
+
+
+def revoke_user_tokens(user):
+    AuthToken.objects.filter(user=user).delete()
+    token_cache.evict_user(user.pk)
+
+
+class TokenAuthentication(BaseAuthentication):
+    """Authenticate `Authorization: Token <key>` headers against AuthToken."""
+    keyword = 'Token'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed("Invalid token header.")
+        try:
+            key = auth[1].decode('ascii')
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed("Invalid token header.")
+        return self.authenticate_credentials(key)
+
+    def authenticate_credentials(self, key):
+        digest = AuthToken.hash_key(key)
+        token = token_cache.get(digest)
+        if token is None:
+            token = AuthToken.objects.select_related('user').filter(digest=digest).first()
+            if token is None or not token.user.is_active:
+                raise exceptions.AuthenticationFailed("Invalid or expired token.")
+            token_cache.set(token)
+        if token.is_expired():
+            token_cache.evict(digest)
+            raise exceptions.AuthenticationFailed("Invalid or expired token.")
+        return token.user, token
+
+    def authenticate_header(self, request):
+        return self.keyword
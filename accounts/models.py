@@ -0,0 +1,50 @@
+import hashlib
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class AuthTokenQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(expires__gt=timezone.now())
+
+    def issue(self, user):
+        """
+        Create a token for `user`; return it with its key.
+
+        Only a digest of the key is stored, so the key is available here
+        and nowhere else. The user's expired tokens are removed on the way.
+        """
+        now = timezone.now()
+        self.filter(user=user, expires__lte=now).delete()
+        key = secrets.token_urlsafe(32)
+        lifetime = timedelta(seconds=getattr(settings, 'AUTH_TOKEN_TTL', 86400))
+        token = self.create(digest=AuthToken.hash_key(key), user=user, expires=now + lifetime)
+        return token, key
+
+
+class AuthToken(models.Model):
+    digest = models.CharField(max_length=64, primary_key=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='auth_tokens')
+    created = models.DateTimeField(auto_now_add=True)
+    expires = models.DateTimeField()
+
+    objects = AuthTokenQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Auth Token"
+        verbose_name_plural = "Auth Tokens"
+
+    def __str__(self):
+        return f"Token for {self.user} (expires {self.expires:%Y-%m-%d %H:%M})"
+
+    @staticmethod
+    def hash_key(key):
+        # Keys carry 256 random bits, so a fast unsalted hash is enough
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def is_expired(self):
+        return self.expires <= timezone.now()
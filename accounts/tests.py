@@ -0,0 +1,129 @@
+import base64
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from accounts.authentication import token_cache
+from accounts.models import AuthToken
+from cart.models import CartItem
+from products.models import Product
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class TokenAuthTests(APITestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.user = User.objects.create_user(username="shopper", password="shopper-pass")
+        product = Product.objects.create(
+            name="Token Product",
+            category="Test Category",
+            price=10.00,
+            image_thumbnail="http://example.com/thumbnail.jpg",
+            image_mobile="http://example.com/mobile.jpg",
+            image_tablet="http://example.com/tablet.jpg",
+            image_desktop="http://example.com/desktop.jpg",
+            stock=10,
+        )
+        self.cart_item = CartItem.objects.create(user=self.user, product=product, quantity=1)
+
+    def basic(self, password="shopper-pass"):
+        credentials = base64.b64encode(f"shopper:{password}".encode()).decode()
+        return {'HTTP_AUTHORIZATION': f"Basic {credentials}"}
+
+    def token(self, key):
+        return {'HTTP_AUTHORIZATION': f"Token {key}"}
+
+    def issue(self):
+        response = self.client.post('/api/auth/token/', **self.basic())
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['token']
+
+    def detail(self, key):
+        return self.client.get(f'/api/cart/cart/{self.cart_item.pk}/', **self.token(key))
+
+    def test_issue_requires_valid_password(self):
+        response = self.client.post('/api/auth/token/', **self.basic("wrong"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(AuthToken.objects.exists())
+
+    def test_token_authenticates_and_only_its_digest_is_stored(self):
+        key = self.issue()
+        self.assertEqual(self.detail(key).status_code, status.HTTP_200_OK)
+        self.assertFalse(AuthToken.objects.filter(digest=key).exists())
+        self.assertEqual(self.detail("not-a-token").status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_basic_auth_is_only_accepted_for_issuing(self):
+        response = self.client.post('/api/cart/checkout/', **self.basic())
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+
+    def test_verified_tokens_skip_the_database(self):
+        key = self.issue()
+        self.detail(key)
+        with self.assertNumQueries(1):  # The cart item itself
+            self.assertEqual(self.detail(key).status_code, status.HTTP_200_OK)
+
+    @override_settings(AUTH_TOKEN_CACHE_TTL=0)
+    def test_cache_entries_expire(self):
+        key = self.issue()
+        self.detail(key)
+        with self.assertNumQueries(2):
+            self.detail(key)
+
+    def test_expired_token_is_rejected(self):
+        key = self.issue()
+        self.detail(key)
+        AuthToken.objects.update(expires=timezone.now() - timedelta(seconds=1))
+        token_cache.clear()
+        self.assertEqual(self.detail(key).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_replaces_the_token(self):
+        old = self.issue()
+        response = self.client.post('/api/auth/token/refresh/', **self.token(old))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        new = response.data['token']
+        self.assertNotEqual(new, old)
+        self.assertEqual(self.detail(old).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.detail(new).status_code, status.HTTP_200_OK)
+
+    def test_refresh_and_revoke_need_the_token_itself(self):
+        response = self.client.post('/api/auth/token/refresh/', **self.basic())
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post('/api/auth/token/revoke/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_revoke_evicts_cached_token(self):
+        key = self.issue()
+        other = self.issue()
+        self.detail(key)
+        response = self.client.post('/api/auth/token/revoke/', **self.token(key))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.detail(key).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.detail(other).status_code, status.HTTP_200_OK)
+
+    def test_revoke_all(self):
+        keys = [self.issue(), self.issue()]
+        for key in keys:
+            self.detail(key)
+        response = self.client.post('/api/auth/token/revoke/', {'all': True}, format='json', **self.token(keys[0]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(AuthToken.objects.exists())
+        for key in keys:
+            self.assertEqual(self.detail(key).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_issuing_a_token_claims_the_session_cart(self):
+        response = self.client.post('/api/cart/', {'product_id': self.cart_item.product_id, 'quantity': 2})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.issue()
+        self.assertEqual(list(CartItem.objects.values_list('user', 'quantity')), [(self.user.pk, 3)])
+
+    def test_inactive_user_is_rejected(self):
+        key = self.issue()
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.detail(key).status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import TokenIssueView, TokenRefreshView, TokenRevokeView
+
+urlpatterns = [
+    path('token/', TokenIssueView.as_view(), name='token-issue'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
+    path('token/revoke/', TokenRevokeView.as_view(), name='token-revoke'),
+]
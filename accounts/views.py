@@ -0,0 +1,65 @@
+from django.db import transaction
+from rest_framework import permissions, status
+from rest_framework.authentication import BasicAuthentication, SessionAuthentication
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from cart.owners import claim_session_cart
+from .authentication import TokenAuthentication, revoke_token, revoke_user_tokens
+from .models import AuthToken
+
+
+def token_response(token, key, status_code):
+    return Response({"token": key, "expires": token.expires}, status=status_code)
+
+
+# Exchange a Password (or Session) for a Token
+class TokenIssueView(APIView):
+    authentication_classes = [BasicAuthentication, SessionAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'auth'
+    throttle_by_ip = True
+
+    def perform_authentication(self, request):
+        # Throttle before the password hash is checked, so failed guesses count too
+        super().check_throttles(request)
+        super().perform_authentication(request)
+
+    def check_throttles(self, request):
+        pass  # Already checked in perform_authentication()
+
+    def post(self, request, *args, **kwargs):
+        token, key = AuthToken.objects.issue(request.user)
+        # A visitor who shopped anonymously keeps their cart
+        claim_session_cart(request, request.user)
+        return token_response(token, key, status.HTTP_201_CREATED)
+
+
+class TokenView(APIView):
+    """Base for endpoints that act on the token the request was made with."""
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if not isinstance(request.auth, AuthToken):
+            self.permission_denied(request, message="Authenticate with the token itself.")
+
+
+# Replace the Current Token with a Fresh One
+class TokenRefreshView(TokenView):
+    def post(self, request, *args, **kwargs):
+        with transaction.atomic():
+            revoke_token(request.auth)
+            token, key = AuthToken.objects.issue(request.user)
+        return token_response(token, key, status.HTTP_201_CREATED)
+
+
+# Revoke the Current Token, or All of the User's Tokens
+class TokenRevokeView(TokenView):
+    def post(self, request, *args, **kwargs):
+        if request.data.get('all') in (True, 'true', '1'):
+            revoke_user_tokens(request.user)
+        else:
+            revoke_token(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,21 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from cart.models import CartItem
+from cart.owners import LEGACY_SESSION_KEY
+
+
+class Command(BaseCommand):
+    help = "Move the cart lines created before carts had owners into a user's cart."
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help="User who receives the lines.")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(**{User.USERNAME_FIELD: options['username']})
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}.")
+        merged = CartItem.objects.merge_session_cart(LEGACY_SESSION_KEY, user)
+        self.stdout.write(self.style.SUCCESS(f"Moved {merged} cart lines to {user}."))
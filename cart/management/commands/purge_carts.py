@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from cart.models import CartItem
+from cart.purge import purge_expired_carts
+
+
+class Command(BaseCommand):
+    help = "Delete cart lines not touched for CART_EXPIRY seconds, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.CART_PURGE_BATCH_SIZE,
+            help="Rows deleted per transaction (default: CART_PURGE_BATCH_SIZE).",
+        )
+        parser.add_argument(
+            '--pause', type=float, default=settings.CART_PURGE_PAUSE,
+            help="Seconds to wait between batches (default: CART_PURGE_PAUSE).",
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Only count the expired lines.")
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = CartItem.objects.expired().count()
+            self.stdout.write(f"{count} expired cart lines.")
+            return
+
+        rows = batches = 0
+        longest = 0.0
+        for deleted, held in purge_expired_carts(options['batch_size'], options['pause']):
+            rows += deleted
+            batches += 1
+            longest = max(longest, held)
+            self.stdout.write(f"Batch {batches}: purged {deleted} lines, lock held {held * 1000:.1f} ms")
+        self.stdout.write(self.style.SUCCESS(
+            f"Purged {rows} expired cart lines in {batches} batches (longest lock hold {longest * 1000:.1f} ms)."
+        ))
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.3 on 2026-10-18 17:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0001_initial'),
+        ('products', '0002_alter_product_options_product_description_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='cartitem',
+            options={'verbose_name': 'Cart Item', 'verbose_name_plural': 'Cart Items'},
+        ),
+        migrations.AlterField(
+            model_name='cartitem',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_items', to='products.product'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Lines created before carts had owners are kept in one anonymous cart under
+# this key; `manage.py claim_legacy_cart <username>` moves them to a user.
+LEGACY_SESSION_KEY = 'legacy'
+
+
+def assign_legacy_owner(apps, schema_editor):
+    CartItem = apps.get_model('cart', 'CartItem')
+    ownerless = CartItem.objects.filter(user__isnull=True, session_key__isnull=True)
+    # Fold duplicate lines for a product into one before the unique constraint exists
+    kept = {}
+    duplicates = []
+    for item in ownerless.order_by('id'):
+        line = kept.get(item.product_id)
+        if line is None:
+            kept[item.product_id] = item
+        else:
+            line.quantity += item.quantity
+            duplicates.append(item.pk)
+    CartItem.objects.bulk_update(kept.values(), ['quantity'])
+    CartItem.objects.filter(pk__in=duplicates).delete()
+    ownerless.update(session_key=LEGACY_SESSION_KEY)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0003_order_orderline_and_more'),
+        ('products', '0004_product_fts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cartitem',
+            name='session_key',
+            field=models.CharField(blank=True, max_length=40, null=True),
+        ),
+        migrations.AddField(
+            model_name='cartitem',
+            name='user',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='cart_items', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(assign_legacy_owner, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('user', 'product'), name='cartitem_user_product_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('session_key', 'product'), name='cartitem_session_product_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.CheckConstraint(condition=models.Q(('user__isnull', False), ('session_key__isnull', False), _connector='OR'), name='cartitem_has_owner'),
+        ),
+    ]
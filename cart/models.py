@@ -1,14 +1,348 @@
-from django.db import models
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import Case, Count, F, Max, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from products.cache import invalidate_catalogue
 from products.models import Product
 
 
+class InsufficientStock(Exception):
+    """Raised when a cart change would exceed the product's available stock."""
+
+    def __init__(self, message, product_ids=()):
+        super().__init__(message)
+        self.product_ids = list(product_ids)
+
+
+class EmptyCart(Exception):
+    """Raised when checking out a cart without items."""
+
+
+class CartItemQuerySet(models.QuerySet):
+    def line_total_expression(self):
+        return models.ExpressionWrapper(
+            F('quantity') * F('product__price'),
+            output_field=models.DecimalField(max_digits=20, decimal_places=2),
+        )
+
+    def with_totals(self):
+        """Fetch each line's product in the same query and annotate `line_total`."""
+        return self.select_related('product').annotate(line_total=self.line_total_expression())
+
+    def summary_aggregates(self):
+        decimal = models.DecimalField(max_digits=20, decimal_places=2)
+        return {
+            'item_count': Count('id'),
+            'total_quantity': Coalesce(Sum('quantity'), 0),
+            'total_price': Coalesce(Sum(self.line_total_expression()), 0, output_field=decimal),
+        }
+
+    def summary(self):
+        """Return item count, quantity sum and grand total in one aggregate query."""
+        return self.aggregate(**self.summary_aggregates())
+
+    async def asummary(self):
+        return await self.aaggregate(**self.summary_aggregates())
+
+    def version_aggregates(self):
+        return {
+            'count': Count('id'),
+            'quantity': Coalesce(Sum('quantity'), 0),
+            'updated': Max('updated'),
+            'product_updated': Max('product__updated'),
+        }
+
+    def version(self):
+        """
+        Return a value that changes whenever the selected lines or their products do.
+
+        Line count, total quantity and the latest line and product changes:
+        every write touches a line (raising the latest change) or deletes one
+        (lowering the count), so a cart never returns to an earlier version.
+        """
+        return cart_version_of(self.aggregate(**self.version_aggregates()))
+
+    async def aversion(self):
+        return cart_version_of(await self.aaggregate(**self.version_aggregates()))
+
+    def expired(self, now=None):
+        """Lines not touched for CART_EXPIRY seconds."""
+        now = now or timezone.now()
+        return self.filter(updated__lt=now - timedelta(seconds=settings.CART_EXPIRY))
+
+    def purge_batches(self, batch_size, pause=0):
+        """
+        Delete the selected lines, at most `batch_size` per transaction.
+
+        Yields (rows deleted, seconds the transaction held the write lock)
+        after each batch. Sleeping `pause` seconds between batches gives
+        writers that queued behind the lock a chance to take it.
+        """
+        while True:
+            started = time.perf_counter()
+            with transaction.atomic():
+                ids = list(self.order_by().values_list('pk', flat=True)[:batch_size])
+                deleted = self.filter(pk__in=ids).delete()[0] if ids else 0
+            held = time.perf_counter() - started
+            if not ids:
+                return
+            yield deleted, held
+            if len(ids) < batch_size:
+                return
+            if pause:
+                time.sleep(pause)
+
+    def add_product(self, owner, product, quantity):
+        """
+        Add `quantity` of `product` to `owner`'s cart as one transaction.
+
+        The stock check happens inside a conditional UPDATE, so concurrent
+        adds can never push a line past the product's stock. On backends with
+        row locks the product row is locked first; on SQLite the UPDATE is
+        the first statement, which takes the write lock straight away.
+        Returns the cart item and whether it was created.
+        """
+        with transaction.atomic():
+            if connection.features.has_select_for_update:
+                Product.objects.select_for_update().only('pk').get(pk=product.pk)
+
+            updated = self.filter(
+                **owner,
+                product=product,
+                product__stock__gte=F('quantity') + quantity,
+            ).update(quantity=F('quantity') + quantity, updated=timezone.now())
+            if updated:
+                return self.with_totals().get(**owner, product=product), False
+
+            stock = Product.objects.values_list('stock', flat=True).get(pk=product.pk)
+            if quantity > stock:
+                raise InsufficientStock("Requested quantity exceeds available stock.")
+            if self.filter(**owner, product=product).exists():
+                raise InsufficientStock("Total quantity exceeds available stock.")
+            return self.create(**owner, product=product, quantity=quantity), True
+
+    def set_quantity(self, cart_item, quantity):
+        """Set a line's quantity with a single conditional UPDATE against current stock."""
+        updated = self.filter(
+            pk=cart_item.pk,
+            product__stock__gte=quantity,
+        ).update(quantity=quantity, updated=timezone.now())
+        if not updated:
+            raise InsufficientStock("Requested quantity exceeds available stock.")
+        cart_item.quantity = quantity
+        cart_item.line_total = cart_item.get_total_price()
+        return cart_item
+
+    def apply_batch(self, owner, operations):
+        """
+        Apply a list of validated add/set/remove operations to `owner`'s cart in one transaction.
+
+        Products and existing lines are loaded with one query each, changes
+        are applied in memory in order, and written back with one bulk_create,
+        one bulk_update and one delete. Returns one result dict per operation;
+        rejected operations leave the cart untouched.
+        """
+        product_ids = {operation['product_id'] for operation in operations}
+        results = []
+
+        with transaction.atomic():
+            products = Product.objects.filter(id__in=product_ids).only('id', 'stock')
+            if connection.features.has_select_for_update:
+                products = products.select_for_update()
+            stock = {product.id: product.stock for product in products}
+            lines = {item.product_id: item for item in self.filter(**owner, product_id__in=stock)}
+            existing = dict(lines)
+            changed = set()
+
+            for index, operation in enumerate(operations):
+                op, product_id = operation['op'], operation['product_id']
+                result = {'index': index, 'op': op, 'product_id': product_id}
+                results.append(result)
+                if product_id not in stock:
+                    result.update(status='error', error="Product not found")
+                    continue
+
+                item = lines.get(product_id)
+                if op == 'remove':
+                    if item is None:
+                        result.update(status='error', error="Cart item not found.")
+                        continue
+                    del lines[product_id]
+                    result.update(status='ok', quantity=0)
+                    continue
+
+                quantity = operation.get('quantity', 1)
+                current = item.quantity if item is not None else 0
+                new_quantity = current + quantity if op == 'add' else quantity
+                if quantity > stock[product_id]:
+                    result.update(status='error', error="Requested quantity exceeds available stock.")
+                    continue
+                if new_quantity > stock[product_id]:
+                    result.update(status='error', error="Total quantity exceeds available stock.")
+                    continue
+
+                if item is None:
+                    # Reuse the stored line if an earlier operation removed it
+                    item = existing.get(product_id) or self.model(**owner, product_id=product_id)
+                    lines[product_id] = item
+                item.quantity = new_quantity
+                item.updated = timezone.now()
+                changed.add(product_id)
+                result.update(status='ok', quantity=new_quantity)
+
+            to_create = [item for item in lines.values() if item.pk is None]
+            to_update = [item for product_id, item in lines.items() if item.pk is not None and product_id in changed]
+            to_delete = [item.pk for product_id, item in existing.items() if product_id not in lines]
+            if to_create:
+                self.bulk_create(to_create)
+            if to_update:
+                self.bulk_update(to_update, ['quantity', 'updated'])
+            if to_delete:
+                self.filter(pk__in=to_delete).delete()
+
+        return results
+
+    def checkout(self, user, idempotency_key=None):
+        """
+        Turn `user`'s cart into an Order in one transaction; return (order, created).
+
+        Stock for every line is checked and decremented by a single
+        conditional UPDATE, line prices are copied onto the order, and the
+        cart is emptied. If `user` already placed an order with
+        `idempotency_key`, that order is returned instead and nothing changes.
+        """
+        def previous_order():
+            if idempotency_key:
+                return Order.objects.filter(user=user, idempotency_key=idempotency_key).first()
+
+        try:
+            with transaction.atomic():
+                order = previous_order()
+                if order is not None:
+                    return order, False
+
+                items = self.filter(user=user).select_related('product')
+                if connection.features.has_select_for_update:
+                    items = items.select_for_update(of=('self',))
+                items = list(items)
+                if not items:
+                    raise EmptyCart("Cart is empty.")
+
+                quantities = {item.product_id: item.quantity for item in items}
+                needed = Case(
+                    *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()],
+                    output_field=models.PositiveIntegerField(),
+                )
+                updated = Product.objects.filter(pk__in=quantities, stock__gte=needed).update(
+                    stock=F('stock') - needed, updated=timezone.now(),
+                )
+                if updated != len(quantities):
+                    short = Product.objects.filter(pk__in=quantities, stock__lt=needed).values_list('pk', flat=True)
+                    raise InsufficientStock("Requested quantity exceeds available stock.", sorted(short))
+
+                order = Order.objects.create(
+                    user=user,
+                    idempotency_key=idempotency_key or None,
+                    total=sum(item.quantity * item.product.price for item in items),
+                )
+                OrderLine.objects.bulk_create(
+                    OrderLine(
+                        order=order,
+                        product_id=item.product_id,
+                        product_name=item.product.name,
+                        unit_price=item.product.price,
+                        quantity=item.quantity,
+                    )
+                    for item in items
+                )
+                self.filter(pk__in=[item.pk for item in items]).delete()
+                invalidate_catalogue()  # Stock is part of cached listings
+        except (EmptyCart, IntegrityError):
+            # A concurrent retry with the same key may have committed first,
+            # emptying the cart or taking the key
+            order = previous_order()
+            if order is None:
+                raise
+            return order, False
+        return order, True
+
+    def merge_session_cart(self, session_key, user):
+        """
+        Move the anonymous cart stored under `session_key` into `user`'s cart.
+
+        Lines for products the user already has are added to the user's line,
+        up to the product's stock; the others change owner in one UPDATE.
+        Returns the number of merged lines.
+        """
+        with transaction.atomic():
+            lines = list(self.filter(session_key=session_key).select_related('product'))
+            if not lines:
+                return 0
+            existing = {
+                item.product_id: item
+                for item in self.filter(user=user, product_id__in=[line.product_id for line in lines])
+            }
+            now = timezone.now()
+            combined = []
+            for line in lines:
+                item = existing.get(line.product_id)
+                if item is not None:
+                    item.quantity = max(item.quantity, min(item.quantity + line.quantity, line.product.stock))
+                    item.updated = now
+                    combined.append(item)
+            if combined:
+                self.bulk_update(combined, ['quantity', 'updated'])
+                self.filter(session_key=session_key, product_id__in=list(existing)).delete()
+            self.filter(session_key=session_key).update(user=user, session_key=None, updated=now)
+        return len(lines)
+
+
+def cart_version_of(totals):
+    return (totals['count'], totals['quantity'], totals['updated'], totals['product_updated'])
+
+
+def cart_version(lines):
+    """CartItemQuerySet.version() of lines already loaded with their products."""
+    return cart_version_of({
+        'count': len(lines),
+        'quantity': sum(line.quantity for line in lines),
+        'updated': max((line.updated for line in lines), default=None),
+        'product_updated': max((line.product.updated for line in lines), default=None),
+    })
+
+
 class CartItem(models.Model):
+    """A line in the cart of a user or, for anonymous visitors, of a session."""
+    # The unique constraints below index (owner, product), which also serves
+    # lookups by owner alone
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True,
+        related_name='cart_items', db_index=False,
+    )
+    session_key = models.CharField(max_length=40, null=True, blank=True)
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='cart_items')
     quantity = models.PositiveIntegerField(default=1)
+    created = models.DateTimeField(auto_now_add=True)
+    # Last change; lines untouched for CART_EXPIRY seconds are purged
+    updated = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = CartItemQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Cart Item"
         verbose_name_plural = "Cart Items"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product'], name='cartitem_user_product_unique'),
+            models.UniqueConstraint(fields=['session_key', 'product'], name='cartitem_session_product_unique'),
+            models.CheckConstraint(
+                condition=models.Q(user__isnull=False) | models.Q(session_key__isnull=False),
+                name='cartitem_has_owner',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.quantity} x {self.product.name}"
@@ -16,3 +350,41 @@ class CartItem(models.Model):
     def get_total_price(self):
         """Calculate the total price for this cart item."""
         return self.quantity * self.product.price
+
+
+class Order(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='orders')
+    idempotency_key = models.CharField(max_length=255, null=True, blank=True)
+    total = models.DecimalField(max_digits=20, decimal_places=2)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Order"
+        verbose_name_plural = "Orders"
+        ordering = ['-created', '-id']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='order_user_idempotency_key_unique'),
+        ]
+
+    def __str__(self):
+        return f"Order {self.pk} ({self.total})"
+
+
+class OrderLine(models.Model):
+    """An ordered product, with its name and price as they were at checkout."""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='lines')
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, related_name='order_lines')
+    product_name = models.CharField(max_length=255)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    quantity = models.PositiveIntegerField()
+
+    class Meta:
+        verbose_name = "Order Line"
+        verbose_name_plural = "Order Lines"
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_name}"
+
+    @property
+    def line_total(self):
+        return self.quantity * self.unit_price
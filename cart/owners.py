@@ -0,0 +1,47 @@
+"""
+Which cart a request works on.
+
+Authenticated requests use the user's cart. Anonymous visitors get a cart
+keyed by a random value kept in their session (not the session key itself,
+which Django rotates on login), and that cart is merged into the user's
+when they log in or exchange their session for an API token.
+"""
+import secrets
+
+from rest_framework.exceptions import NotAuthenticated
+
+from .models import CartItem
+
+SESSION_CART_KEY = 'cart_key'
+
+# Cart holding the lines created before carts had owners (see migration 0004)
+LEGACY_SESSION_KEY = 'legacy'
+
+
+def get_cart_owner(request, create=False):
+    """
+    Return the CartItem filter selecting the request's cart, e.g. {'user': user}.
+
+    Returns None for an anonymous visitor without a cart, unless `create`,
+    which starts one. Anonymous requests without a session cannot keep a
+    cart, so `create` raises NotAuthenticated for them.
+    """
+    if request.user.is_authenticated:
+        return {'user': request.user}
+    session = getattr(request, 'session', None)
+    if session is None:
+        if create:
+            raise NotAuthenticated()
+        return None
+    key = session.get(SESSION_CART_KEY)
+    if key is None and create:
+        key = session[SESSION_CART_KEY] = secrets.token_urlsafe(24)
+    return {'session_key': key} if key else None
+
+
+def claim_session_cart(request, user):
+    """Merge the anonymous cart of the request's session into `user`'s cart."""
+    session = getattr(request, 'session', None)
+    key = session.pop(SESSION_CART_KEY, None) if session is not None else None
+    if key:
+        CartItem.objects.merge_session_cart(key, user)
@@ -0,0 +1,88 @@
+"""
+Removal of abandoned cart lines.
+
+Lines untouched for CART_EXPIRY seconds are deleted in batches of
+CART_PURGE_BATCH_SIZE rows, one transaction each, so the purge never holds
+SQLite's write lock for longer than one small DELETE. Run it from cron with
+`manage.py purge_carts`, or set CART_PURGE_INTERVAL to have each server
+process run it in a background thread.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from .models import CartItem
+
+logger = logging.getLogger(__name__)
+
+
+def purge_expired_carts(batch_size=None, pause=None):
+    """Delete expired cart lines; yield (rows deleted, seconds holding the lock) per batch."""
+    batch_size = batch_size or settings.CART_PURGE_BATCH_SIZE
+    pause = settings.CART_PURGE_PAUSE if pause is None else pause
+    return CartItem.objects.expired().purge_batches(batch_size, pause)
+
+
+class PurgeScheduler(threading.Thread):
+    """Daemon thread that purges expired cart lines every `interval` seconds."""
+
+    def __init__(self, interval):
+        super().__init__(name='cart-purge', daemon=True)
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.purge()
+            except Exception:
+                logger.exception("Cart purge failed")
+            finally:
+                # The thread's connection would otherwise stay open between runs
+                connection.close()
+
+    def purge(self):
+        close_old_connections()
+        rows = batches = 0
+        longest = 0.0
+        for deleted, held in purge_expired_carts():
+            rows += deleted
+            batches += 1
+            longest = max(longest, held)
+        if rows:
+            logger.info(
+                "Purged %d expired cart lines in %d batches (longest lock hold %.1f ms)",
+                rows, batches, longest * 1000,
+            )
+
+    def stop(self):
+        self.stopped.set()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def start_purge_scheduler():
+    """Start this process's purge thread if CART_PURGE_INTERVAL is set; return it."""
+    global _scheduler
+    interval = getattr(settings, 'CART_PURGE_INTERVAL', None)
+    if not interval:
+        return None
+    with _scheduler_lock:
+        if _scheduler is None or not _scheduler.is_alive():
+            _scheduler = PurgeScheduler(interval)
+            _scheduler.start()
+    return _scheduler
+
+
+def stop_purge_scheduler():
+    """Stop this process's purge thread, e.g. in a server master before it forks workers."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is not None:
+            _scheduler.stop()
+            _scheduler.join()
+            _scheduler = None
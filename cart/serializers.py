@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import CartItem
+from .models import CartItem, Order, OrderLine
 from products.serializers import ProductSerializer
 from products.models import Product
 
@@ -21,5 +21,41 @@ class CartItemSerializer(serializers.ModelSerializer):
     total_price = serializers.SerializerMethodField()
 
     def get_total_price(self, obj):
-        """Calculate total price for a cart item."""
+        """Calculate total price for a cart item, preferring the database annotation."""
+        line_total = getattr(obj, 'line_total', None)
+        if line_total is not None:
+            return line_total
         return obj.get_total_price()
+
+
+class CartSummarySerializer(serializers.Serializer):
+    item_count = serializers.IntegerField()
+    total_quantity = serializers.IntegerField()
+    total_price = serializers.DecimalField(max_digits=20, decimal_places=2)
+
+
+class CartBatchOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=['add', 'set', 'remove'])
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, attrs):
+        if attrs['op'] == 'set' and 'quantity' not in attrs:
+            raise serializers.ValidationError({'quantity': "This field is required for set."})
+        return attrs
+
+
+class OrderLineSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderLine
+        fields = ['product_id', 'product_name', 'unit_price', 'quantity', 'line_total']
+
+    line_total = serializers.DecimalField(max_digits=20, decimal_places=2, read_only=True)
+
+
+class OrderSerializer(serializers.ModelSerializer):
+    lines = OrderLineSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ['id', 'created', 'total', 'idempotency_key', 'lines']
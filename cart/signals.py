@@ -0,0 +1,11 @@
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
+
+from .owners import claim_session_cart
+
+
+@receiver(user_logged_in)
+def merge_cart_on_login(sender, request, user, **kwargs):
+    """Keep what an anonymous visitor put in their cart when they log in."""
+    if request is not None:
+        claim_session_cart(request, user)
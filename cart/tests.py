@@ -1,22 +1,51 @@
-from rest_framework.test import APITestCase
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from io import StringIO
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
 from rest_framework import status
 from products.models import Product
-from cart.models import CartItem
+from cart.models import CartItem, Order
+from cart.owners import LEGACY_SESSION_KEY, SESSION_CART_KEY
+from cart.purge import PurgeScheduler, start_purge_scheduler, stop_purge_scheduler
+from cart.views import AsyncCartListCreateView, CartListCreateView, CheckoutView
+
+
+def make_product(**overrides):
+    """Create a product with placeholder images; keyword arguments override the defaults."""
+    fields = {
+        'name': "Test Product",
+        'category': "Test Category",
+        'price': 1.00,
+        'stock': 5,
+        'image_thumbnail': "http://example.com/thumbnail.jpg",
+        'image_mobile': "http://example.com/mobile.jpg",
+        'image_tablet': "http://example.com/tablet.jpg",
+        'image_desktop': "http://example.com/desktop.jpg",
+    }
+    fields.update(overrides)
+    return Product.objects.create(**fields)
+
 
 class CartAPITests(APITestCase):
     def setUp(self):
-        self.product = Product.objects.create(
-            name="Test Product",
-            category="Test Category",
-            price=10.00,
-            image_thumbnail="http://example.com/thumbnail.jpg",
-            image_mobile="http://example.com/mobile.jpg",
-            image_tablet="http://example.com/tablet.jpg",
-            image_desktop="http://example.com/desktop.jpg",
-        )
-        self.cart_item = CartItem.objects.create(product=self.product, quantity=1)
+        self.product = make_product(price=10.00, stock=10)
+        self.user = User.objects.create_user(username="shopper", password="shopper-pass")
+        self.client.force_authenticate(user=self.user)
+        self.cart_item = CartItem.objects.create(user=self.user, product=self.product, quantity=1)
 
     def test_add_to_cart(self):
+        self.cart_item.delete()  # Start from an empty cart
         response = self.client.post('/api/cart/', data={'product_id': self.product.id, 'quantity': 1})
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)  # Product added successfully
         self.assertEqual(response.data['quantity'], 1)
@@ -29,8 +58,513 @@ class CartAPITests(APITestCase):
     def test_get_cart_items(self):
         response = self.client.get('/api/cart/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)  
+        self.assertEqual(len(response.data['results']), 1)  
 
     def test_remove_cart_item(self):
-        response = self.client.delete(f'/api/cart/{self.cart_item.id}/')
+        response = self.client.delete(f'/api/cart/cart/{self.cart_item.id}/')
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)  
+
+
+class CartListQueryTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="shopper", password="shopper-pass")
+        self.client.force_authenticate(user=self.user)
+
+    def add_lines(self, count):
+        for i in range(count):
+            product = make_product(name=f"Product {i}", price=2.50, stock=10)
+            CartItem.objects.create(user=self.user, product=product, quantity=i + 1)
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/cart/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries), response
+
+    def test_query_count_does_not_grow_with_cart_lines(self):
+        self.add_lines(1)
+        single, _ = self.count_list_queries()
+        self.add_lines(20)
+        many, response = self.count_list_queries()
+        self.assertEqual(len(response.data['results']), 21)
+        self.assertEqual(single, many)
+        self.assertLessEqual(many, 2)
+
+    def test_line_totals_and_summary(self):
+        self.add_lines(3)
+        _, response = self.count_list_queries()
+        self.assertEqual([item['total_price'] for item in response.data['results']], [2.5, 5, 7.5])
+        self.assertEqual(response.data['summary'], {
+            'item_count': 3,
+            'total_quantity': 6,
+            'total_price': '15.00',
+        })
+
+    def test_empty_cart_summary(self):
+        _, response = self.count_list_queries()
+        self.assertEqual(response.data['summary'], {
+            'item_count': 0,
+            'total_quantity': 0,
+            'total_price': '0.00',
+        })
+
+
+class AsyncCartListTests(CartListQueryTests):
+    def count_list_queries(self):
+        view = AsyncCartListCreateView.as_view()
+        request = APIRequestFactory().get('/api/cart/')
+        force_authenticate(request, user=self.user)
+        with CaptureQueriesContext(connection) as context:
+            response = async_to_sync(view)(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries), response
+
+    def test_async_add_uses_sync_transaction(self):
+        self.add_lines(1)
+        product = Product.objects.get()
+        request = APIRequestFactory().post('/api/cart/', {'product_id': product.id, 'quantity': 2}, format='json')
+        force_authenticate(request, user=self.user)
+        response = async_to_sync(AsyncCartListCreateView.as_view())(request)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(CartItem.objects.get().quantity, 3)
+
+        anonymous = APIRequestFactory().post('/api/cart/', {'product_id': product.id}, format='json')
+        response = async_to_sync(AsyncCartListCreateView.as_view())(anonymous)
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+
+
+class CartStockTests(APITestCase):
+    def setUp(self):
+        self.product = make_product(name="Limited Product", price=10.00)
+        self.user = User.objects.create_user(username="shopper", password="shopper-pass")
+        self.client.force_authenticate(user=self.user)
+
+    def test_add_rejects_quantities_over_stock(self):
+        response = self.client.post('/api/cart/', data={'product_id': self.product.id, 'quantity': 6})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], "Requested quantity exceeds available stock.")
+
+        self.client.post('/api/cart/', data={'product_id': self.product.id, 'quantity': 4})
+        response = self.client.post('/api/cart/', data={'product_id': self.product.id, 'quantity': 2})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], "Total quantity exceeds available stock.")
+        self.assertEqual(CartItem.objects.get().quantity, 4)
+
+    def test_add_to_existing_line_round_trips(self):
+        CartItem.objects.create(user=self.user, product=self.product, quantity=1)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post('/api/cart/', data={'product_id': self.product.id, 'quantity': 1})
+        statements = [q['sql'] for q in context.captured_queries if 'SAVEPOINT' not in q['sql']]
+        # Product validation, conditional UPDATE and the re-read of the line
+        self.assertEqual(len(statements), 3)
+        self.assertTrue(statements[1].startswith('UPDATE'))
+        self.assertEqual(response.data['quantity'], 2)
+        self.assertEqual(response.data['total_price'], 20)
+
+    def test_update_rejects_quantities_over_stock(self):
+        cart_item = CartItem.objects.create(user=self.user, product=self.product, quantity=1)
+        response = self.client.put(f'/api/cart/cart/{cart_item.id}/', data={'quantity': 6})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.put(f'/api/cart/cart/{cart_item.id}/', data={'quantity': 5})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_price'], 50)
+
+
+class CartConcurrencyTests(TransactionTestCase):
+    databases = {'default', 'read'}
+    threads = 8
+    attempts_per_thread = 10
+
+    def setUp(self):
+        self.product = make_product(name="Hot Product", stock=25)
+        self.user = User.objects.create_user(username="shopper", password="shopper-pass")
+
+    def hammer(self, results):
+        # Views are called directly: the test client's exception capture is
+        # shared between threads and would attribute errors to the wrong request.
+        view = CartListCreateView.as_view()
+        factory = APIRequestFactory()
+        try:
+            for _ in range(self.attempts_per_thread):
+                while True:
+                    request = factory.post('/api/cart/', {'product_id': self.product.id, 'quantity': 1})
+                    force_authenticate(request, user=self.user)
+                    try:
+                        response = view(request)
+                        break
+                    except OperationalError:
+                        # Shared-cache in-memory SQLite reports lock contention instead of waiting
+                        time.sleep(0.001)
+                results.append(response.status_code)
+        finally:
+            connections.close_all()
+
+    def test_concurrent_adds_never_oversell(self):
+        results = []
+        workers = [threading.Thread(target=self.hammer, args=(results,)) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        attempts = self.threads * self.attempts_per_thread
+        self.assertEqual(len(results), attempts)
+        self.assertEqual(results.count(status.HTTP_201_CREATED), self.product.stock)
+        self.assertEqual(results.count(status.HTTP_400_BAD_REQUEST), attempts - self.product.stock)
+        self.assertEqual(CartItem.objects.get(product=self.product).quantity, self.product.stock)
+
+
+class CartBatchTests(APITestCase):
+    def setUp(self):
+        self.products = [
+            make_product(name=f"Batch Product {i}")
+            for i in range(50)
+        ]
+        self.user = User.objects.create_user(username="shopper", password="shopper-pass")
+        self.client.force_authenticate(user=self.user)
+
+    def post_batch(self, operations):
+        return self.client.post('/api/cart/batch/', {'operations': operations}, format='json')
+
+    def test_mixed_operations_report_per_operation_results(self):
+        kept, removed, capped = self.products[:3]
+        CartItem.objects.create(user=self.user, product=removed, quantity=2)
+        CartItem.objects.create(user=self.user, product=capped, quantity=4)
+        response = self.post_batch([
+            {'op': 'add', 'product_id': kept.id, 'quantity': 2},
+            {'op': 'set', 'product_id': kept.id, 'quantity': 3},
+            {'op': 'remove', 'product_id': removed.id},
+            {'op': 'add', 'product_id': capped.id, 'quantity': 2},
+            {'op': 'add', 'product_id': 999999},
+            {'op': 'explode', 'product_id': kept.id},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([r['status'] for r in results], ['ok', 'ok', 'ok', 'error', 'error', 'error'])
+        self.assertEqual(results[1]['quantity'], 3)
+        self.assertEqual(results[3]['error'], "Total quantity exceeds available stock.")
+        self.assertEqual(results[4]['error'], "Product not found")
+        self.assertIn('op', results[5]['error'])
+        self.assertEqual(
+            dict(CartItem.objects.values_list('product_id', 'quantity')),
+            {kept.id: 3, capped.id: 4},
+        )
+
+    def test_remove_then_add_reuses_line(self):
+        product = self.products[0]
+        item = CartItem.objects.create(user=self.user, product=product, quantity=2)
+        self.post_batch([
+            {'op': 'remove', 'product_id': product.id},
+            {'op': 'add', 'product_id': product.id, 'quantity': 1},
+        ])
+        self.assertEqual(list(CartItem.objects.values_list('id', 'quantity')), [(item.id, 1)])
+
+    def test_large_basket_uses_a_handful_of_queries(self):
+        for product in self.products[:25]:
+            CartItem.objects.create(user=self.user, product=product, quantity=1)
+        operations = [{'op': 'set', 'product_id': p.id, 'quantity': 2} for p in self.products]
+        with CaptureQueriesContext(connection) as context:
+            response = self.post_batch(operations)
+        statements = [q['sql'] for q in context.captured_queries if 'SAVEPOINT' not in q['sql']]
+        self.assertTrue(all(r['status'] == 'ok' for r in response.data['results']))
+        # Products, existing lines, bulk_create, bulk_update
+        self.assertLessEqual(len(statements), 4)
+        self.assertEqual(CartItem.objects.filter(quantity=2).count(), 50)
+
+    def test_rejects_non_list_and_oversized_batches(self):
+        response = self.client.post('/api/cart/batch/', {'operations': 'add'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with self.settings(CART_BATCH_MAX_OPERATIONS=2):
+            response = self.post_batch([{'op': 'remove', 'product_id': 1}] * 3)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CheckoutTests(APITestCase):
+    def setUp(self):
+        self.products = [
+            make_product(name=f"Checkout Product {i}", price=Decimal('2.50') * (i + 1))
+            for i in range(20)
+        ]
+        self.user = User.objects.create_user(username="shopper", password="shopper-pass")
+        self.client.force_authenticate(user=self.user)
+        for product in self.products:
+            CartItem.objects.create(user=self.user, product=product, quantity=2)
+
+    def checkout(self, key=None):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        return self.client.post('/api/cart/checkout/', **headers)
+
+    def test_checkout_creates_order_and_empties_cart(self):
+        response = self.checkout()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['lines']), 20)
+        self.assertEqual(Decimal(response.data['total']), sum(Decimal('5.00') * (i + 1) for i in range(20)))
+        self.assertFalse(CartItem.objects.exists())
+        self.assertEqual(set(Product.objects.values_list('stock', flat=True)), {3})
+
+    def test_prices_are_snapshotted(self):
+        order_id = self.checkout().data['id']
+        Product.objects.filter(pk=self.products[0].pk).update(price=99, name="Renamed")
+        line = Order.objects.get(pk=order_id).lines.get(product=self.products[0])
+        self.assertEqual((line.product_name, line.unit_price), ("Checkout Product 0", Decimal('2.50')))
+
+    def test_query_count_does_not_grow_with_lines(self):
+        with CaptureQueriesContext(connection) as context:
+            self.checkout()
+        statements = [q['sql'] for q in context.captured_queries if 'SAVEPOINT' not in q['sql']]
+        # Cart lines, stock update, order, order lines, cart delete, reload with lines
+        self.assertLessEqual(len(statements), 7)
+
+    def test_idempotency_key_replays_the_order(self):
+        first = self.checkout('retry-1')
+        CartItem.objects.create(user=self.user, product=self.products[0], quantity=1)
+        second = self.checkout('retry-1')
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Product.objects.get(pk=self.products[0].pk).stock, 3)
+        self.assertEqual(self.checkout('retry-2').status_code, status.HTTP_201_CREATED)
+
+    def test_insufficient_stock_changes_nothing(self):
+        CartItem.objects.filter(product=self.products[3]).update(quantity=6)
+        response = self.checkout()
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['product_ids'], [self.products[3].pk])
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(CartItem.objects.count(), 20)
+        self.assertEqual(set(Product.objects.values_list('stock', flat=True)), {5})
+
+    def test_empty_cart_and_anonymous_checkout(self):
+        CartItem.objects.all().delete()
+        self.assertEqual(self.checkout().status_code, status.HTTP_400_BAD_REQUEST)
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.checkout().status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class CheckoutConcurrencyTests(TransactionTestCase):
+    databases = {'default', 'read'}
+    threads = 6
+
+    def setUp(self):
+        product = make_product(name="Hot Product", stock=25)
+        self.user = User.objects.create_user(username="shopper", password="shopper-pass")
+        CartItem.objects.create(user=self.user, product=product, quantity=3)
+        self.product = product
+
+    def retry(self, results):
+        view = CheckoutView.as_view()
+        factory = APIRequestFactory()
+        try:
+            while True:
+                request = factory.post('/api/cart/checkout/', HTTP_IDEMPOTENCY_KEY='same-key')
+                force_authenticate(request, user=self.user)
+                try:
+                    response = view(request)
+                    break
+                except OperationalError:
+                    time.sleep(0.001)
+            results.append((response.status_code, response.data['id']))
+        finally:
+            connections.close_all()
+
+    def test_concurrent_retries_create_one_order(self):
+        results = []
+        workers = [threading.Thread(target=self.retry, args=(results,)) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(sorted(code for code, _ in results), [200] * (self.threads - 1) + [201])
+        self.assertEqual(len({order_id for _, order_id in results}), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 22)
+
+
+class CartOwnershipTests(APITestCase):
+    def setUp(self):
+        self.products = [
+            make_product(name=f"Owned Product {i}")
+            for i in range(2)
+        ]
+        self.user = User.objects.create_user(username="shopper", password="shopper-pass")
+        self.other = User.objects.create_user(username="other", password="other-pass")
+        self.other_item = CartItem.objects.create(user=self.other, product=self.products[0], quantity=1)
+
+    def test_users_only_see_and_change_their_own_lines(self):
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get('/api/cart/').data['results'], [])
+        url = f'/api/cart/cart/{self.other_item.id}/'
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.put(url, {'quantity': 2}).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.post('/api/cart/', {'product_id': self.products[0].id, 'quantity': 2})
+        self.client.post('/api/cart/batch/', {'operations': [
+            {'op': 'remove', 'product_id': self.products[0].id},
+        ]}, format='json')
+        self.assertEqual(
+            list(CartItem.objects.order_by('id').values_list('user', 'quantity')),
+            [(self.other.pk, 1)],
+        )
+
+    def test_anonymous_visitors_get_a_session_cart(self):
+        response = self.client.post('/api/cart/', {'product_id': self.products[1].id, 'quantity': 2})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(self.client.get('/api/cart/').data['results']), 1)
+        item = CartItem.objects.get(product=self.products[1])
+        self.assertIsNone(item.user)
+        self.assertEqual(item.session_key, self.client.session[SESSION_CART_KEY])
+
+        self.client.cookies.clear()
+        self.assertEqual(self.client.get('/api/cart/').data['results'], [])
+
+    def test_login_merges_the_session_cart(self):
+        CartItem.objects.create(user=self.user, product=self.products[0], quantity=4)
+        self.client.post('/api/cart/', {'product_id': self.products[0].id, 'quantity': 3})
+        self.client.post('/api/cart/', {'product_id': self.products[1].id, 'quantity': 1})
+        self.client.login(username="shopper", password="shopper-pass")
+        self.assertEqual(
+            dict(CartItem.objects.filter(user=self.user).values_list('product_id', 'quantity')),
+            {self.products[0].id: 5, self.products[1].id: 1},  # Capped at stock
+        )
+        self.assertFalse(CartItem.objects.filter(user__isnull=True).exists())
+        self.assertNotIn(SESSION_CART_KEY, self.client.session)
+
+    def test_owner_lookups_use_the_unique_index(self):
+        plan = CartItem.objects.filter(user=self.user).explain()
+        self.assertRegex(plan, r'USING INDEX \S+ \(user_id=\?\)')
+        plan = CartItem.objects.filter(session_key='key').explain()
+        self.assertRegex(plan, r'USING INDEX \S+ \(session_key=\?\)')
+
+    def test_claim_legacy_cart(self):
+        CartItem.objects.create(session_key=LEGACY_SESSION_KEY, product=self.products[1], quantity=2)
+        call_command('claim_legacy_cart', 'shopper', stdout=StringIO())
+        self.assertEqual(CartItem.objects.get(product=self.products[1]).user, self.user)
+        with self.assertRaises(CommandError):
+            call_command('claim_legacy_cart', 'nobody', stdout=StringIO())
+
+
+class CartPurgeTests(APITestCase):
+    def setUp(self):
+        self.product = make_product(name="Abandoned Product")
+        self.user = User.objects.create_user(username="shopper", password="shopper-pass")
+        self.client.force_authenticate(user=self.user)
+
+    def add_lines(self, count, age):
+        CartItem.objects.bulk_create(
+            CartItem(session_key=f"{age}-{i}", product=self.product, quantity=1) for i in range(count)
+        )
+        CartItem.objects.filter(session_key__startswith=f"{age}-").update(
+            updated=timezone.now() - timedelta(seconds=age),
+        )
+
+    def test_changes_touch_the_line(self):
+        item = CartItem.objects.create(user=self.user, product=self.product, quantity=1)
+        CartItem.objects.filter(pk=item.pk).update(updated=timezone.now() - timedelta(days=40))
+        self.assertTrue(CartItem.objects.expired().exists())
+        self.client.post('/api/cart/', {'product_id': self.product.id, 'quantity': 1})
+        self.assertFalse(CartItem.objects.expired().exists())
+
+        CartItem.objects.filter(pk=item.pk).update(updated=timezone.now() - timedelta(days=40))
+        self.client.put(f'/api/cart/cart/{item.id}/', {'quantity': 3})
+        self.assertFalse(CartItem.objects.expired().exists())
+
+        CartItem.objects.filter(pk=item.pk).update(updated=timezone.now() - timedelta(days=40))
+        self.client.post('/api/cart/batch/', {'operations': [
+            {'op': 'add', 'product_id': self.product.id},
+        ]}, format='json')
+        self.assertFalse(CartItem.objects.expired().exists())
+
+    @override_settings(CART_EXPIRY=3600)
+    def test_purge_deletes_expired_lines_in_batches(self):
+        self.add_lines(25, age=7200)
+        self.add_lines(3, age=60)
+        out = StringIO()
+        call_command('purge_carts', '--dry-run', stdout=out)
+        self.assertIn("25 expired cart lines.", out.getvalue())
+
+        out = StringIO()
+        call_command('purge_carts', '--batch-size', '10', '--pause', '0', stdout=out)
+        self.assertEqual(out.getvalue().count("Batch "), 3)
+        self.assertIn("Purged 25 expired cart lines in 3 batches", out.getvalue())
+        self.assertEqual(CartItem.objects.count(), 3)
+
+    @override_settings(CART_EXPIRY=3600, CART_PURGE_PAUSE=0)
+    def test_scheduler_purges(self):
+        self.add_lines(5, age=7200)
+        PurgeScheduler(interval=60).purge()
+        self.assertFalse(CartItem.objects.exists())
+        with self.settings(CART_PURGE_INTERVAL=None):
+            self.assertIsNone(start_purge_scheduler())
+
+    @override_settings(CART_PURGE_INTERVAL=3600)
+    def test_scheduler_restarts_after_stop(self):
+        scheduler = start_purge_scheduler()
+        self.addCleanup(stop_purge_scheduler)
+        self.assertIs(start_purge_scheduler(), scheduler)
+        stop_purge_scheduler()
+        self.assertFalse(scheduler.is_alive())
+        restarted = start_purge_scheduler()
+        self.assertIsNot(restarted, scheduler)
+        self.assertTrue(restarted.is_alive())
+
+
+class CartConditionalRequestTests(APITestCase):
+    def setUp(self):
+        self.products = [
+            make_product(name=f"Polled Product {i}")
+            for i in range(2)
+        ]
+        self.user = User.objects.create_user(username="shopper", password="shopper-pass")
+        self.client.force_authenticate(user=self.user)
+        self.item = CartItem.objects.create(user=self.user, product=self.products[0], quantity=1)
+
+    def etag(self):
+        return self.client.get('/api/cart/')['ETag']
+
+    def test_unchanged_cart_is_not_resent(self):
+        etag = self.etag()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/cart/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(context.captured_queries), 1)
+
+        request = APIRequestFactory().get('/api/cart/', HTTP_IF_NONE_MATCH=etag)
+        force_authenticate(request, user=self.user)
+        response = async_to_sync(AsyncCartListCreateView.as_view())(request)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_cart_and_product_changes_change_the_etag(self):
+        etags = [self.etag()]
+        self.client.post('/api/cart/', {'product_id': self.products[1].id})
+        etags.append(self.etag())
+        Product.objects.get(pk=self.products[1].pk).save()
+        etags.append(self.etag())
+        self.client.delete(f'/api/cart/cart/{self.item.id}/')
+        etags.append(self.etag())
+        self.assertEqual(len(set(etags)), 4)
+        self.assertEqual(
+            self.client.get('/api/cart/', HTTP_IF_NONE_MATCH=etags[-2]).status_code, status.HTTP_200_OK,
+        )
+
+    def test_if_match_guards_every_cart_write(self):
+        stale = self.etag()
+        CartItem.objects.filter(pk=self.item.pk).update(quantity=2, updated=timezone.now())
+        writes = [
+            lambda **headers: self.client.post('/api/cart/', {'product_id': self.products[1].id}, **headers),
+            lambda **headers: self.client.put(f'/api/cart/cart/{self.item.id}/', {'quantity': 3}, **headers),
+            lambda **headers: self.client.post('/api/cart/batch/', {'operations': [
+                {'op': 'add', 'product_id': self.products[1].id},
+            ]}, format='json', **headers),
+            lambda **headers: self.client.delete(f'/api/cart/cart/{self.item.id}/', **headers),
+            lambda **headers: self.client.post('/api/cart/checkout/', **headers),
+        ]
+        for write in writes:
+            self.assertEqual(write(HTTP_IF_MATCH=stale).status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(list(CartItem.objects.values_list('quantity', flat=True)), [2])
+
+        response = self.client.put(f'/api/cart/cart/{self.item.id}/', {'quantity': 3}, HTTP_IF_MATCH=self.etag())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post('/api/cart/checkout/', HTTP_IF_MATCH=f'W/{self.etag()}')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
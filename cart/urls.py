@@ -1,7 +1,14 @@
+from django.conf import settings
 from django.urls import path
-from .views import CartListCreateView, CartRetrieveUpdateDestroyView
+from .views import (
+    AsyncCartListCreateView, CartBatchView, CartListCreateView, CartRetrieveUpdateDestroyView, CheckoutView,
+)
+
+ListCreateView = AsyncCartListCreateView if getattr(settings, 'ASYNC_API_VIEWS', False) else CartListCreateView
 
 urlpatterns = [
-    path('', CartListCreateView.as_view(), name='cart-list-create'),
+    path('', ListCreateView.as_view(), name='cart-list-create'),
+    path('batch/', CartBatchView.as_view(), name='cart-batch'),
+    path('checkout/', CheckoutView.as_view(), name='cart-checkout'),
     path('cart/<int:pk>/', CartRetrieveUpdateDestroyView.as_view(), name='cart-detail'),
 ]
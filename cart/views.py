@@ -1,70 +1,210 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
 from rest_framework import generics, status, permissions
 from rest_framework.response import Response
-from .models import CartItem
-from products.models import Product
-from .serializers import CartItemSerializer
+from .models import CartItem, EmptyCart, InsufficientStock, Order, cart_version
+from .owners import get_cart_owner
+from .serializers import CartBatchOperationSerializer, CartItemSerializer, CartSummarySerializer, OrderSerializer
+from shopping_cart_api.async_views import AsyncAPIViewMixin
+from shopping_cart_api.conditional import make_etag, not_modified, precondition_failed, set_validators
+
+class CartOwnerMixin:
+    """Scope the view to the cart of the requesting user or anonymous session."""
+    permission_classes = [permissions.AllowAny]
+    throttle_scope = 'cart'
+    owner = None
+
+    def get_owner(self, create=False):
+        if self.owner is None:
+            self.owner = get_cart_owner(self.request, create=create)
+        return self.owner
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if getattr(self, 'swagger_fake_view', False):  # Schema generation has no request
+            return queryset.none()
+        owner = self.get_owner()
+        return queryset.filter(**owner) if owner else queryset.none()
+
+    def cart_etag(self, version):
+        # Removing a line can make the cart older, so there is no Last-Modified
+        return make_etag('cart', *version)
+
+    def get_cart_etag(self):
+        """The cart's ETag from one aggregate query over the owner index, no rows loaded."""
+        owner = self.get_owner()
+        lines = CartItem.objects.filter(**owner) if owner else CartItem.objects.none()
+        return self.cart_etag(lines.version())
+
+    def check_preconditions(self):
+        """Return a 412 response if the client's If-Match no longer matches the cart."""
+        if 'If-Match' not in self.request.headers:
+            return None
+        return precondition_failed(self.request, self.get_cart_etag())
 
 # List and Add Cart Items
-class CartListCreateView(generics.ListCreateAPIView):
-    queryset = CartItem.objects.all()
+class CartListCreateView(CartOwnerMixin, generics.ListCreateAPIView):
+    queryset = CartItem.objects.with_totals()
     serializer_class = CartItemSerializer
 
-    def get_permissions(self):
-        if self.request.method == 'POST':
-            return [permissions.IsAuthenticated()]
-        return [permissions.AllowAny()]
+    def list(self, request, *args, **kwargs):
+        if 'If-None-Match' in request.headers:
+            response = not_modified(request, self.get_cart_etag())
+            if response is not None:
+                return response
+        queryset = self.filter_queryset(self.get_queryset())
+        lines = list(queryset)
+        items = self.get_serializer(lines, many=True).data
+        summary = CartSummarySerializer(queryset.summary()).data
+        return set_validators(
+            Response({"summary": summary, "results": items}), self.cart_etag(cart_version(lines)),
+        )
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        product_id = serializer.validated_data['product'].id
+        product = serializer.validated_data['product']
         quantity = serializer.validated_data.get('quantity', 1)
 
-        try:
-            product = Product.objects.get(id=product_id)
-        except Product.DoesNotExist:
-            return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
-
-        if quantity > product.stock:
-            return Response({"error": "Requested quantity exceeds available stock."}, status=status.HTTP_400_BAD_REQUEST)
-
-        cart_item, created = CartItem.objects.get_or_create(
-            product=product,
-            defaults={'quantity': quantity}
-        )
-        if not created:
-            if cart_item.quantity + quantity > product.stock:
-                return Response({"error": "Total quantity exceeds available stock."}, status=status.HTTP_400_BAD_REQUEST)
-            
-            cart_item.quantity += quantity
-            cart_item.save()
+        # The precondition and the write share a transaction, so nothing can change in between
+        with transaction.atomic():
+            failed = self.check_preconditions()
+            if failed is not None:
+                return failed
+            try:
+                cart_item, created = CartItem.objects.add_product(self.get_owner(create=True), product, quantity)
+            except InsufficientStock as exc:
+                return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response(self.get_serializer(cart_item).data, status=status.HTTP_201_CREATED)
 
 # Update or Delete Cart Items
-class CartRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = CartItem.objects.all()
+class CartRetrieveUpdateDestroyView(CartOwnerMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = CartItem.objects.with_totals()
     serializer_class = CartItemSerializer
 
-    def get_permissions(self):
-        return [permissions.IsAuthenticated()]
-
     def update(self, request, *args, **kwargs):
         cart_item = self.get_object()
         new_quantity = request.data.get('quantity', cart_item.quantity)
 
         try:
             new_quantity = int(new_quantity)
-        except ValueError:
+        except (TypeError, ValueError):
             return Response({"error": "Quantity must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
 
         if new_quantity <= 0:
             return Response({"error": "Quantity must be greater than zero."}, status=status.HTTP_400_BAD_REQUEST)
         
-        if new_quantity > cart_item.product.stock:
-            return Response({"error": "Requested quantity exceeds available stock."}, status=status.HTTP_400_BAD_REQUEST)
-
-        cart_item.quantity = new_quantity
-        cart_item.save()
+        with transaction.atomic():
+            failed = self.check_preconditions()
+            if failed is not None:
+                return failed
+            try:
+                cart_item = CartItem.objects.set_quantity(cart_item, new_quantity)
+            except InsufficientStock as exc:
+                return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
         return Response(self.get_serializer(cart_item).data, status=status.HTTP_200_OK)
+
+    def destroy(self, request, *args, **kwargs):
+        with transaction.atomic():
+            failed = self.check_preconditions()
+            if failed is not None:
+                return failed
+            return super().destroy(request, *args, **kwargs)
+
+# Apply Many Cart Changes at Once
+class CartBatchView(CartOwnerMixin, generics.GenericAPIView):
+    queryset = CartItem.objects.all()
+    serializer_class = CartBatchOperationSerializer
+
+    def post(self, request, *args, **kwargs):
+        operations = request.data.get('operations') if isinstance(request.data, dict) else None
+        if not isinstance(operations, list):
+            return Response({"error": "operations must be a list."}, status=status.HTTP_400_BAD_REQUEST)
+        max_operations = getattr(settings, 'CART_BATCH_MAX_OPERATIONS', 500)
+        if len(operations) > max_operations:
+            return Response(
+                {"error": f"A batch may contain at most {max_operations} operations."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        valid, results = [], [None] * len(operations)
+        for index, operation in enumerate(operations):
+            serializer = self.get_serializer(data=operation)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                results[index] = {'index': index, 'status': 'error', 'error': serializer.errors}
+
+        with transaction.atomic():
+            failed = self.check_preconditions()
+            if failed is not None:
+                return failed
+            applied = CartItem.objects.apply_batch(self.get_owner(create=True), [data for _, data in valid])
+        for (index, _), result in zip(valid, applied):
+            result['index'] = index
+            results[index] = result
+
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+
+# Check Out the Cart as an Order
+class CheckoutView(CartOwnerMixin, generics.GenericAPIView):
+    queryset = CartItem.objects.all()
+    serializer_class = OrderSerializer
+
+    def get_permissions(self):
+        return [permissions.IsAuthenticated()]
+
+    def post(self, request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key', '').strip() or None
+        if key is not None and len(key) > Order._meta.get_field('idempotency_key').max_length:
+            return Response({"error": "Idempotency-Key is too long."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            with transaction.atomic():
+                failed = self.check_preconditions()
+                if failed is not None:
+                    return failed
+                order, created = CartItem.objects.checkout(request.user, idempotency_key=key)
+        except EmptyCart as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except InsufficientStock as exc:
+            return Response(
+                {"error": str(exc), "product_ids": exc.product_ids},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        order = Order.objects.prefetch_related('lines').get(pk=order.pk)
+        response = Response(self.get_serializer(order).data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+        if not created:
+            response['Idempotent-Replayed'] = 'true'
+        return response
+
+
+# Async Cart Reads (served when ASYNC_API_VIEWS is enabled)
+class AsyncCartListCreateView(AsyncAPIViewMixin, CartListCreateView):
+    """
+    Lists the cart with the async ORM. Adds keep the inherited create(): they
+    run in a transaction, which the async ORM cannot do, so they are
+    dispatched to a thread in a single hop.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        # Resolving the user or session may query the database
+        await sync_to_async(self.get_owner)()
+        if 'If-None-Match' in request.headers:
+            owner = self.get_owner()
+            version = await (CartItem.objects.filter(**owner) if owner else CartItem.objects.none()).aversion()
+            response = not_modified(request, self.cart_etag(version))
+            if response is not None:
+                return response
+        queryset = self.filter_queryset(self.get_queryset())
+        lines = [item async for item in queryset]
+        items = self.get_serializer(lines, many=True).data
+        summary = CartSummarySerializer(await queryset.asummary()).data
+        return set_validators(
+            Response({"summary": summary, "results": items}), self.cart_etag(cart_version(lines)),
+        )
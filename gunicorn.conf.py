@@ -0,0 +1,69 @@
+"""
+Gunicorn configuration, read automatically when gunicorn starts in this directory:
+
+    gunicorn shopping_cart_api.wsgi
+
+The application is imported once in the master (`preload_app`) and warmed up
+there, so workers are forked with Django, DRF, drf_yasg, the URL resolvers,
+serializer field maps and the OpenAPI schema already in memory. Each worker
+then opens its database connections and restarts its background threads
+before it accepts its first request. Worker count and bind address keep
+gunicorn's defaults (WEB_CONCURRENCY, PORT) and command-line options.
+"""
+import os
+import time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'shopping_cart_api.settings')
+
+preload_app = True
+
+
+def log_warmup(log, who, started, timings):
+    steps = ', '.join(f'{name} {seconds * 1000:.1f} ms' for name, (seconds, _) in timings.items())
+    log.info("%s warmed up in %.1f ms (%s)", who, (time.perf_counter() - started) * 1000, steps)
+
+
+def when_ready(server):
+    """Runs in the master once the application is loaded, before the first fork."""
+    from django.conf import settings
+
+    directory = getattr(settings, 'PERF_METRICS_DIR', None)
+    if directory:
+        from shopping_cart_api.metrics import clear_worker_files
+
+        clear_worker_files(directory)
+    if not server.cfg.preload_app:
+        return
+
+    from django.db import connections
+
+    from cart.purge import stop_purge_scheduler
+    from shopping_cart_api.warmup import warm_up
+
+    # Threads do not survive fork(); every worker starts its own
+    stop_purge_scheduler()
+    started = time.perf_counter()
+    timings = warm_up(connect=False)
+    connections.close_all()
+    log_warmup(server.log, "Master", started, timings)
+
+
+def post_worker_init(worker):
+    """Runs in each worker after it loaded the application, before it accepts connections."""
+    from cart.purge import start_purge_scheduler
+    from shopping_cart_api.warmup import warm_up
+
+    start_purge_scheduler()
+    started = time.perf_counter()
+    timings = warm_up()
+    log_warmup(worker.log, f"Worker {worker.pid}", started, timings)
+
+
+def child_exit(server, worker):
+    from django.conf import settings
+
+    directory = getattr(settings, 'PERF_METRICS_DIR', None)
+    if directory:
+        from shopping_cart_api.metrics import retire_worker_file
+
+        retire_worker_file(directory, worker.pid)
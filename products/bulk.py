@@ -0,0 +1,155 @@
+import codecs
+import csv
+import json
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .cache import invalidate_catalogue
+from .models import Product
+
+# Columns read on import and written on export, in file order.
+FIELDS = [
+    'id',
+    'name',
+    'category',
+    'price',
+    'image_thumbnail',
+    'image_mobile',
+    'image_tablet',
+    'image_desktop',
+    'stock',
+    'description',
+]
+UPDATE_FIELDS = [name for name in FIELDS if name != 'id'] + ['category_key', 'updated']
+FORMATS = ('ndjson', 'csv')
+
+# Only the first few rejected rows are kept so a bad file cannot exhaust memory.
+MAX_REPORTED_ERRORS = 100
+
+
+class UnsupportedFormat(ValueError):
+    """Raised when an import or export format is not one of FORMATS."""
+
+
+def iter_rows(lines, file_format):
+    """
+    Yield `(line_number, row_dict)` pairs from an iterable of byte lines.
+
+    Lines are decoded and parsed one at a time, so uploads and files of any
+    size are read with bounded memory. Rows that are not valid JSON objects
+    are yielded as `(line_number, None)`.
+    """
+    text = codecs.iterdecode(lines, 'utf-8-sig')
+    if file_format == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    elif file_format == 'ndjson':
+        for number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield number, row if isinstance(row, dict) else None
+    else:
+        raise UnsupportedFormat(f"Unsupported format '{file_format}', expected one of {', '.join(FORMATS)}.")
+
+
+def build_product(row):
+    """Validate one row with the model's field rules and return an unsaved Product."""
+    errors, values = {}, {}
+    for name in FIELDS:
+        field = Product._meta.get_field(name)
+        raw = row.get(name)
+        if raw == '' and (name == 'id' or field.null):
+            raw = None
+        if name == 'id':
+            if raw is None:
+                continue
+        elif raw is None and field.has_default():
+            raw = field.get_default()
+        try:
+            values[name] = field.clean(raw, None)
+        except ValidationError as exc:
+            errors[name] = exc.messages
+    if errors:
+        raise ValidationError(errors)
+    product = Product(**values)
+    product.category_key = Product.normalize_category(product.category)
+    return product
+
+
+def import_products(rows, chunk_size=1000):
+    """
+    Upsert products from `(line_number, row)` pairs in chunked transactions.
+
+    Rows with an `id` update that product or create it with that id; rows
+    without one are inserted. Each chunk is written with a single
+    bulk_create(update_conflicts=True) in its own transaction, so memory and
+    lock time stay bounded by the chunk size. Returns a report dict.
+    """
+    report = {'imported': 0, 'rejected': 0, 'errors': []}
+    rows = iter(rows)
+    try:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            with_pk, without_pk = {}, []
+            for number, row in chunk:
+                try:
+                    if row is None:
+                        raise ValidationError("Row is not a JSON object.")
+                    product = build_product(row)
+                except ValidationError as exc:
+                    report['rejected'] += 1
+                    if len(report['errors']) < MAX_REPORTED_ERRORS:
+                        detail = exc.message_dict if hasattr(exc, 'error_dict') else exc.messages
+                        report['errors'].append({'line': number, 'errors': detail})
+                    continue
+                if product.pk is None:
+                    without_pk.append(product)
+                else:
+                    with_pk[product.pk] = product  # The last row for an id wins
+
+            products = list(with_pk.values()) + without_pk
+            if products:
+                with transaction.atomic():
+                    Product.objects.bulk_create(
+                        products,
+                        update_conflicts=True,
+                        unique_fields=['id'],
+                        update_fields=UPDATE_FIELDS,
+                    )
+                report['imported'] += len(products)
+    finally:
+        # bulk_create() sends no signals, so invalidate cached listings here
+        if report['imported']:
+            invalidate_catalogue()
+    return report
+
+
+class Echo:
+    """A write-only file-like object that returns what is written, for streaming writers."""
+
+    def write(self, value):
+        return value
+
+
+def export_products(file_format, chunk_size=2000):
+    """Yield the whole catalogue as NDJSON or CSV text, one row at a time."""
+    rows = Product.objects.order_by('id').values_list(*FIELDS).iterator(chunk_size=chunk_size)
+    if file_format == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(FIELDS)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            record = dict(zip(FIELDS, row))
+            record['price'] = str(record['price'])
+            yield json.dumps(record) + '\n'
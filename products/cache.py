@@ -0,0 +1,75 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+CATALOGUE_VERSION_KEY = 'products:catalogue-version'
+
+
+def get_catalogue_cache():
+    """Return the cache backend configured for catalogue responses."""
+    return caches[getattr(settings, 'PRODUCTS_CACHE_ALIAS', 'default')]
+
+
+def get_version_cache():
+    """
+    Return the cache holding the catalogue version.
+
+    It must be shared by every worker process: responses are cached under
+    the version, so a write in one worker then invalidates the responses
+    cached (in their own process-local caches) by all the others.
+    """
+    alias = getattr(settings, 'PRODUCTS_VERSION_CACHE_ALIAS', None)
+    return caches[alias] if alias else get_catalogue_cache()
+
+
+def get_catalogue_version():
+    """
+    Return the current catalogue version.
+
+    The counter is seeded from the clock rather than 1, so that if it is ever
+    evicted the new value cannot collide with entries cached under an old one.
+    """
+    cache = get_version_cache()
+    version = cache.get(CATALOGUE_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOGUE_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(CATALOGUE_VERSION_KEY)
+    return version
+
+
+def bump_catalogue_version():
+    cache = get_version_cache()
+    try:
+        cache.incr(CATALOGUE_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOGUE_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def invalidate_catalogue():
+    """
+    Invalidate every cached catalogue response.
+
+    The version is bumped immediately and again once the surrounding
+    transaction commits, so a reader that cached pre-commit rows in between
+    is never served again.
+    """
+    bump_catalogue_version()
+    if not transaction.get_autocommit():
+        transaction.on_commit(bump_catalogue_version)
+
+
+def catalogue_cache_key(prefix, request):
+    """Build a cache key from the request URL and its normalized query parameters."""
+    params = sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values
+        if value != ''
+    )
+    raw = f'{request.build_absolute_uri(request.path)}?{urlencode(params)}'
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return f'products:{prefix}:{get_catalogue_version()}:{digest}'
@@ -0,0 +1,72 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import Count, FloatField, Max, Min, OuterRef, Q, Subquery, Value
+
+PRICE_QUANTUM = Decimal('0.01')
+
+
+def price_edges(low, high, buckets):
+    """Split [low, high] into `buckets` equal ranges; return their edges, rounded to cents."""
+    buckets = min(buckets, int((high - low) / PRICE_QUANTUM))  # At least a cent wide
+    if buckets < 1:
+        return [low, high]
+    width = (high - low) / buckets
+    edges = [(low + width * i).quantize(PRICE_QUANTUM, ROUND_HALF_UP) for i in range(buckets)]
+    return edges + [high]
+
+
+def format_price(value):
+    return str(Decimal(value).quantize(PRICE_QUANTUM))
+
+
+def compute_facets(queryset, buckets):
+    """
+    Return category counts, the price range and a price histogram of `queryset`.
+
+    Two aggregate queries: one grouped by category (which also yields the
+    overall count and price range), and one with a filtered COUNT per price
+    range. Every range includes its lower edge; the last also includes the
+    maximum price.
+    """
+    queryset = queryset.order_by()
+    # The label is looked up once per group, so the grouping itself only
+    # reads the (category_key, price) index
+    label = Subquery(
+        queryset.model.objects.filter(category_key=OuterRef('category_key')).order_by().values('category')[:1]
+    )
+    groups = list(
+        queryset.values('category_key')
+        .annotate(count=Count('id'), min_price=Min('price'), max_price=Max('price'))
+        .annotate(category=label)
+        .order_by('category_key')
+    )
+    facets = {
+        'count': sum(group['count'] for group in groups),
+        'categories': [{'category': group['category'], 'count': group['count']} for group in groups],
+        'price': {'min': None, 'max': None, 'histogram': []},
+    }
+    if not groups:
+        return facets
+
+    low = min(Decimal(group['min_price']) for group in groups)
+    high = max(Decimal(group['max_price']) for group in groups)
+    edges = price_edges(low, high, buckets)
+    # Edges are bound as floats, as SQLite compares the decimal column with
+    # the text parameters DecimalField would send about twice as slowly
+    bounds = [Value(float(edge), output_field=FloatField()) for edge in edges]
+    last = len(edges) - 2
+    counts = queryset.aggregate(**{
+        f'bucket_{index}': Count('id', filter=Q(price__gte=bounds[index]) & (
+            Q(price__lte=bounds[index + 1]) if index == last else Q(price__lt=bounds[index + 1])
+        ))
+        for index in range(len(edges) - 1)
+    })
+    facets['price'] = {
+        'min': format_price(low),
+        'max': format_price(high),
+        'histogram': [
+            {'min': format_price(start), 'max': format_price(end), 'count': counts[f'bucket_{index}']}
+            for index, (start, end) in enumerate(zip(edges, edges[1:]))
+        ],
+    }
+    return facets
@@ -0,0 +1,148 @@
+from collections import defaultdict
+from itertools import islice
+
+from django.db import connection, models, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .cache import invalidate_catalogue
+from .models import Product
+
+
+class InvalidAdjustment(ValueError):
+    """Raised for a stock adjustment that is not `{id, delta}` or `{id, set}`."""
+
+
+def to_int(value, name):
+    # CSV fields arrive as strings; JSON booleans and floats are not counts
+    if isinstance(value, (bool, float)):
+        raise InvalidAdjustment(f"{name} must be an integer.")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise InvalidAdjustment(f"{name} must be an integer.") from None
+
+
+def parse_adjustment(row):
+    """Return `(product_id, op, value)` from `{id, delta}` or `{id, set}`; raise InvalidAdjustment."""
+    if not isinstance(row, dict):
+        raise InvalidAdjustment("Adjustment must be an object.")
+    if row.get('id') in (None, ''):
+        raise InvalidAdjustment("id is required.")
+    product_id = to_int(row['id'], 'id')
+    ops = [op for op in ('delta', 'set') if row.get(op) not in (None, '')]
+    if len(ops) != 1:
+        raise InvalidAdjustment("Give exactly one of delta or set.")
+    op = ops[0]
+    value = to_int(row[op], op)
+    if op == 'set' and value < 0:
+        raise InvalidAdjustment("Stock cannot be negative.")
+    return product_id, op, value
+
+
+def fold(adjustments):
+    """
+    Combine accepted adjustments into one change per product, in order.
+
+    Deltas add up; a set replaces earlier changes and later deltas apply on
+    top of it. Returns {product_id: (op, value)}.
+    """
+    changes = {}
+    for product_id, op, value in adjustments:
+        if op == 'delta' and product_id in changes:
+            op, value = changes[product_id][0], changes[product_id][1] + value
+        changes[product_id] = (op, value)
+    return changes
+
+
+def apply_chunk(adjustments):
+    """
+    Apply a chunk's `(ref, (product_id, op, value))` adjustments in one transaction.
+
+    Returns {ref: error} for the lines refused. Lines are checked in order
+    against the stock the earlier lines leave, so only a line that would
+    take stock below zero is refused, and the lines before and after it
+    still apply. Stock is read under the write lock (or row locks); the
+    accepted lines are then folded and written by a single UPDATE whose
+    WHERE clause only matches rows whose resulting stock is not negative, so
+    SQL itself keeps stock from going below zero.
+    """
+    rejected = {}
+    with transaction.atomic():
+        products = Product.objects.filter(pk__in={product_id for _, (product_id, _, _) in adjustments})
+        if connection.features.has_select_for_update:
+            products = products.select_for_update()
+        stock = dict(products.values_list('pk', 'stock'))
+        accepted = []
+        for ref, (product_id, op, value) in adjustments:
+            if product_id not in stock:
+                rejected[ref] = "Product not found."
+                continue
+            new_stock = stock[product_id] + value if op == 'delta' else value
+            if new_stock < 0:
+                rejected[ref] = "Stock cannot be negative."
+            else:
+                stock[product_id] = new_stock
+                accepted.append((product_id, op, value))
+        valid = fold(accepted)
+        if not valid:
+            return rejected
+
+        # One WHEN per distinct change rather than per product keeps the
+        # statement small: warehouse deltas repeat a handful of values
+        groups = defaultdict(list)
+        for product_id, (op, value) in valid.items():
+            groups[op, value].append(product_id)
+        integer = models.IntegerField()
+        new_stock = Case(
+            *[
+                When(pk__in=ids, then=Value(value) if op == 'set' else F('stock') + Value(value))
+                for (op, value), ids in groups.items()
+            ],
+            output_field=integer,
+        )
+        # Sets and increments need nothing; a decrement needs at least -delta in stock
+        minimum = Case(
+            *[When(pk__in=ids, then=Value(-value)) for (op, value), ids in groups.items() if op == 'delta' and value < 0],
+            default=Value(0),
+            output_field=integer,
+        )
+        Product.objects.filter(pk__in=valid, stock__gte=minimum).update(stock=new_stock, updated=timezone.now())
+    return rejected
+
+
+def adjust_stock(rows, chunk_size=1000):
+    """
+    Apply stock adjustments from `(ref, row)` pairs in chunked transactions.
+
+    `ref` identifies the row in the report (a batch index or file line).
+    Returns {'applied': n, 'rejected': n, 'errors': [{'index': ref, 'id': id, 'error': message}]}.
+    """
+    report = {'applied': 0, 'rejected': 0, 'errors': []}
+    rows = iter(rows)
+    try:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            parsed = []
+            for ref, row in chunk:
+                try:
+                    parsed.append((ref, parse_adjustment(row)))
+                except InvalidAdjustment as exc:
+                    report['rejected'] += 1
+                    product_id = row.get('id') if isinstance(row, dict) else None
+                    report['errors'].append({'index': ref, 'id': product_id, 'error': str(exc)})
+
+            rejected = apply_chunk(parsed) if parsed else {}
+            for ref, (product_id, _, _) in parsed:
+                if ref in rejected:
+                    report['rejected'] += 1
+                    report['errors'].append({'index': ref, 'id': product_id, 'error': rejected[ref]})
+                else:
+                    report['applied'] += 1
+    finally:
+        if report['applied']:
+            invalidate_catalogue()
+    report['errors'].sort(key=lambda error: error['index'])
+    return report
@@ -0,0 +1,40 @@
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from products.bulk import FORMATS, iter_rows
+from products.inventory import adjust_stock
+
+
+class Command(BaseCommand):
+    help = "Apply {id, delta} or {id, set} stock adjustments from an NDJSON or CSV file in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to read, or '-' for standard input.")
+        parser.add_argument('--format', choices=FORMATS, help="File format (defaults to the file extension).")
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=getattr(settings, 'PRODUCTS_INVENTORY_CHUNK_SIZE', 1000),
+            help="Adjustments applied per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('csv' if path.endswith('.csv') else 'ndjson')
+
+        if path == '-':
+            report = adjust_stock(iter_rows(sys.stdin.buffer, file_format), chunk_size=options['chunk_size'])
+        else:
+            try:
+                with open(path, 'rb') as handle:
+                    report = adjust_stock(iter_rows(handle, file_format), chunk_size=options['chunk_size'])
+            except OSError as exc:
+                raise CommandError(f"Cannot read {path}: {exc}")
+
+        for error in report['errors']:
+            self.stderr.write(f"line {error['index']}: product {error['id']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Applied {report['applied']} stock adjustments, rejected {report['rejected']}."
+        ))
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from products.models import Product
+from products.serializers import ProductReadSerializer
+from shopping_cart_api import compression
+from shopping_cart_api.bench import seed
+from shopping_cart_api.renderers import FastJSONRenderer
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure render CPU and bytes on the wire of a product list, per JSON renderer "
+        "and content-coding, on a seeded catalogue (rolled back afterwards)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10000, help="Number of products in the list.")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per case; the best is reported.")
+
+    def best_of(self, repeat, func):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - started)
+        return min(timings), result
+
+    def handle(self, *args, **options):
+        count, repeat = options['products'], options['repeat']
+        with transaction.atomic():
+            state = seed(products=count, cart_items=0)
+            reader = ProductReadSerializer()
+            rows = Product.objects.filter(id__in=state['products'] + state['deletable']).order_by('name', 'id')
+            data = {'next': None, 'previous': None, 'results': reader.many(rows.values(*reader.columns))}
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{count} products, best of {repeat}:")
+        baseline = None
+        for label, renderer in (("JSONRenderer", JSONRenderer()), ("FastJSONRenderer", FastJSONRenderer())):
+            elapsed, content = self.best_of(repeat, lambda: renderer.render(data))
+            baseline = baseline or elapsed
+            self.stdout.write(
+                f"  render {label:<22} {elapsed * 1000:8.1f} ms  {baseline / elapsed:5.1f}x  {len(content):>10,} bytes"
+            )
+
+        self.stdout.write(f"  {'identity':<29} {'':>8}            {len(content):>10,} bytes")
+        for coding in compression.COMPRESSORS:
+            elapsed, compressed = self.best_of(repeat, lambda: compression.compress(content, coding))
+            self.stdout.write(
+                f"  {coding:<29} {elapsed * 1000:8.1f} ms  {len(content) / len(compressed):5.1f}x  "
+                f"{len(compressed):>10,} bytes"
+            )
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from products.models import Product
+from products.serializers import ProductReadSerializer, ProductSerializer
+from shopping_cart_api.bench import seed
+
+
+class Command(BaseCommand):
+    help = "Compare ProductSerializer with the fast read path on a seeded catalogue (rolled back afterwards)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10000, help="Number of products to seed.")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per serializer; the best is reported.")
+
+    def best_of(self, repeat, func):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
+
+    def handle(self, *args, **options):
+        count, repeat = options['products'], options['repeat']
+        with transaction.atomic():
+            state = seed(products=count, cart_items=0)
+            ids = state['products'] + state['deletable']
+            queryset = Product.objects.filter(id__in=ids).order_by('name', 'id')
+            full = ProductReadSerializer()
+            sparse = ProductReadSerializer({'id', 'name', 'price'})
+
+            cases = [
+                ("ProductSerializer", lambda: ProductSerializer(list(queryset), many=True).data),
+                ("ProductReadSerializer", lambda: full.many(queryset.values(*full.columns))),
+                ("ProductReadSerializer fields=id,name,price", lambda: sparse.many(queryset.values(*sparse.columns))),
+            ]
+            baseline = None
+            self.stdout.write(f"{count} products, best of {repeat} (query + serialization):")
+            for label, func in cases:
+                elapsed = self.best_of(repeat, func)
+                baseline = baseline or elapsed
+                self.stdout.write(f"  {label:<45} {elapsed * 1000:8.1f} ms  {baseline / elapsed:5.1f}x")
+            transaction.set_rollback(True)
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from products.bulk import FORMATS, export_products
+
+
+class Command(BaseCommand):
+    help = "Stream the product catalogue to an NDJSON or CSV file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help="Output file, or '-' for standard output.")
+        parser.add_argument('--format', choices=FORMATS, help="File format (defaults to the file extension).")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('csv' if path.endswith('.csv') else 'ndjson')
+
+        if path == '-':
+            for chunk in export_products(file_format):
+                self.stdout.write(chunk, ending='')
+            return
+        try:
+            with open(path, 'w', encoding='utf-8', newline='') as handle:
+                handle.writelines(export_products(file_format))
+        except OSError as exc:
+            raise CommandError(f"Cannot write {path}: {exc}")
+        self.stderr.write(self.style.SUCCESS(f"Exported products to {path}."))
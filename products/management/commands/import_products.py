@@ -0,0 +1,39 @@
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from products.bulk import FORMATS, import_products, iter_rows
+
+
+class Command(BaseCommand):
+    help = "Stream products from an NDJSON or CSV file and upsert them in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for standard input.")
+        parser.add_argument('--format', choices=FORMATS, help="File format (defaults to the file extension).")
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=getattr(settings, 'PRODUCTS_IMPORT_CHUNK_SIZE', 1000),
+            help="Rows validated and written per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('csv' if path.endswith('.csv') else 'ndjson')
+
+        if path == '-':
+            report = import_products(iter_rows(sys.stdin.buffer, file_format), chunk_size=options['chunk_size'])
+        else:
+            try:
+                with open(path, 'rb') as handle:
+                    report = import_products(iter_rows(handle, file_format), chunk_size=options['chunk_size'])
+            except OSError as exc:
+                raise CommandError(f"Cannot read {path}: {exc}")
+
+        for error in report['errors']:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['imported']} products, rejected {report['rejected']}."
+        ))
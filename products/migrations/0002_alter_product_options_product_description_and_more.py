@@ -0,0 +1,47 @@
+# Generated by Django 5.1.3 on 2026-10-18 17:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='product',
+            options={'ordering': ['name'], 'verbose_name': 'Product', 'verbose_name_plural': 'Products'},
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='description',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='stock',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='image_desktop',
+            field=models.URLField(verbose_name='Desktop Image URL'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='image_mobile',
+            field=models.URLField(verbose_name='Mobile Image URL'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='image_tablet',
+            field=models.URLField(verbose_name='Tablet Image URL'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='image_thumbnail',
+            field=models.URLField(verbose_name='Thumbnail Image URL'),
+        ),
+    ]
@@ -4,6 +4,7 @@ from django.db import models
 class Product(models.Model):
     name = models.CharField(max_length=255)
     category = models.CharField(max_length=255)
+    category_key = models.CharField(max_length=255, editable=False, default='')
     price = models.DecimalField(max_digits=10, decimal_places=2)
     image_thumbnail = models.URLField(verbose_name="Thumbnail Image URL")
     image_mobile = models.URLField(verbose_name="Mobile Image URL")
@@ -11,14 +12,33 @@ class Product(models.Model):
     image_desktop = models.URLField(verbose_name="Desktop Image URL")
     stock = models.PositiveIntegerField(default=0) 
     description = models.TextField(blank=True, null=True)  
+    # Last change, the validator for conditional requests. Queryset updates
+    # and bulk upserts set it explicitly.
+    updated = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "Product"
         verbose_name_plural = "Products"
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['category_key', 'price'], name='product_category_price_idx'),
+            models.Index(fields=['name', 'id'], name='product_name_id_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @staticmethod
+    def normalize_category(value):
+        """Case-fold and collapse whitespace so category lookups can be exact."""
+        return ' '.join(value.split()).casefold()
+
+    def save(self, *args, **kwargs):
+        self.category_key = self.normalize_category(self.category)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'category' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'category_key'}
+        super().save(*args, **kwargs)
+
     def is_in_stock(self):
                 return self.stock > 0
@@ -0,0 +1,168 @@
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class ProductCursorPagination(BasePagination):
+    """
+    Keyset pagination over the catalogue ordered on (name, id).
+
+    Each page is fetched with a `WHERE (name, id) > (last_name, last_id)` style
+    filter instead of OFFSET, so deep pages cost the same as the first one.
+    Cursors are opaque, url-safe tokens encoding the boundary row and the
+    direction of travel.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+    ordering = ('name', 'id')
+
+    @property
+    def page_size(self):
+        return getattr(settings, 'PRODUCTS_PAGE_SIZE', 50)
+
+    @property
+    def max_page_size(self):
+        return getattr(settings, 'PRODUCTS_MAX_PAGE_SIZE', 200)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def encode_cursor(self, name, pk, reverse):
+        payload = json.dumps({'n': name, 'i': pk, 'r': int(reverse)}, separators=(',', ':'))
+        token = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8'))
+            return str(payload['n']), int(payload['i']), bool(payload['r'])
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_page_queryset(self, queryset, request):
+        """Return the queryset slice holding this page plus one lookahead row."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size_requested = size = self.get_page_size(request)
+        self.cursor = cursor = self.decode_cursor(request)
+
+        if cursor is None:
+            queryset = queryset.order_by(*self.ordering)
+        else:
+            # Written as a bounded range on name so SQLite can seek the
+            # (name, id) index instead of scanning it.
+            name, pk, reverse = cursor
+            if reverse:
+                queryset = queryset.filter(Q(name__lte=name), Q(name__lt=name) | Q(id__lt=pk))
+                queryset = queryset.order_by('-name', '-id')
+            else:
+                queryset = queryset.filter(Q(name__gte=name), Q(name__gt=name) | Q(id__gt=pk))
+                queryset = queryset.order_by(*self.ordering)
+        return queryset[:size + 1]
+
+    def set_page(self, rows):
+        size, cursor = self.page_size_requested, self.cursor
+        has_more = len(rows) > size
+        rows = rows[:size]
+
+        if cursor is not None and cursor[2]:
+            rows.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = cursor is not None, has_more
+
+        self.page = rows
+        return rows
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.get_page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Async counterpart of paginate_queryset() using the async ORM."""
+        return self.set_page([row async for row in self.get_page_queryset(queryset, request)])
+
+    def get_position(self, row):
+        """Return the (name, id) keyset position of a model instance or values() row."""
+        if isinstance(row, dict):
+            return row['name'], row['id']
+        return row.name, row.pk
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(*self.get_position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(*self.get_position(self.page[0]), reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+class ProductSearchPagination(PageNumberPagination):
+    """
+    Page-numbered pagination for relevance-ranked search results.
+
+    Ranked results have no stable keyset to seek on, and users rarely go past
+    the first few pages of a search, so plain page numbers are used here.
+    """
+    page_size_query_param = 'page_size'
+
+    @property
+    def page_size(self):
+        return getattr(settings, 'PRODUCTS_PAGE_SIZE', 50)
+
+    @property
+    def max_page_size(self):
+        return getattr(settings, 'PRODUCTS_MAX_PAGE_SIZE', 200)
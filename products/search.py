@@ -0,0 +1,55 @@
+import re
+
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'products_product_fts'
+
+# Column weights for bm25(): a hit in the name counts more than in the description.
+BM25_WEIGHTS = (10.0, 1.0)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def is_fts_available(connection):
+    return connection.vendor == 'sqlite'
+
+
+def build_match_expression(query):
+    """
+    Turn free text into an FTS5 query matching every word as a prefix.
+
+    Only word characters are kept, so user input can never inject FTS5
+    operators or syntax errors.
+    """
+    tokens = TOKEN_RE.findall(query)
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def search_products(queryset, query, connection):
+    """Filter `queryset` to products matching `query`, best match first."""
+    tokens = TOKEN_RE.findall(query)
+    if not tokens:
+        return queryset.none()
+
+    if not is_fts_available(connection):
+        condition = Q()
+        for token in tokens:
+            condition &= Q(name__icontains=token) | Q(description__icontains=token)
+        return queryset.filter(condition).order_by('name', 'id')
+
+    # The rank subquery is correlated with each product, but its MATERIALIZED
+    # CTE runs the full-text query once per statement, not once per row
+    match = build_match_expression(query)
+    weights = ', '.join(str(weight) for weight in BM25_WEIGHTS)
+    return queryset.filter(
+        id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (match,)),
+    ).annotate(
+        rank=RawSQL(
+            f'WITH hits AS MATERIALIZED ('
+            f'SELECT rowid, bm25({FTS_TABLE}, {weights}) AS rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+            f') SELECT rank FROM hits WHERE rowid = "products_product"."id"',
+            (match,),
+            output_field=FloatField(),
+        ),
+    ).order_by('rank', 'id')
@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 from rest_framework import serializers
 from .models import Product
 
@@ -21,3 +23,53 @@ class ProductSerializer(serializers.ModelSerializer):
             'is_in_stock',
         ]
         read_only_fields = ['is_in_stock']
+
+
+class ProductReadSerializer:
+    """
+    Fast, read-only equivalent of ProductSerializer for list and detail GETs.
+
+    Works on `values()` rows and builds the output dicts directly, skipping
+    DRF's per-field `to_representation` machinery, while producing exactly
+    the same output. `fields` restricts both the output keys and the columns
+    that need to be selected.
+    """
+    all_fields = ProductSerializer.Meta.fields
+    price_quantum = Decimal('0.01')
+
+    def __init__(self, fields=None):
+        self.fields = [name for name in self.all_fields if fields is None or name in fields]
+
+    @classmethod
+    def from_query_param(cls, value):
+        """Build from a `?fields=a,b` value; raise ValueError on unknown names."""
+        if not value:
+            return cls()
+        requested = {name.strip() for name in value.split(',') if name.strip()}
+        unknown = requested - set(cls.all_fields)
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(sorted(unknown))}.")
+        return cls(requested)
+
+    @property
+    def columns(self):
+        """Database columns needed to render the selected fields."""
+        columns = [name for name in self.fields if name != 'is_in_stock']
+        if 'is_in_stock' in self.fields and 'stock' not in columns:
+            columns.append('stock')
+        return columns
+
+    def to_representation(self, row):
+        data = {}
+        for name in self.fields:
+            if name == 'price':
+                price = row['price']
+                data[name] = None if price is None else '{:f}'.format(price.quantize(self.price_quantum))
+            elif name == 'is_in_stock':
+                data[name] = row['stock'] > 0
+            else:
+                data[name] = row[name]
+        return data
+
+    def many(self, rows):
+        return [self.to_representation(row) for row in rows]
@@ -0,0 +1,43 @@
+from django.db import connections
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_catalogue
+from .models import Product
+from .search import FTS_TABLE
+
+# The sync triggers of migration 0004, which SQLite table rebuilds drop
+FTS_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON products_product BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON products_product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name, description ON products_product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+]
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, **kwargs):
+    """Invalidate cached catalogue responses on admin/shell writes."""
+    invalidate_catalogue()
+
+
+def ensure_search_index(sender, using, **kwargs):
+    """Recreate FTS triggers dropped by SQLite table rebuilds during migrate."""
+    connection = connections[using]
+    if FTS_TABLE in connection.introspection.table_names():
+        with connection.cursor() as cursor:
+            for statement in FTS_TRIGGERS:
+                cursor.execute(statement)
@@ -1,22 +1,52 @@
-from rest_framework.test import APITestCase
+import io
+import json
+import tempfile
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from decimal import Decimal
+from urllib.parse import parse_qs, urlparse
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
 from rest_framework import status
+from products.cache import CATALOGUE_VERSION_KEY, get_catalogue_cache
 from products.models import Product
+from products.serializers import ProductReadSerializer, ProductSerializer
+from products.views import AsyncProductListCreateView, AsyncProductRetrieveUpdateDestroyView, ProductListCreateView
 from cart.models import CartItem
+from shopping_cart_api.sqlite_cache import SQLiteCache
+
+
+def make_product(**overrides):
+    """Create a product with placeholder images; keyword arguments override the defaults."""
+    fields = {
+        'name': "Test Product",
+        'category': "Cat",
+        'price': 1,
+        'image_thumbnail': "http://example.com/thumbnail.jpg",
+        'image_mobile': "http://example.com/mobile.jpg",
+        'image_tablet': "http://example.com/tablet.jpg",
+        'image_desktop': "http://example.com/desktop.jpg",
+    }
+    fields.update(overrides)
+    return Product.objects.create(**fields)
+
 
 class ProductAPITests(APITestCase):
     def setUp(self):
         """
         Create a test product that will be used in the tests.
         """
-        self.product = Product.objects.create(
-            name="Test Product",
-            category="Test Category",
-            price=10.00,
-            image_thumbnail="http://example.com/thumbnail.jpg",
-            image_mobile="http://example.com/mobile.jpg",
-            image_tablet="http://example.com/tablet.jpg",
-            image_desktop="http://example.com/desktop.jpg",
-        )
+        self.product = make_product(category="Test Category", price=10.00)
+        self.admin = User.objects.create_superuser(username="admin", password="admin-pass")
+        self.client.force_authenticate(user=self.admin)
 
     def test_get_products(self):
         """
@@ -24,7 +54,7 @@ class ProductAPITests(APITestCase):
         """
         response = self.client.get('/api/products/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)  # Ensure the product is listed
+        self.assertEqual(len(response.data['results']), 1)  # Ensure the product is listed
 
     def test_create_product(self):
         """
@@ -66,3 +96,683 @@ class ProductAPITests(APITestCase):
         """
         response = self.client.delete(f'/api/products/{self.product.id}/')
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)  
+
+
+@override_settings(PRODUCTS_PAGE_SIZE=3, PRODUCTS_MAX_PAGE_SIZE=5)
+class ProductPaginationTests(APITestCase):
+    def setUp(self):
+        """
+        Create products with duplicate names so the id tie-breaker is exercised.
+        """
+        for i, name in enumerate(["Apple", "Banana", "Banana", "Banana", "Cherry", "Damson", "Elder"]):
+            make_product(name=name, category="Fruit" if i % 2 else "Veg", price=i + 1)
+        self.expected = list(Product.objects.order_by('name', 'id').values_list('id', flat=True))
+
+    def test_walk_forward_and_back(self):
+        """
+        Test following next cursors visits every product once, and previous cursors walk back.
+        """
+        seen, pages = [], []
+        url = '/api/products/'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, self.expected)
+        self.assertIsNone(pages[0]['previous'])
+
+        response = self.client.get(pages[-1]['previous'])
+        self.assertEqual(response.data['results'], pages[-2]['results'])
+
+    def test_page_size_is_capped(self):
+        """
+        Test the page_size parameter cannot exceed PRODUCTS_MAX_PAGE_SIZE.
+        """
+        response = self.client.get('/api/products/', {'page_size': 100})
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_filters_are_kept_across_pages(self):
+        """
+        Test the next cursor preserves the category filter.
+        """
+        response = self.client.get('/api/products/', {'category': 'fruit', 'page_size': 2})
+        response = self.client.get(response.data['next'])
+        self.assertTrue(all(item['category'] == 'Fruit' for item in response.data['results']))
+        self.assertIsNone(response.data['next'])
+
+    def test_invalid_cursor(self):
+        """
+        Test a malformed cursor returns 404.
+        """
+        response = self.client.get('/api/products/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ProductListCacheTests(APITestCase):
+    def setUp(self):
+        """
+        Create a product and an admin user for the write paths.
+        """
+        self.product = make_product(name="Cached Product", category="Cache", price=10.00)
+        self.admin = User.objects.create_superuser(username="admin", password="admin-pass")
+
+    def test_repeat_listing_is_served_from_cache(self):
+        """
+        Test an identical listing (with reordered parameters) runs no queries.
+        """
+        self.client.get('/api/products/', {'category': 'cache', 'min_price': '5'})
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/products/?min_price=5&category=cache')
+        self.assertEqual(response.data['results'][0]['name'], "Cached Product")
+
+    def test_api_update_invalidates_listing(self):
+        """
+        Test a PUT through the API is visible in the next listing.
+        """
+        self.client.get('/api/products/')
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.patch(f'/api/products/{self.product.id}/', {'price': '12.50'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get('/api/products/')
+        self.assertEqual(response.data['results'][0]['price'], '12.50')
+
+    def test_model_save_invalidates_listing(self):
+        """
+        Test writes outside the API (admin, shell) invalidate through signals.
+        """
+        self.client.get('/api/products/')
+        self.product.price = 7
+        self.product.save()
+        response = self.client.get('/api/products/')
+        self.assertEqual(response.data['results'][0]['price'], '7.00')
+
+        self.product.delete()
+        response = self.client.get('/api/products/')
+        self.assertEqual(response.data['results'], [])
+
+    def test_write_in_another_worker_invalidates_listing(self):
+        """
+        Test a version bump made through another process's cache connection is seen here.
+        """
+        self.client.get('/api/products/')
+        Product.objects.filter(pk=self.product.pk).update(price=3)  # No signal in this process
+        other_worker = SQLiteCache(settings.CACHES['shared']['LOCATION'], {})
+        other_worker.incr(CATALOGUE_VERSION_KEY)
+        response = self.client.get('/api/products/')
+        self.assertEqual(response.data['results'][0]['price'], '3.00')
+
+
+class ProductFilterIndexTests(APITestCase):
+    def setUp(self):
+        """
+        Create products whose categories differ only in case and spacing.
+        """
+        for name, category, price in [("Laptop", "Electronics", 900), ("Phone", " electronics ", 300), ("Mug", "Kitchen Electronics", 5)]:
+            make_product(name=name, category=category, price=price)
+
+    def get_queryset(self, params):
+        view = ProductListCreateView()
+        view.request = Request(APIRequestFactory().get('/api/products/', params))
+        return view.get_queryset()
+
+    def query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return ' '.join(row[-1] for row in cursor.fetchall())
+
+    def test_category_is_matched_exactly_and_case_insensitively(self):
+        """
+        Test category matches the normalized key, not substrings.
+        """
+        response = self.client.get('/api/products/', {'category': 'ELECTRONICS'})
+        self.assertEqual([p['name'] for p in response.data['results']], ["Laptop", "Phone"])
+
+    def test_category_contains_is_opt_in(self):
+        """
+        Test substring matching is still available through category_contains.
+        """
+        response = self.client.get('/api/products/', {'category_contains': 'electronics'})
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_category_and_price_filter_uses_index(self):
+        """
+        Test the category/price filter is answered from the composite index.
+        """
+        queryset = self.get_queryset({'category': 'electronics', 'min_price': '100', 'max_price': '500'})
+        self.assertEqual([p.name for p in queryset], ["Phone"])
+        self.assertIn('USING INDEX product_category_price_idx', self.query_plan(queryset))
+
+    def test_default_ordering_uses_index(self):
+        """
+        Test the unfiltered listing walks the (name, id) index without sorting.
+        """
+        plan = self.query_plan(self.get_queryset({}).order_by('name', 'id')[:50])
+        self.assertIn('USING INDEX product_name_id_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class ProductFacetsTests(APITestCase):
+    def setUp(self):
+        """
+        Create products across two categories with prices from 1 to 100.
+        """
+        get_catalogue_cache().clear()
+        for i in range(1, 101):
+            category = "Books" if i % 4 == 0 else " books " if i % 4 == 1 else "Games"
+            make_product(name=f"Faceted {i}", category=category, price=i, stock=1)
+
+    def test_facets_in_two_queries(self):
+        """
+        Test category counts, price range and histogram come from two aggregate queries.
+        """
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/products/facets/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 100)
+        self.assertEqual(
+            {(c['category'].strip().casefold(), c['count']) for c in response.data['categories']},
+            {('books', 50), ('games', 50)},
+        )
+        price = response.data['price']
+        self.assertEqual((price['min'], price['max']), ('1.00', '100.00'))
+        self.assertEqual(len(price['histogram']), 10)
+        self.assertEqual(sum(bucket['count'] for bucket in price['histogram']), 100)
+        self.assertEqual(price['histogram'][0], {'min': '1.00', 'max': '10.90', 'count': 10})
+        self.assertEqual(price['histogram'][-1]['max'], '100.00')
+
+    def test_facets_follow_list_filters(self):
+        """
+        Test the facets accept the same filters as the product list.
+        """
+        response = self.client.get('/api/products/facets/', {'category': 'BOOKS', 'max_price': 50, 'buckets': 5})
+        listed = self.client.get('/api/products/', {'category': 'BOOKS', 'max_price': 50, 'page_size': 200})
+        self.assertEqual(response.data['count'], len(listed.data['results']))
+        self.assertEqual(len(response.data['categories']), 1)
+        self.assertEqual(len(response.data['price']['histogram']), 5)
+
+    def test_facets_are_cached_until_catalogue_write(self):
+        """
+        Test a repeated facets request is served from cache and writes invalidate it.
+        """
+        self.client.get('/api/products/facets/')
+        with self.assertNumQueries(0):
+            self.client.get('/api/products/facets/')
+        Product.objects.filter(name="Faceted 1").first().delete()
+        self.assertEqual(self.client.get('/api/products/facets/').data['count'], 99)
+
+    def test_empty_and_invalid_requests(self):
+        """
+        Test empty result sets and bad bucket counts.
+        """
+        response = self.client.get('/api/products/facets/', {'min_price': 1000})
+        self.assertEqual(response.data, {'count': 0, 'categories': [], 'price': {'min': None, 'max': None, 'histogram': []}})
+        response = self.client.get('/api/products/facets/', {'buckets': 'many'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ProductSearchTests(APITestCase):
+    def setUp(self):
+        """
+        Create products with searchable names and descriptions.
+        """
+        rows = [
+            ("Gaming Laptop", "Fast laptop for gaming."),
+            ("Laptop Sleeve", "Neoprene sleeve."),
+            ("Desk Lamp", "Warm light, pairs well with a laptop."),
+            ("Coffee Mug", None),
+        ]
+        self.products = {}
+        for name, description in rows:
+            self.products[name] = make_product(name=name, category="Misc", price=10, description=description)
+
+    def search(self, q, **params):
+        response = self.client.get('/api/products/search/', {'q': q, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['name'] for item in response.data['results']]
+
+    def test_results_are_ranked(self):
+        """
+        Test name matches rank above description-only matches.
+        """
+        names = self.search("laptop")
+        self.assertEqual(set(names), {"Gaming Laptop", "Laptop Sleeve", "Desk Lamp"})
+        self.assertEqual(names[-1], "Desk Lamp")
+
+    def test_prefix_matching(self):
+        """
+        Test partial words match as prefixes and every word must match.
+        """
+        self.assertEqual(self.search("gam lap"), ["Gaming Laptop"])
+        self.assertEqual(self.search('"neo*'), ["Laptop Sleeve"])
+
+    def test_index_follows_writes(self):
+        """
+        Test updates, deletes and bulk inserts are reflected in the index.
+        """
+        mug = self.products["Coffee Mug"]
+        mug.description = "Ceramic mug"
+        mug.save()
+        self.assertEqual(self.search("ceramic"), ["Coffee Mug"])
+
+        mug.delete()
+        self.assertEqual(self.search("ceramic"), [])
+
+        Product.objects.bulk_create([Product(name="Ceramic Bowl", category="Misc", price=4)])
+        self.assertEqual(self.search("ceramic"), ["Ceramic Bowl"])
+
+    def test_paginated(self):
+        """
+        Test search results are paginated.
+        """
+        response = self.client.get('/api/products/search/', {'q': 'laptop', 'page_size': 2})
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_empty_query(self):
+        """
+        Test an empty query returns no results.
+        """
+        self.assertEqual(self.search(""), [])
+
+
+class ProductBulkTests(APITestCase):
+    def setUp(self):
+        """
+        Create an existing product and authenticate as an admin.
+        """
+        self.product = make_product(name="Old Name", category="Old")
+        self.admin = User.objects.create_superuser(username="admin", password="admin-pass")
+        self.client.force_authenticate(user=self.admin)
+
+    def row(self, **overrides):
+        row = {
+            "name": "Imported",
+            "category": "Imported Goods",
+            "price": "9.99",
+            "image_thumbnail": "http://example.com/thumbnail.jpg",
+            "image_mobile": "http://example.com/mobile.jpg",
+            "image_tablet": "http://example.com/tablet.jpg",
+            "image_desktop": "http://example.com/desktop.jpg",
+            "stock": 3,
+        }
+        row.update(overrides)
+        return row
+
+    def test_ndjson_import_upserts_and_reports_rejects(self):
+        """
+        Test an NDJSON body updates by id, inserts new rows and reports bad lines.
+        """
+        lines = [
+            json.dumps(self.row(id=self.product.id, name="New Name")),
+            json.dumps(self.row(name="Brand New")),
+            "not json",
+            json.dumps(self.row(price="abc")),
+        ]
+        with override_settings(PRODUCTS_IMPORT_CHUNK_SIZE=2):
+            response = self.client.generic(
+                'POST', '/api/products/import/', '\n'.join(lines), content_type='application/x-ndjson'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['imported'], 2)
+        self.assertEqual(response.data['rejected'], 2)
+        self.assertEqual([e['line'] for e in response.data['errors']], [3, 4])
+        self.assertIn('price', response.data['errors'][1]['errors'])
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.name, "New Name")
+        self.assertEqual(self.product.category_key, "imported goods")
+        self.assertTrue(Product.objects.filter(name="Brand New", stock=3).exists())
+
+    def test_csv_upload_import(self):
+        """
+        Test a multipart CSV upload is imported.
+        """
+        upload = SimpleUploadedFile(
+            "products.csv",
+            b"name,category,price,image_thumbnail,image_mobile,image_tablet,image_desktop,stock\n"
+            b"Csv Product,Csv,4.50,http://e.com/t.jpg,http://e.com/m.jpg,http://e.com/t.jpg,http://e.com/d.jpg,7\n",
+            content_type='text/csv',
+        )
+        response = self.client.post('/api/products/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.data['imported'], 1)
+        self.assertEqual(Product.objects.get(name="Csv Product").price, Decimal('4.50'))
+
+    def test_import_is_admin_only(self):
+        """
+        Test anonymous users cannot import.
+        """
+        self.client.force_authenticate(user=None)
+        response = self.client.generic('POST', '/api/products/import/', '{}', content_type='application/x-ndjson')
+        # Token authentication is tried first, so anonymous callers are challenged for a token
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_export_round_trips_through_import_command(self):
+        """
+        Test the streamed export can be re-imported with the management command.
+        """
+        response = self.client.get('/api/products/export/', {'file_format': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        body = b''.join(response.streaming_content)
+        self.assertIn(b'Old Name', body)
+
+        Product.objects.filter(pk=self.product.pk).update(name="Changed")
+        with tempfile.NamedTemporaryFile(suffix='.csv') as handle:
+            handle.write(body)
+            handle.flush()
+            call_command('import_products', handle.name, stdout=io.StringIO(), stderr=io.StringIO())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.name, "Old Name")
+
+        out = io.StringIO()
+        call_command('export_products', stdout=out)
+        self.assertEqual(json.loads(out.getvalue().splitlines()[0])['id'], self.product.id)
+
+
+class ProductReadSerializerTests(APITestCase):
+    def setUp(self):
+        """
+        Create products covering null descriptions, zero stock and rounding.
+        """
+        for name, price, stock, description in [("A", "10", 0, None), ("B", "0.5", 3, "Text"), ("C", "12345678.99", 1, "")]:
+            make_product(name=name, price=Decimal(price), stock=stock, description=description)
+
+    def test_matches_model_serializer_output(self):
+        """
+        Test the fast path renders exactly what ProductSerializer renders.
+        """
+        expected = ProductSerializer(Product.objects.all(), many=True).data
+        reader = ProductReadSerializer()
+        actual = reader.many(Product.objects.values(*reader.columns))
+        self.assertEqual(json.dumps(actual), json.dumps(expected))
+
+        response = self.client.get('/api/products/')
+        self.assertEqual(json.dumps(response.data['results']), json.dumps(expected))
+        product = Product.objects.get(name="B")
+        response = self.client.get(f'/api/products/{product.id}/')
+        self.assertEqual(response.data, ProductSerializer(product).data)
+
+    def test_sparse_fields_limit_output_and_columns(self):
+        """
+        Test ?fields= limits both the rendered keys and the selected columns.
+        """
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/products/', {'fields': 'id,price,is_in_stock'})
+        self.assertEqual(response.data['results'][0], {'id': Product.objects.get(name="A").id, 'price': '10.00', 'is_in_stock': False})
+        sql = context.captured_queries[-1]['sql']
+        self.assertNotIn('"description"', sql)
+        self.assertNotIn('"image_thumbnail"', sql)
+
+        product = Product.objects.get(name="B")
+        response = self.client.get(f'/api/products/{product.id}/', {'fields': 'name'})
+        self.assertEqual(response.data, {'name': "B"})
+
+    def test_unknown_fields_are_rejected(self):
+        """
+        Test unknown field names return 400.
+        """
+        response = self.client.get('/api/products/', {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_missing_product_returns_404(self):
+        """
+        Test the fast detail path still returns 404.
+        """
+        response = self.client.get('/api/products/999999/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class AsyncProductViewTests(APITestCase):
+    def setUp(self):
+        """
+        Create a few products and a request factory for calling the async views directly.
+        """
+        self.factory = APIRequestFactory()
+        for i in range(5):
+            make_product(name=f"Product {i}", price=Decimal("1.50") * (i + 1), stock=i)
+
+    def call(self, view_class, path, data=None, **kwargs):
+        get_catalogue_cache().clear()
+        view = view_class.as_view()
+        self.assertTrue(iscoroutinefunction(view))
+        response = async_to_sync(view)(self.factory.get(path, data), **kwargs)
+        return response.render()
+
+    def test_async_list_matches_sync_list(self):
+        """
+        Test the async list returns the same pages and cursors as the sync view.
+        """
+        params = {'page_size': 2, 'fields': 'id,name,price'}
+        expected = self.client.get('/api/products/', params).data
+        response = self.call(AsyncProductListCreateView, '/api/products/', params)
+        self.assertEqual(response.data, expected)
+
+        params['cursor'] = parse_qs(urlparse(expected['next']).query)['cursor'][0]
+        expected = self.client.get('/api/products/', params).data
+        response = self.call(AsyncProductListCreateView, '/api/products/', params)
+        self.assertEqual(response.data, expected)
+        self.assertIsNotNone(response.data['previous'])
+
+    def test_async_detail_and_errors(self):
+        """
+        Test the async detail view, including 404 and 400 responses.
+        """
+        product = Product.objects.get(name="Product 1")
+        response = self.call(AsyncProductRetrieveUpdateDestroyView, '/', pk=product.pk)
+        self.assertEqual(response.data, ProductSerializer(product).data)
+        response = self.call(AsyncProductRetrieveUpdateDestroyView, '/', pk=999999)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.call(AsyncProductListCreateView, '/api/products/', {'fields': 'secret'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_writes_still_require_admin(self):
+        """
+        Test sync handlers inherited by the async view keep their permission checks.
+        """
+        view = AsyncProductListCreateView.as_view()
+        request = self.factory.post('/api/products/', {'name': 'X'}, format='json')
+        response = async_to_sync(view)(request)
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+
+
+class ProductConditionalRequestTests(APITestCase):
+    def setUp(self):
+        """
+        Create a product and authenticate as an admin so writes are allowed.
+        """
+        self.product = make_product(name="Polled Product", price=Decimal("4.00"), stock=3)
+        self.url = f'/api/products/{self.product.pk}/'
+        self.admin = User.objects.create_superuser(username="admin", password="admin-pass")
+        self.client.force_authenticate(user=self.admin)
+        get_catalogue_cache().clear()
+
+    def test_detail_revalidates_with_one_cheap_query(self):
+        """
+        Test a matching ETag or an unchanged Last-Modified yields an empty 304 from a single query.
+        """
+        response = self.client.get(self.url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertTrue(context.captured_queries[0]['sql'].startswith('SELECT "products_product"."updated" FROM'))
+
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(self.url, {'fields': 'id,name'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_stock_changes_invalidate_the_etag(self):
+        """
+        Test a checkout decrementing stock changes the product's ETag.
+        """
+        etag = self.client.get(self.url)['ETag']
+        CartItem.objects.create(user=self.admin, product=self.product, quantity=1)
+        self.client.post('/api/cart/checkout/')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['stock'], 2)
+
+    def test_list_revalidates_without_queries(self):
+        """
+        Test the list ETag changes with the catalogue and is checked without touching the database.
+        """
+        etag = self.client.get('/api/products/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.client.patch(self.url, {'price': '5.00'}, format='json')
+        response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_etag_follows_writes_in_other_workers(self):
+        """
+        Test a catalogue version bump made through another process's cache connection invalidates the list ETag.
+        """
+        etag = self.client.get('/api/products/')['ETag']
+        other_worker = SQLiteCache(settings.CACHES['shared']['LOCATION'], {})
+        other_worker.incr(CATALOGUE_VERSION_KEY)
+        response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        view = AsyncProductListCreateView.as_view()
+        request = APIRequestFactory().get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(async_to_sync(view)(request).status_code, status.HTTP_200_OK)
+
+    def test_if_match_prevents_lost_updates(self):
+        """
+        Test writes with a stale If-Match are refused with 412 and change nothing.
+        """
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.patch(self.url, {'stock': 7}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(self.url)['ETag'], response['ETag'])
+
+        response = self.client.patch(self.url, {'stock': 1}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        response = self.client.delete(self.url, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock, 7)
+
+
+class ProductInventoryTests(APITestCase):
+    def setUp(self):
+        """
+        Create products with known stock and authenticate as an admin.
+        """
+        self.products = [
+            make_product(name=f"Stocked {i}", price=Decimal("1.00"), stock=10)
+            for i in range(4)
+        ]
+        self.admin = User.objects.create_superuser(username="admin", password="admin-pass")
+        self.client.force_authenticate(user=self.admin)
+
+    def adjust(self, adjustments):
+        return self.client.post('/api/products/inventory/', {'adjustments': adjustments}, format='json')
+
+    def stock(self):
+        return [product.stock for product in Product.objects.order_by('pk')]
+
+    def test_deltas_and_sets_report_rejected_lines(self):
+        """
+        Test deltas and sets are applied, and refused lines are listed without affecting the rest.
+        """
+        a, b, c, d = (product.pk for product in self.products)
+        with override_settings(PRODUCTS_INVENTORY_CHUNK_SIZE=3):
+            response = self.adjust([
+                {'id': a, 'delta': -4},
+                {'id': b, 'set': 2},
+                {'id': c, 'delta': -11},
+                {'id': 999999, 'delta': 1},
+                {'id': d, 'delta': 5, 'set': 1},
+                {'id': a, 'delta': 1},
+                {'id': d, 'set': -1},
+            ])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['applied'], 3)
+        self.assertEqual(response.data['rejected'], 4)
+        self.assertEqual(
+            [(error['index'], error['error']) for error in response.data['errors']],
+            [
+                (2, "Stock cannot be negative."),
+                (3, "Product not found."),
+                (4, "Give exactly one of delta or set."),
+                (6, "Stock cannot be negative."),
+            ],
+        )
+        self.assertEqual(self.stock(), [7, 2, 10, 10])
+
+    def test_repeated_products_fold_into_one_update(self):
+        """
+        Test several lines for a product apply in order, with one UPDATE per chunk.
+        """
+        a, b = self.products[0].pk, self.products[1].pk
+        adjustments = [{'id': a, 'delta': -1}] * 5 + [{'id': b, 'set': 0}, {'id': b, 'delta': 3}]
+        with CaptureQueriesContext(connection) as context:
+            response = self.adjust(adjustments)
+        updates = [q['sql'] for q in context.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(response.data['applied'], 7)
+        self.assertEqual(self.stock()[:2], [5, 3])
+
+    def test_only_the_line_that_would_go_negative_is_rejected(self):
+        """
+        Test lines for one product are checked in order, so one bad line does not reject the others.
+        """
+        a, b = self.products[0].pk, self.products[1].pk
+        response = self.adjust([
+            {'id': a, 'delta': 5},
+            {'id': a, 'delta': -100},
+            {'id': a, 'delta': -15},
+            {'id': b, 'set': 1},
+            {'id': b, 'delta': -2},
+        ])
+        self.assertEqual(response.data['applied'], 3)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 4])
+        self.assertEqual(self.stock()[:2], [0, 1])
+
+    def test_malformed_numbers_are_rejected_per_line(self):
+        """
+        Test strings that look numeric but are not integers are reported per line, not a server error.
+        """
+        a = self.products[0].pk
+        response = self.adjust([{'id': a, 'delta': '--5'}, {'id': a, 'delta': '²'}, {'id': a, 'delta': '-2'}])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['applied'], 1)
+        self.assertEqual(
+            [(error['index'], error['error']) for error in response.data['errors']],
+            [(0, "delta must be an integer."), (1, "delta must be an integer.")],
+        )
+        self.assertEqual(self.stock()[0], 8)
+
+    def test_admin_only_and_batch_limits(self):
+        """
+        Test the endpoint rejects malformed and oversized batches and non-admin callers.
+        """
+        self.assertEqual(self.adjust('nope').status_code, status.HTTP_400_BAD_REQUEST)
+        with override_settings(PRODUCTS_INVENTORY_MAX_ADJUSTMENTS=1):
+            self.assertEqual(self.adjust([{}, {}]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.client.force_authenticate(user=User.objects.create_user(username="clerk", password="pass"))
+        self.assertEqual(self.adjust([]).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_adjust_stock_command_reads_csv(self):
+        """
+        Test the management command applies a CSV file and reports rejected lines by line number.
+        """
+        a, b = self.products[0].pk, self.products[1].pk
+        with tempfile.NamedTemporaryFile(suffix='.csv') as handle:
+            handle.write(f"id,delta,set\n{a},-3,\n{b},,4\n{b},x,\n{b},--5,\n".encode())
+            handle.flush()
+            out, err = io.StringIO(), io.StringIO()
+            call_command('adjust_stock', handle.name, stdout=out, stderr=err)
+        self.assertIn("Applied 2 stock adjustments, rejected 2.", out.getvalue())
+        self.assertIn("line 4:", err.getvalue())
+        self.assertIn("line 5:", err.getvalue())
+        self.assertEqual(self.stock()[:2], [7, 4])
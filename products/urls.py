@@ -1,9 +1,30 @@
+from django.conf import settings
 from django.urls import path
-from .views import ProductListCreateView, ProductRetrieveUpdateDestroyView
+from .views import (
+    AsyncProductListCreateView,
+    AsyncProductRetrieveUpdateDestroyView,
+    ProductExportView,
+    ProductFacetsView,
+    ProductImportView,
+    ProductInventoryView,
+    ProductListCreateView,
+    ProductRetrieveUpdateDestroyView,
+    ProductSearchView,
+)
 
 app_name = 'products'
 
+if getattr(settings, 'ASYNC_API_VIEWS', False):
+    ListCreateView, DetailView = AsyncProductListCreateView, AsyncProductRetrieveUpdateDestroyView
+else:
+    ListCreateView, DetailView = ProductListCreateView, ProductRetrieveUpdateDestroyView
+
 urlpatterns = [
-    path('', ProductListCreateView.as_view(), name='product-list-create'),
-    path('<int:pk>/', ProductRetrieveUpdateDestroyView.as_view(), name='product-detail'),
+    path('', ListCreateView.as_view(), name='product-list-create'),
+    path('search/', ProductSearchView.as_view(), name='product-search'),
+    path('facets/', ProductFacetsView.as_view(), name='product-facets'),
+    path('import/', ProductImportView.as_view(), name='product-import'),
+    path('export/', ProductExportView.as_view(), name='product-export'),
+    path('inventory/', ProductInventoryView.as_view(), name='product-inventory'),
+    path('<int:pk>/', DetailView.as_view(), name='product-detail'),
 ]
@@ -1,21 +1,36 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.http import Http404, StreamingHttpResponse
 from rest_framework import generics, permissions, status
+from rest_framework.views import APIView
 from rest_framework.response import Response
 from .models import Product
-from .serializers import ProductSerializer
+from .serializers import ProductReadSerializer, ProductSerializer
+from .pagination import ProductCursorPagination, ProductSearchPagination
+from .search import search_products
+from .facets import compute_facets
+from .inventory import adjust_stock
+from .bulk import FORMATS, export_products, import_products, iter_rows
+from .cache import catalogue_cache_key, get_catalogue_cache, invalidate_catalogue
+from shopping_cart_api.async_views import AsyncAPIViewMixin
+from shopping_cart_api.conditional import (
+    is_conditional, make_etag, not_modified, precondition_failed, set_validators,
+)
 
-# List and Create Products
-class ProductListCreateView(generics.ListCreateAPIView):
-    queryset = Product.objects.all()
-    serializer_class = ProductSerializer
+class ProductFilterMixin:
+    """Catalogue filters shared by the product list and its facets."""
 
-    def get_queryset(self):
-        queryset = super().get_queryset()
+    def filter_catalogue(self, queryset):
         category = self.request.query_params.get('category', None)
+        category_contains = self.request.query_params.get('category_contains', None)
         min_price = self.request.query_params.get('min_price', None)
         max_price = self.request.query_params.get('max_price', None)
 
         if category:
-            queryset = queryset.filter(category__icontains=category)
+            queryset = queryset.filter(category_key=Product.normalize_category(category))
+        if category_contains:
+            # Substring matching cannot use an index, so it is opt-in only
+            queryset = queryset.filter(category__icontains=category_contains)
         if min_price:
             try:
                 queryset = queryset.filter(price__gte=float(min_price))
@@ -29,6 +44,47 @@ class ProductListCreateView(generics.ListCreateAPIView):
 
         return queryset
 
+# List and Create Products
+class ProductListCreateView(ProductFilterMixin, generics.ListCreateAPIView):
+    queryset = Product.objects.all()
+    serializer_class = ProductSerializer
+    pagination_class = ProductCursorPagination
+    throttle_scope = 'catalogue'
+
+    def get_queryset(self):
+        return self.filter_catalogue(super().get_queryset())
+
+    def get_rows_queryset(self, reader):
+        # The keyset paginator needs name and id even when they are not rendered
+        columns = set(reader.columns) | {'name', 'id'}
+        return self.filter_queryset(self.get_queryset()).values(*columns)
+
+    def cache_response(self, key, response):
+        cache = get_catalogue_cache()
+        cache.set(key, response.data, timeout=getattr(settings, 'PRODUCTS_CACHE_TIMEOUT', 300))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        # The cache key embeds the catalogue version that every worker shares,
+        # so it changes with any worker's write and doubles as the ETag.
+        # Deletions leave no modification time, so there is no Last-Modified.
+        key = catalogue_cache_key('list', request)
+        etag = make_etag(key)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        data = get_catalogue_cache().get(key)
+        if data is not None:
+            return set_validators(Response(data), etag)
+
+        try:
+            reader = ProductReadSerializer.from_query_param(request.query_params.get('fields'))
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        page = self.paginate_queryset(self.get_rows_queryset(reader))
+        return set_validators(self.cache_response(key, self.get_paginated_response(reader.many(page))), etag)
+
     def get_permissions(self):
         if self.request.method == 'POST':
             return [permissions.IsAdminUser()]
@@ -39,21 +95,236 @@ class ProductListCreateView(generics.ListCreateAPIView):
         if 'stock' in data and int(data['stock']) < 0:
             return Response({"error": "Stock cannot be negative."}, status=status.HTTP_400_BAD_REQUEST)
         
-        return super().create(request, *args, **kwargs)
+        response = super().create(request, *args, **kwargs)
+        invalidate_catalogue()
+        return response
 
 # Retrieve, Update, and Delete Products
 class ProductRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
+    throttle_scope = 'catalogue'
 
     def get_permissions(self):
         if self.request.method in ['PUT', 'DELETE']:
             return [permissions.IsAdminUser()]
         return [permissions.AllowAny()]
 
+    def product_etag(self, pk, updated, reader):
+        # Each ?fields= selection is a different representation
+        return make_etag('product', pk, updated.isoformat(), ','.join(reader.fields))
+
+    def get_updated(self, pk):
+        """The product's modification time: one primary key lookup, no row loaded."""
+        updated = self.get_queryset().filter(pk=pk).order_by('pk').values_list('updated', flat=True).first()
+        if updated is None:
+            raise Http404
+        return updated
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            reader = ProductReadSerializer.from_query_param(request.query_params.get('fields'))
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if is_conditional(request):
+            updated = self.get_updated(kwargs['pk'])
+            response = not_modified(request, self.product_etag(kwargs['pk'], updated, reader), updated)
+            if response is not None:
+                return response
+
+        row = self.get_queryset().filter(pk=kwargs['pk']).values(*reader.columns, 'updated').first()
+        if row is None:
+            raise Http404
+        return set_validators(
+            Response(reader.to_representation(row)),
+            self.product_etag(kwargs['pk'], row['updated'], reader), row['updated'],
+        )
+
+    def check_preconditions(self, request, pk):
+        """Return a 412 response if the client's If-Match or If-Unmodified-Since no longer holds."""
+        if 'If-Match' not in request.headers and 'If-Unmodified-Since' not in request.headers:
+            return None
+        updated = self.get_updated(pk)
+        return precondition_failed(request, self.product_etag(pk, updated, ProductReadSerializer()), updated)
+
     def update(self, request, *args, **kwargs):
         data = request.data
         if 'stock' in data and int(data['stock']) < 0:
             return Response({"error": "Stock cannot be negative."}, status=status.HTTP_400_BAD_REQUEST)
-        
-        return super().update(request, *args, **kwargs)
+
+        # The check and the write share a transaction, so nothing can change in between
+        with transaction.atomic():
+            failed = self.check_preconditions(request, kwargs['pk'])
+            if failed is not None:
+                return failed
+            response = super().update(request, *args, **kwargs)
+        invalidate_catalogue()
+        product = self.saved
+        return set_validators(
+            response, self.product_etag(product.pk, product.updated, ProductReadSerializer()), product.updated,
+        )
+
+    def perform_update(self, serializer):
+        self.saved = serializer.save()
+
+    def destroy(self, request, *args, **kwargs):
+        with transaction.atomic():
+            failed = self.check_preconditions(request, kwargs['pk'])
+            if failed is not None:
+                return failed
+            response = super().destroy(request, *args, **kwargs)
+        invalidate_catalogue()
+        return response
+
+# Full-text Product Search
+class ProductSearchView(generics.ListAPIView):
+    queryset = Product.objects.all()
+    serializer_class = ProductSerializer
+    pagination_class = ProductSearchPagination
+    permission_classes = [permissions.AllowAny]
+    throttle_scope = 'catalogue'
+
+    def get_queryset(self):
+        query = self.request.query_params.get('q', '')
+        return search_products(super().get_queryset(), query, connection)
+
+# Category Counts and Price Histogram for the Current Filters
+class ProductFacetsView(ProductFilterMixin, APIView):
+    permission_classes = [permissions.AllowAny]
+    throttle_scope = 'catalogue'
+
+    def get(self, request, *args, **kwargs):
+        key = catalogue_cache_key('facets', request)
+        cache = get_catalogue_cache()
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        default_buckets = getattr(settings, 'PRODUCTS_FACET_PRICE_BUCKETS', 10)
+        try:
+            buckets = int(request.query_params.get('buckets', default_buckets))
+        except ValueError:
+            buckets = 0
+        if not 1 <= buckets <= 50:
+            return Response({"error": "buckets must be an integer from 1 to 50."}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = compute_facets(self.filter_catalogue(Product.objects.all()), buckets)
+        cache.set(key, data, timeout=getattr(settings, 'PRODUCTS_CACHE_TIMEOUT', 300))
+        return Response(data)
+
+# Streaming Bulk Import (admin only)
+class ProductImportView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get_file_format(self, request, filename=''):
+        file_format = request.query_params.get('file_format')
+        if file_format:
+            return file_format
+        if filename.endswith('.csv') or request.content_type.startswith('text/csv'):
+            return 'csv'
+        return 'ndjson'
+
+    def post(self, request, *args, **kwargs):
+        if request.content_type.startswith('multipart/form-data'):
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response({"error": "No file uploaded."}, status=status.HTTP_400_BAD_REQUEST)
+            lines, file_format = iter(upload), self.get_file_format(request, upload.name)
+        else:
+            # Read the raw body line by line instead of parsing it into request.data
+            stream = request.stream
+            lines = iter(stream.readline, b'') if stream is not None else iter(())
+            file_format = self.get_file_format(request)
+
+        if file_format not in FORMATS:
+            return Response({"error": f"Unsupported format '{file_format}'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        chunk_size = getattr(settings, 'PRODUCTS_IMPORT_CHUNK_SIZE', 1000)
+        report = import_products(iter_rows(lines, file_format), chunk_size=chunk_size)
+        return Response(report, status=status.HTTP_200_OK)
+
+
+# Batched Stock Adjustments (admin only)
+class ProductInventoryView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request, *args, **kwargs):
+        adjustments = request.data.get('adjustments') if isinstance(request.data, dict) else None
+        if not isinstance(adjustments, list):
+            return Response({"error": "adjustments must be a list."}, status=status.HTTP_400_BAD_REQUEST)
+        max_adjustments = getattr(settings, 'PRODUCTS_INVENTORY_MAX_ADJUSTMENTS', 10000)
+        if len(adjustments) > max_adjustments:
+            return Response(
+                {"error": f"A batch may contain at most {max_adjustments} adjustments."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        chunk_size = getattr(settings, 'PRODUCTS_INVENTORY_CHUNK_SIZE', 1000)
+        report = adjust_stock(enumerate(adjustments), chunk_size=chunk_size)
+        return Response(report, status=status.HTTP_200_OK)
+
+
+# Streaming Bulk Export (admin only)
+class ProductExportView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        file_format = request.query_params.get('file_format', 'ndjson')
+        if file_format not in FORMATS:
+            return Response({"error": f"Unsupported format '{file_format}'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        content_type = 'text/csv' if file_format == 'csv' else 'application/x-ndjson'
+        response = StreamingHttpResponse(export_products(file_format), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="products.{file_format}"'
+        return response
+
+
+# Async Catalogue Reads (served when ASYNC_API_VIEWS is enabled)
+class AsyncProductListCreateView(AsyncAPIViewMixin, ProductListCreateView):
+    async def get(self, request, *args, **kwargs):
+        # The catalogue cache is in-process and the shared version one local
+        # SQLite lookup, so both are read directly rather than through aget(),
+        # which would hop to a thread.
+        key = catalogue_cache_key('list', request)
+        etag = make_etag(key)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+        data = get_catalogue_cache().get(key)
+        if data is not None:
+            return set_validators(Response(data), etag)
+
+        try:
+            reader = ProductReadSerializer.from_query_param(request.query_params.get('fields'))
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        page = await self.paginator.apaginate_queryset(self.get_rows_queryset(reader), request, view=self)
+        return set_validators(self.cache_response(key, self.get_paginated_response(reader.many(page))), etag)
+
+
+class AsyncProductRetrieveUpdateDestroyView(AsyncAPIViewMixin, ProductRetrieveUpdateDestroyView):
+    async def get(self, request, *args, **kwargs):
+        try:
+            reader = ProductReadSerializer.from_query_param(request.query_params.get('fields'))
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if is_conditional(request):
+            updated = await (
+                self.get_queryset().filter(pk=kwargs['pk']).order_by('pk').values_list('updated', flat=True).afirst()
+            )
+            if updated is None:
+                raise Http404
+            response = not_modified(request, self.product_etag(kwargs['pk'], updated, reader), updated)
+            if response is not None:
+                return response
+
+        row = await self.get_queryset().filter(pk=kwargs['pk']).values(*reader.columns, 'updated').afirst()
+        if row is None:
+            raise Http404
+        return set_validators(
+            Response(reader.to_representation(row)),
+            self.product_etag(kwargs['pk'], row['updated'], reader), row['updated'],
+        )
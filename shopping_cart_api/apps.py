@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+class ShoppingCartApiConfig(AppConfig):
+    name = 'shopping_cart_api'
+
+    def ready(self):
+        from . import signals
+        # post_migrate is only sent for apps with models, which this one has none of
+        post_migrate.connect(signals.enable_wal, dispatch_uid='shopping_cart_api.enable_wal')
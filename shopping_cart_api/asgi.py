@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'shopping_cart_api.settings')
 
 application = get_asgi_application()
+
+# Background purge of abandoned carts, when CART_PURGE_INTERVAL is set
+from cart.purge import start_purge_scheduler  # noqa: E402 (needs the app registry)
+
+start_purge_scheduler()
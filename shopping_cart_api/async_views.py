@@ -0,0 +1,67 @@
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.utils.functional import classproperty
+from rest_framework import permissions
+
+
+class AsyncAPIViewMixin:
+    """
+    Dispatch a DRF view on the event loop when served over ASGI.
+
+    DRF's dispatch() is synchronous, so under ASGI every request to a plain
+    APIView is handed to a worker thread for its whole lifetime. Views using
+    this mixin have a coroutine dispatch(): handlers written with `async def`
+    are awaited directly, while inherited sync handlers (typically writes that
+    need a transaction) run initial() and the handler in a single thread hop.
+
+    Authentication is lazy for async handlers whose permissions are all
+    AllowAny, so anonymous catalogue reads never leave the event loop for it.
+    """
+
+    @classproperty
+    def view_is_async(cls):
+        return True
+
+    def requires_sync_initial(self):
+        """Whether initial() may touch the database (user lookup, throttles)."""
+        # Throttles without a rate for this view never look at the request
+        if any(getattr(throttle, 'is_active', lambda view: True)(self) for throttle in self.get_throttles()):
+            return True
+        return not all(isinstance(permission, permissions.AllowAny) for permission in self.get_permissions())
+
+    def run_sync_handler(self, handler, request, *args, **kwargs):
+        self.initial(request, *args, **kwargs)
+        return handler(request, *args, **kwargs)
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            if iscoroutinefunction(handler):
+                await self.ainitial(request, *args, **kwargs)
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(self.run_sync_handler)(handler, request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def ainitial(self, request, *args, **kwargs):
+        """Run initial(), staying on the event loop when it cannot hit the database."""
+        if self.requires_sync_initial():
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            return
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+        request.accepted_renderer, request.accepted_media_type = self.perform_content_negotiation(request)
+        request.version, request.versioning_scheme = self.determine_version(request, *args, **kwargs)
+        self.check_permissions(request)
@@ -0,0 +1,361 @@
+"""
+In-process benchmark of every API route against a seeded catalogue.
+
+Used by `manage.py bench`. Each scenario drives one route through the test
+client and records latency percentiles, throughput, SQL queries per request
+and the peak memory allocated while serving a request.
+"""
+import base64
+import json
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import django
+from django.contrib.auth.models import User
+from django.db import connection
+from rest_framework.test import APIClient
+
+from accounts.authentication import TokenAuthentication
+from accounts.models import AuthToken
+from cart.models import CartItem
+from products.cache import get_catalogue_cache
+from products.models import Product
+
+# Metrics checked by compare(), with whether they get the latency tolerance.
+# Query counts are deterministic, so any increase is a regression.
+BUDGETED_METRICS = {
+    'p95_ms': True,
+    'p99_ms': True,
+    'queries_per_request': False,
+    'peak_memory_kb': True,
+}
+
+
+class Scenario:
+    """
+    One route exercised with requests built by `build(i, state) -> (path, kwargs)`.
+
+    `prepare(i, state)`, if given, runs untimed before each request.
+    """
+
+    def __init__(self, name, method, build, requests=None, pool=None, prepare=None):
+        self.name = name
+        self.method = method
+        self.build = build
+        self.requests = requests
+        self.pool = pool  # state key of ids consumed one per request, if any
+        self.prepare = prepare
+
+    def request_count(self, default, state):
+        count = min(default, self.requests) if self.requests else default
+        if self.pool:
+            count = min(count, len(state[self.pool]))
+        return count
+
+
+def product_payload(i):
+    return {
+        'name': f"Bench Created {i}",
+        'category': f"Category {i % 20}",
+        'price': '19.99',
+        'stock': 100,
+        'description': "Created by the benchmark.",
+        'image_thumbnail': f"https://cdn.example.com/new/{i}/thumbnail.jpg",
+        'image_mobile': f"https://cdn.example.com/new/{i}/mobile.jpg",
+        'image_tablet': f"https://cdn.example.com/new/{i}/tablet.jpg",
+        'image_desktop': f"https://cdn.example.com/new/{i}/desktop.jpg",
+    }
+
+
+# Smallest seed every scenario can run against: checkout fills the cart with
+# CHECKOUT_LINES products outside the tenth kept for the delete scenario, and
+# cart:update needs a seeded line
+CHECKOUT_LINES = 10
+MIN_PRODUCTS = 20
+MIN_CART_ITEMS = 1
+
+
+def fill_cart(i, state, lines=CHECKOUT_LINES):
+    """Replace the cart with `lines` lines, so each checkout orders the same amount."""
+    CartItem.objects.filter(user=state['user']).delete()
+    CartItem.objects.bulk_create(
+        CartItem(user=state['user'], product_id=product_id, quantity=1)
+        for product_id in random.sample(state['products'], lines)
+    )
+
+
+def import_body(i, rows=100):
+    lines = (
+        json.dumps(dict(product_payload(i * rows + n), name=f"Bench Imported {i}-{n}"))
+        for n in range(rows)
+    )
+    return '\n'.join(lines)
+
+
+SCENARIOS = [
+    Scenario('home', 'get', lambda i, s: ('/', {})),
+    Scenario('products:list', 'get', lambda i, s: ('/api/products/', {'data': {'min_price': i % 997}})),
+    Scenario('products:list-cached', 'get', lambda i, s: ('/api/products/', {})),
+    Scenario('products:list-category', 'get', lambda i, s: (
+        '/api/products/', {'data': {'category': f"category {i % 20}", 'max_price': 1000 - i % 997}},
+    )),
+    Scenario('products:detail', 'get', lambda i, s: (f"/api/products/{random.choice(s['products'])}/", {})),
+    Scenario('products:detail-304', 'get', lambda i, s: (
+        f"/api/products/{s['products'][0]}/", {'HTTP_IF_NONE_MATCH': s['etags']['product']},
+    )),
+    Scenario('products:search', 'get', lambda i, s: ('/api/products/search/', {'data': {'q': f"product {i}"}})),
+    Scenario('products:facets', 'get', lambda i, s: ('/api/products/facets/', {'data': {'min_price': i % 997}})),
+    Scenario('products:facets-category', 'get', lambda i, s: (
+        '/api/products/facets/', {'data': {'category': f"category {i % 20}", 'max_price': 1000 - i % 997}},
+    )),
+    Scenario('products:export', 'get', lambda i, s: ('/api/products/export/', {}), requests=3),
+    Scenario('cart:list', 'get', lambda i, s: ('/api/cart/', {}), requests=20),
+    Scenario('cart:list-304', 'get', lambda i, s: ('/api/cart/', {'HTTP_IF_NONE_MATCH': s['etags']['cart']})),
+    Scenario('cart:detail', 'get', lambda i, s: (f"/api/cart/cart/{random.choice(s['cart_items'])}/", {})),
+    Scenario('schema:json', 'get', lambda i, s: ('/swagger.json', {})),
+    Scenario('schema:yaml', 'get', lambda i, s: ('/swagger.yaml', {})),
+    Scenario('docs:swagger', 'get', lambda i, s: ('/swagger/', {})),
+    Scenario('docs:redoc', 'get', lambda i, s: ('/redoc/', {})),
+    Scenario('admin:index', 'get', lambda i, s: ('/admin/', {})),
+    Scenario('metrics', 'get', lambda i, s: ('/metrics', {})),
+    # Basic authentication runs the full password hash, so keep this one short
+    Scenario('auth:issue', 'post', lambda i, s: ('/api/auth/token/', {'HTTP_AUTHORIZATION': s['basic']}), requests=10),
+    Scenario('auth:refresh', 'post', lambda i, s: (
+        '/api/auth/token/refresh/', {'HTTP_AUTHORIZATION': f"Token {s['tokens'].pop()}"},
+    ), pool='tokens'),
+    Scenario('auth:revoke', 'post', lambda i, s: (
+        '/api/auth/token/revoke/', {'HTTP_AUTHORIZATION': f"Token {s['revocable'].pop()}"},
+    ), pool='revocable'),
+    Scenario('products:create', 'post', lambda i, s: ('/api/products/', {'data': product_payload(i), 'format': 'json'})),
+    Scenario('products:update', 'put', lambda i, s: (
+        f"/api/products/{random.choice(s['products'])}/", {'data': product_payload(i), 'format': 'json'},
+    )),
+    Scenario('products:import', 'generic', lambda i, s: (
+        '/api/products/import/', {'data': import_body(i), 'content_type': 'application/x-ndjson'},
+    ), requests=20),
+    Scenario('products:inventory', 'post', lambda i, s: ('/api/products/inventory/', {'data': {'adjustments': [
+        {'id': product_id, 'delta': random.randint(-3, 10)} for product_id in random.sample(s['products'], min(1000, len(s['products'])))
+    ]}, 'format': 'json'}), requests=20),
+    Scenario('cart:add', 'post', lambda i, s: (
+        '/api/cart/', {'data': {'product_id': random.choice(s['products']), 'quantity': 1}, 'format': 'json'},
+    )),
+    Scenario('cart:batch', 'post', lambda i, s: ('/api/cart/batch/', {'data': {'operations': [
+        {'op': 'add', 'product_id': random.choice(s['products']), 'quantity': 1} for _ in range(20)
+    ]}, 'format': 'json'})),
+    Scenario('cart:update', 'put', lambda i, s: (
+        f"/api/cart/cart/{random.choice(s['cart_items'])}/", {'data': {'quantity': 2}, 'format': 'json'},
+    )),
+    Scenario('cart:delete', 'delete', lambda i, s: (f"/api/cart/cart/{s['cart_items'].pop()}/", {}), pool='cart_items'),
+    Scenario('products:delete', 'delete', lambda i, s: (
+        f"/api/products/{s['deletable'].pop()}/", {},
+    ), pool='deletable'),
+    # Last: every checkout replaces the seeded cart
+    Scenario('cart:checkout', 'post', lambda i, s: ('/api/cart/checkout/', {'HTTP_IDEMPOTENCY_KEY': f'bench-{i}'}),
+             prepare=fill_cart),
+]
+
+
+def seed(products, cart_items, user=None, batch_size=5000):
+    """
+    Seed `products` products and `cart_items` lines in `user`'s cart; return the bench state.
+
+    Cart lines use the first products; the last ones are kept out of the cart
+    so the delete scenario can remove them.
+    """
+    last_id = Product.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    for start in range(0, products, batch_size):
+        Product.objects.bulk_create(
+            Product(
+                name=f"Bench Product {i}",
+                category=f"Category {i % 20}",
+                category_key=f"category {i % 20}",
+                price=i % 1000 + 0.99,
+                stock=1000,
+                description=f"Benchmark product {i} description.",
+                image_thumbnail=f"https://cdn.example.com/{i}/thumbnail.jpg",
+                image_mobile=f"https://cdn.example.com/{i}/mobile.jpg",
+                image_tablet=f"https://cdn.example.com/{i}/tablet.jpg",
+                image_desktop=f"https://cdn.example.com/{i}/desktop.jpg",
+            )
+            for i in range(start, min(start + batch_size, products))
+        )
+    ids = list(Product.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True))
+    in_cart = ids[:min(cart_items, len(ids))]
+    CartItem.objects.bulk_create(
+        (CartItem(user=user, product_id=pk, quantity=1) for pk in in_cart), batch_size=batch_size,
+    )
+    cart_ids = list(CartItem.objects.filter(user=user, product_id__in=in_cart).values_list('id', flat=True))
+    return {
+        'user': user,
+        'products': ids[:len(ids) - len(ids) // 10],
+        'deletable': ids[len(ids) - len(ids) // 10:],
+        'cart_items': cart_ids,
+    }
+
+
+@contextmanager
+def count_queries():
+    counter = [0]
+
+    def wrapper(execute, sql, params, many, context):
+        counter[0] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield counter
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def send(client, scenario, i, state):
+    path, kwargs = scenario.build(i, state)
+    kwargs = {'HTTP_AUTHORIZATION': state['authorization'], **kwargs}
+    if scenario.method == 'generic':
+        response = client.generic('POST', path, kwargs.pop('data'), **kwargs)
+    else:
+        response = getattr(client, scenario.method)(path, **kwargs)
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response.status_code
+
+
+def run_scenario(client, scenario, state, requests):
+    """Run `scenario` and return its metrics, or None if its pool of ids is used up."""
+    count = scenario.request_count(requests, state)
+    if not count:
+        return None
+    timings, queries, statuses = [], [], {}
+    started = time.perf_counter()
+    for i in range(count):
+        if scenario.prepare:
+            scenario.prepare(i, state)
+        with count_queries() as counter:
+            request_started = time.perf_counter()
+            code = send(client, scenario, i, state)
+            timings.append(time.perf_counter() - request_started)
+        queries.append(counter[0])
+        statuses[str(code)] = statuses.get(str(code), 0) + 1
+    elapsed = time.perf_counter() - started
+
+    # Memory is traced on one extra request, since tracing slows every allocation
+    peak_kb = 0
+    if not scenario.pool or state[scenario.pool]:
+        if scenario.prepare:
+            scenario.prepare(count, state)
+        tracemalloc.start()
+        try:
+            send(client, scenario, count, state)
+            peak_kb = tracemalloc.get_traced_memory()[1] / 1024
+        finally:
+            tracemalloc.stop()
+
+    return {
+        'method': scenario.method.upper() if scenario.method != 'generic' else 'POST',
+        'requests': count,
+        'p50_ms': round(percentile(timings, 50) * 1000, 3),
+        'p95_ms': round(percentile(timings, 95) * 1000, 3),
+        'p99_ms': round(percentile(timings, 99) * 1000, 3),
+        'mean_ms': round(statistics.fmean(timings) * 1000, 3),
+        'throughput_rps': round(count / elapsed, 1),
+        'queries_per_request': max(queries),
+        'peak_memory_kb': round(peak_kb, 1),
+        'status_codes': statuses,
+    }
+
+
+def run(products, cart_items, requests, only=None, stdout=None):
+    """Seed the database, run every scenario and return the results document."""
+    random.seed(0)
+    username, password = f"bench-{time.time_ns()}", 'bench-password'
+    admin = User.objects.create_superuser(username=username, password=password)
+    state = seed(products, cart_items, admin)
+    state['basic'] = 'Basic ' + base64.b64encode(f'{username}:{password}'.encode()).decode()
+    key = AuthToken.objects.issue(admin)[1]
+    TokenAuthentication().authenticate_credentials(key)  # Measure the steady state, with the token cached
+    state['authorization'] = f'Token {key}'
+    state['tokens'] = [AuthToken.objects.issue(admin)[1] for _ in range(requests + 1)]
+    state['revocable'] = [AuthToken.objects.issue(admin)[1] for _ in range(requests + 1)]
+    client = APIClient(SERVER_NAME='localhost')
+    client.force_login(admin)  # The admin site uses the session; the API uses the token
+    get_catalogue_cache().clear()
+    # Validators for the revalidation scenarios, taken before any write
+    authorization = {'HTTP_AUTHORIZATION': state['authorization']}
+    state['etags'] = {
+        'product': client.get(f"/api/products/{state['products'][0]}/", **authorization)['ETag'],
+        'cart': client.get('/api/cart/', **authorization)['ETag'],
+    }
+
+    results = {}
+    for scenario in SCENARIOS:
+        if only and not any(scenario.name.startswith(prefix) for prefix in only):
+            continue
+        metrics = run_scenario(client, scenario, state, requests)
+        if metrics is None:
+            if stdout is not None:
+                stdout.write(f"{scenario.name:<24} skipped: no {scenario.pool} left to use")
+            continue
+        results[scenario.name] = metrics
+        if stdout is not None:
+            stdout.write(format_row(scenario.name, metrics))
+    return {
+        'meta': {
+            'products': products,
+            'cart_items': cart_items,
+            'requests': requests,
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        },
+        'endpoints': results,
+    }
+
+
+def format_header():
+    return (
+        f"{'endpoint':<24} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+        f"{'req/s':>8} {'queries':>7} {'peak KB':>9}  status"
+    )
+
+
+def format_row(name, metrics):
+    statuses = ' '.join(f'{code}x{count}' for code, count in sorted(metrics['status_codes'].items()))
+    return (
+        f"{name:<24} {metrics['requests']:>5} {metrics['p50_ms']:>9.2f} {metrics['p95_ms']:>9.2f} "
+        f"{metrics['p99_ms']:>9.2f} {metrics['throughput_rps']:>8.1f} {metrics['queries_per_request']:>7} "
+        f"{metrics['peak_memory_kb']:>9.1f}  {statuses}"
+    )
+
+
+def compare(results, baseline, tolerance):
+    """
+    Return a list of budget violations of `results` against `baseline`.
+
+    Latency and memory may exceed the baseline by `tolerance` (a fraction);
+    query counts may not grow at all. Endpoints or metrics missing from the
+    baseline are not budgeted.
+    """
+    violations = []
+    for name, budget in baseline.get('endpoints', {}).items():
+        current = results['endpoints'].get(name)
+        if current is None:
+            continue
+        for metric, tolerant in BUDGETED_METRICS.items():
+            if metric not in budget:
+                continue
+            limit = budget[metric] * (1 + tolerance) if tolerant else budget[metric]
+            if current[metric] > limit:
+                violations.append(
+                    f"{name}: {metric} {current[metric]} exceeds budget {budget[metric]}"
+                    + (f" (+{tolerance:.0%})" if tolerant else '')
+                )
+    return violations
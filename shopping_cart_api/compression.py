@@ -0,0 +1,99 @@
+"""
+Content-codings used to compress dynamic responses.
+
+gzip is always available; brotli and zstd are used when the `brotli` and
+`zstandard` packages are installed. Levels favour speed over ratio, since
+every response is compressed as it is served.
+"""
+import zlib
+
+try:
+    import brotli
+except ImportError:  # Optional: br is not offered without it
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # Optional: zstd is not offered without it
+    zstandard = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+
+class BrotliCompressor:
+    """Give brotli's streaming compressor the compress()/flush() interface of zlib."""
+
+    def __init__(self):
+        self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.finish()
+
+
+def gzip_compressor():
+    # wbits=31 writes a gzip container (with a zero mtime) instead of raw zlib
+    return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+
+def zstd_compressor():
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+
+# Streaming compressor factories by content-coding, in order of preference.
+COMPRESSORS = {}
+if zstandard is not None:
+    COMPRESSORS['zstd'] = zstd_compressor
+if brotli is not None:
+    COMPRESSORS['br'] = BrotliCompressor
+COMPRESSORS['gzip'] = gzip_compressor
+
+
+def accepted_encodings(request):
+    """Return the content-codings the client accepts, ignoring those with q=0."""
+    accepted = set()
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = part.partition(';')
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                if float(params[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding.strip():
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def negotiate(request):
+    """Return the preferred available coding the client accepts, or None."""
+    accepted = accepted_encodings(request)
+    return next((coding for coding in COMPRESSORS if coding in accepted), None)
+
+
+def compress(content, coding):
+    compressor = COMPRESSORS[coding]()
+    return compressor.compress(content) + compressor.flush()
+
+
+def compress_sequence(chunks, coding):
+    compressor = COMPRESSORS[coding]()
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def acompress_sequence(chunks, coding):
+    compressor = COMPRESSORS[coding]()
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
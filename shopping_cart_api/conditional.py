@@ -0,0 +1,72 @@
+"""
+Conditional requests for API views.
+
+Views derive a validator (an ETag, and a modification time where deletions
+cannot move it backwards) from a cheap version lookup, answer
+If-None-Match / If-Modified-Since with 304 before loading any rows, and
+refuse writes whose If-Match / If-Unmodified-Since no longer holds.
+
+ETags are compared weakly throughout, If-Match included: they describe the
+representation before content-coding, which CompressionMiddleware marks by
+weakening them.
+"""
+import hashlib
+
+from django.http import HttpResponseNotModified
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def make_etag(*parts):
+    digest = hashlib.md5(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(header, etag):
+    """Whether an If-Match/If-None-Match header value matches `etag` (weak comparison)."""
+    if etag is None:
+        return False
+    tags = parse_etags(header)
+    return '*' in tags or etag.removeprefix('W/') in {tag.removeprefix('W/') for tag in tags}
+
+
+def is_conditional(request):
+    return 'If-None-Match' in request.headers or 'If-Modified-Since' in request.headers
+
+
+def not_modified(request, etag, last_modified=None):
+    """Return a 304 response if the client's cached copy is still current, else None."""
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        fresh = etag_matches(if_none_match, etag)
+    else:
+        since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        fresh = since is not None and last_modified is not None and int(last_modified.timestamp()) <= since
+    if not fresh:
+        return None
+    return set_validators(HttpResponseNotModified(), etag, last_modified)
+
+
+def precondition_failed(request, etag, last_modified=None):
+    """Return a 412 response if the request's If-Match/If-Unmodified-Since fails, else None."""
+    if_match = request.headers.get('If-Match')
+    if if_match is not None:
+        holds = etag_matches(if_match, etag)
+    else:
+        since = parse_http_date_safe(request.headers.get('If-Unmodified-Since', ''))
+        holds = since is None or (last_modified is not None and int(last_modified.timestamp()) <= since)
+    if holds:
+        return None
+    return Response(
+        {"error": "The resource has changed since it was fetched."},
+        status=status.HTTP_412_PRECONDITION_FAILED,
+    )
+
+
+def set_validators(response, etag, last_modified=None):
+    if etag is not None:
+        response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
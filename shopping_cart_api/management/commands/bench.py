@@ -0,0 +1,63 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from shopping_cart_api import bench
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every API route in-process against a seeded catalogue (rolled back afterwards), "
+        "optionally failing when a baseline budget is exceeded."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000, help="Number of products to seed.")
+        parser.add_argument('--cart-items', type=int, default=10000, help="Number of cart lines to seed.")
+        parser.add_argument('--requests', type=int, default=200, help="Timed requests per endpoint.")
+        parser.add_argument('--only', action='append', help="Only run endpoints whose name starts with this (repeatable).")
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+        parser.add_argument('--compare', help="Baseline results JSON; exit with an error if a budget is exceeded.")
+        parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed latency/memory growth over the baseline.")
+
+    def handle(self, *args, **options):
+        if options['products'] < bench.MIN_PRODUCTS:
+            raise CommandError(f"--products must be at least {bench.MIN_PRODUCTS}.")
+        if options['cart_items'] < bench.MIN_CART_ITEMS:
+            raise CommandError(f"--cart-items must be at least {bench.MIN_CART_ITEMS}.")
+        if options['requests'] < 1:
+            raise CommandError("--requests must be at least 1.")
+
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as handle:
+                    baseline = json.load(handle)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Cannot read baseline {options['compare']}: {exc}")
+
+        self.stdout.write(
+            f"Seeding {options['products']} products and {options['cart_items']} cart items..."
+        )
+        self.stdout.write(bench.format_header())
+        with transaction.atomic():
+            results = bench.run(
+                options['products'],
+                options['cart_items'],
+                options['requests'],
+                only=options['only'],
+                stdout=self.stdout,
+            )
+            transaction.set_rollback(True)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as handle:
+                json.dump(results, handle, indent=2)
+            self.stdout.write(f"Wrote results to {options['output']}.")
+
+        if baseline is not None:
+            violations = bench.compare(results, baseline, options['tolerance'])
+            if violations:
+                raise CommandError("Budget exceeded:\n  " + "\n  ".join(violations))
+            self.stdout.write(self.style.SUCCESS("All endpoints within budget."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shopping_cart_api.schema import get_schema_dir, write_schema_files
+
+
+class Command(BaseCommand):
+    help = "Pregenerate the OpenAPI schema and its compressed variants for /swagger.json and /swagger.yaml."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', help="Directory to write to (defaults to OPENAPI_SCHEMA_DIR).")
+
+    def handle(self, *args, **options):
+        directory = options['output_dir'] or get_schema_dir()
+        try:
+            paths = write_schema_files(directory)
+        except OSError as exc:
+            raise CommandError(f"Cannot write schema to {directory}: {exc}")
+        for path in paths:
+            self.stdout.write(f"Wrote {path} ({path.stat().st_size} bytes)")
+        self.stdout.write(self.style.SUCCESS(f"Generated {len(paths)} schema files."))
@@ -0,0 +1,56 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Run in a fresh interpreter, so nothing is already imported or warmed up
+CHILD = "from shopping_cart_api.warmup import boot_report; boot_report()"
+
+
+def parse_importtime(output):
+    """Sum `-X importtime` self times (in seconds) per top-level package."""
+    packages = defaultdict(float)
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        packages[name.strip().split('.')[0]] += int(self_us) / 1e6
+    return dict(packages)
+
+
+class Command(BaseCommand):
+    help = "Time a cold start: loading the WSGI application, each warmup step, and imports per package."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=15, help="Packages to list by import time (default: 15).")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON, for comparing builds.")
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', CHILD],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(f"Startup failed:\n{result.stderr[-2000:]}")
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        imports = parse_importtime(result.stderr)
+        report['imports'] = dict(sorted(imports.items(), key=lambda item: item[1], reverse=True)[:options['top']])
+        report['import_total'] = sum(imports.values())
+        report['total'] = report['load'] + sum(report['warmup'].values())
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"Startup: {report['total'] * 1000:.1f} ms")
+        self.stdout.write(f"  load application  {report['load'] * 1000:8.1f} ms")
+        for step, seconds in report['warmup'].items():
+            self.stdout.write(f"  warm up {step:<10}{seconds * 1000:8.1f} ms")
+        self.stdout.write(f"Imports: {report['import_total'] * 1000:.1f} ms (self time, top {options['top']} packages)")
+        for package, seconds in report['imports'].items():
+            self.stdout.write(f"  {package:<18}{seconds * 1000:8.1f} ms")
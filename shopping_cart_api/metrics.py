@@ -0,0 +1,248 @@
+"""
+Per-request timing aggregates and their Prometheus exposition.
+
+PerformanceMiddleware records one RequestTiming per request and folds it into
+the process-wide `registry`. With PERF_METRICS_DIR set, every process also
+writes its cumulative aggregates to `<dir>/<pid>.json` (at most once per
+PERF_METRICS_FLUSH_INTERVAL seconds), and /metrics sums the files of all
+workers, so any gunicorn worker can answer a scrape for the whole server.
+"""
+import contextvars
+import copy
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+# Upper bounds, in seconds, of the latency histogram buckets (+Inf is implied).
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# The timing of the request being served. Context variables follow a request
+# into the threads that sync_to_async runs it in, so queries are attributed to
+# the right request under both WSGI and ASGI.
+current_timing = contextvars.ContextVar('current_timing', default=None)
+
+
+class RequestTiming:
+    __slots__ = ('started', 'view_started', 'view', 'render_started', 'render', 'db', 'queries')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.view = 0.0
+        self.render_started = None
+        self.render = 0.0
+        self.db = 0.0
+        self.queries = 0
+
+    def end_render(self):
+        self.render = time.perf_counter() - self.render_started
+
+    def server_timing(self, total):
+        return ', '.join([
+            f'db;dur={self.db * 1000:.2f};desc="{self.queries} queries"',
+            f'view;dur={self.view * 1000:.2f}',
+            f'render;dur={self.render * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper adding each query's time to the current request."""
+    timing = current_timing.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.db += time.perf_counter() - started
+        timing.queries += 1
+
+
+def install_query_recorder(connection, **kwargs):
+    """connection_created receiver; connections are reopened under CONN_MAX_AGE, so avoid duplicates."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def new_histogram():
+    return {'buckets': [0] * len(BUCKETS), 'count': 0, 'sum': 0.0}
+
+
+def observe(histogram, value):
+    for index, bound in enumerate(BUCKETS):
+        if value <= bound:
+            histogram['buckets'][index] += 1
+            break
+    histogram['count'] += 1
+    histogram['sum'] += value
+
+
+# Methods recorded as themselves; any other token a client sends is counted as
+# 'other', so it cannot add series
+METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'TRACE', 'CONNECT'})
+
+
+class MetricsRegistry:
+    """Thread-safe cumulative aggregates keyed by route name and method."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {}
+        self.last_flush = 0.0
+
+    def record(self, route, method, status, total, timing):
+        method = method if method in METHODS else 'other'
+        key = f'{route} {method}'
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {
+                    'route': route,
+                    'method': method,
+                    'duration': new_histogram(),
+                    'db_duration': new_histogram(),
+                    'queries': 0,
+                    'render_seconds': 0.0,
+                    'statuses': {},
+                }
+            observe(series['duration'], total)
+            observe(series['db_duration'], timing.db)
+            series['queries'] += timing.queries
+            series['render_seconds'] += timing.render
+            series['statuses'][str(status)] = series['statuses'].get(str(status), 0) + 1
+
+    def snapshot(self):
+        with self.lock:
+            return copy.deepcopy(self.series)
+
+    def flush(self, directory, force=False):
+        """Write this process's aggregates to `directory`, rate limited unless `force`."""
+        now = time.monotonic()
+        interval = getattr(settings, 'PERF_METRICS_FLUSH_INTERVAL', 1.0)
+        if not force and now - self.last_flush < interval:
+            return
+        self.last_flush = now
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'{os.getpid()}.json'
+        temporary = path.with_suffix('.tmp')
+        temporary.write_text(json.dumps(self.snapshot()))
+        os.replace(temporary, path)
+
+    def clear(self):
+        with self.lock:
+            self.series = {}
+
+
+registry = MetricsRegistry()
+
+
+def merge(snapshots):
+    """Sum per-process snapshots into one."""
+    merged = {}
+    for snapshot in snapshots:
+        for key, series in snapshot.items():
+            target = merged.get(key)
+            if target is None:
+                merged[key] = copy.deepcopy(series)
+                continue
+            for name in ('duration', 'db_duration'):
+                target[name]['count'] += series[name]['count']
+                target[name]['sum'] += series[name]['sum']
+                target[name]['buckets'] = [a + b for a, b in zip(target[name]['buckets'], series[name]['buckets'])]
+            target['queries'] += series['queries']
+            target['render_seconds'] += series['render_seconds']
+            for status, count in series['statuses'].items():
+                target['statuses'][status] = target['statuses'].get(status, 0) + count
+    return merged
+
+
+def clear_worker_files(directory):
+    """Remove the aggregates left in `directory` by the workers of an earlier server run."""
+    for path in Path(directory).glob('*.json'):
+        path.unlink(missing_ok=True)
+
+
+def retire_worker_file(directory, pid):
+    """
+    Keep an exited worker's aggregates under a name no new worker can reuse.
+
+    They stay in the totals, so counters never go backwards; a worker that is
+    later given the same pid would otherwise overwrite them.
+    """
+    path = Path(directory) / f'{pid}.json'
+    try:
+        os.replace(path, path.with_name(f'exited-{pid}-{time.time_ns()}.json'))
+    except FileNotFoundError:
+        pass
+
+
+def collect():
+    """Return the aggregates of every worker sharing PERF_METRICS_DIR, or of this process."""
+    directory = getattr(settings, 'PERF_METRICS_DIR', None)
+    if not directory:
+        return registry.snapshot()
+    registry.flush(directory, force=True)
+    snapshots = []
+    for path in Path(directory).glob('*.json'):
+        try:
+            snapshots.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue  # Being replaced by its worker, or removed after a restart
+    return merge(snapshots)
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_histogram(lines, name, labels, histogram):
+    cumulative = 0
+    for bound, count in zip(BUCKETS, histogram['buckets']):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram["count"]}')
+    lines.append(f'{name}_sum{{{labels}}} {histogram["sum"]}')
+    lines.append(f'{name}_count{{{labels}}} {histogram["count"]}')
+
+
+def render_prometheus(series):
+    """Render aggregates in the Prometheus text exposition format (version 0.0.4)."""
+    ordered = sorted(series.values(), key=lambda s: (s['route'], s['method']))
+    lines = [
+        '# HELP http_requests_total Requests served, by route name, method and status.',
+        '# TYPE http_requests_total counter',
+    ]
+    for s in ordered:
+        for status, count in sorted(s['statuses'].items()):
+            lines.append(
+                f'http_requests_total{{route="{escape(s["route"])}",method="{escape(s["method"])}",status="{status}"}} {count}'
+            )
+    for name, key, help_text in (
+        ('http_request_duration_seconds', 'duration', 'Wall time from the first middleware to the rendered response.'),
+        ('http_request_db_duration_seconds', 'db_duration', 'Time spent executing SQL per request.'),
+    ):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for s in ordered:
+            render_histogram(lines, name, f'route="{escape(s["route"])}",method="{escape(s["method"])}"', s[key])
+    for name, key, help_text in (
+        ('http_request_db_queries_total', 'queries', 'SQL queries executed.'),
+        ('http_request_render_seconds_total', 'render_seconds', 'Time spent rendering responses.'),
+    ):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for s in ordered:
+            lines.append(f'{name}{{route="{escape(s["route"])}",method="{escape(s["method"])}"}} {s[key]}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; 404 unless PERF_METRICS_ENABLED is on."""
+    if not getattr(settings, 'PERF_METRICS_ENABLED', False):
+        raise Http404
+    return HttpResponse(render_prometheus(collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,266 @@
+import logging
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import compression
+from .metrics import RequestTiming, current_timing, install_query_recorder, registry
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise middleware that can also run in an async middleware chain.
+
+    WhiteNoise is sync-only, and a single sync-only middleware makes Django
+    run every view below it in a thread, async views included. Static file
+    hits are still served in a thread; every other request is passed straight
+    to the next async handler.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class PerformanceMiddleware:
+    """
+    Time each request and report it in a Server-Timing header and in /metrics.
+
+    Records wall time, SQL time and query count (through a database execute
+    wrapper), view time and response render time, and aggregates them per URL
+    name. When PERF_METRICS_ENABLED is off the middleware removes itself from
+    the stack at startup, so it costs nothing.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERF_METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        connection_created.connect(install_query_recorder, dispatch_uid='perf-metrics-query-recorder')
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+        if iscoroutinefunction(self.get_response):
+            # Django adapts hooks to the handler's mode, so give it coroutines
+            # rather than have it hop to a thread for each one.
+            markcoroutinefunction(self)
+            self.process_view = self.aprocess_view
+            self.process_template_response = self.aprocess_template_response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timing = RequestTiming()
+        token = current_timing.set(timing)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timing.reset(token)
+        return self.finish(request, response, timing)
+
+    async def __acall__(self, request):
+        timing = RequestTiming()
+        token = current_timing.set(timing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timing.reset(token)
+        return self.finish(request, response, timing)
+
+    def start_view(self):
+        timing = current_timing.get()
+        if timing is not None:
+            timing.view_started = time.perf_counter()
+
+    def start_render(self, response):
+        timing = current_timing.get()
+        if timing is not None:
+            timing.render_started = time.perf_counter()
+            response.add_post_render_callback(lambda rendered: timing.end_render())
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.start_view()
+
+    def process_template_response(self, request, response):
+        return self.start_render(response)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        self.start_view()
+
+    async def aprocess_template_response(self, request, response):
+        return self.start_render(response)
+
+    def finish(self, request, response, timing):
+        ended = time.perf_counter()
+        total = ended - timing.started
+        if timing.view_started is not None:
+            timing.view = (timing.render_started or ended) - timing.view_started
+        response['Server-Timing'] = timing.server_timing(total)
+
+        # Unresolved paths share one label so scanners cannot blow up cardinality
+        match = request.resolver_match
+        route = (match.url_name or match.view_name) if match else 'unmatched'
+        registry.record(route, request.method, response.status_code, total, timing)
+        directory = getattr(settings, 'PERF_METRICS_DIR', None)
+        if directory:
+            try:
+                registry.flush(directory)
+            except OSError:
+                logger.warning("Cannot write performance metrics to %s", directory, exc_info=True)
+        return response
+
+
+class CompressionMiddleware:
+    """
+    Compress API responses with the best content-coding the client accepts.
+
+    Offers zstd and brotli when their packages are installed, and gzip
+    otherwise. Responses smaller than COMPRESSION_MIN_SIZE, of a type not in
+    COMPRESSION_CONTENT_TYPES, or that already carry a Content-Encoding (the
+    pregenerated schema, WhiteNoise's precompressed files) are left alone.
+    Streaming responses are compressed as they stream.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        self.content_types = tuple(getattr(settings, 'COMPRESSION_CONTENT_TYPES', ('application/json',)))
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+        if not response.get('Content-Type', '').startswith(self.content_types):
+            return response
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = compression.negotiate(request)
+        if coding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compression.acompress_sequence(response.streaming_content, coding)
+            else:
+                response.streaming_content = compression.compress_sequence(response.streaming_content, coding)
+            del response.headers['Content-Length']
+        else:
+            compressed = compression.compress(response.content, coding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # A strong ETag names the identity bytes; keep it usable for revalidation
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = coding
+        return response
+
+
+class LoadSheddingMiddleware:
+    """
+    Refuse requests at once with 503 and Retry-After while the process is saturated.
+
+    Counts the requests this process is serving; beyond
+    LOAD_SHED_MAX_IN_FLIGHT, new ones are answered before any session,
+    authentication or view work, so the requests already admitted keep their
+    latency and clients back off instead of queueing. Paths starting with one
+    of LOAD_SHED_EXEMPT_PATHS (monitoring) are always served. Without a limit
+    the middleware removes itself from the stack at startup.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.limit = getattr(settings, 'LOAD_SHED_MAX_IN_FLIGHT', None)
+        if not self.limit:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.retry_after = getattr(settings, 'LOAD_SHED_RETRY_AFTER', 1)
+        self.exempt_paths = tuple(getattr(settings, 'LOAD_SHED_EXEMPT_PATHS', ()))
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.admit(request):
+            return self.shed()
+        try:
+            return self.get_response(request)
+        finally:
+            self.release()
+
+    async def __acall__(self, request):
+        if not self.admit(request):
+            return self.shed()
+        try:
+            return await self.get_response(request)
+        finally:
+            self.release()
+
+    def admit(self, request):
+        if request.path_info.startswith(self.exempt_paths):
+            with self.lock:
+                self.in_flight += 1
+            return True
+        with self.lock:
+            if self.in_flight >= self.limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def shed(self):
+        response = JsonResponse({"error": "Server is busy, retry later."}, status=503)
+        response['Retry-After'] = str(self.retry_after)
+        return response
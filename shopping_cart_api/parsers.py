@@ -0,0 +1,40 @@
+import io
+import re
+
+try:
+    import orjson
+except ImportError:  # Optional: falls back to DRF's json-based parsing
+    orjson = None
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+from .renderers import FastJSONRenderer
+
+# orjson reads integers beyond 64 bits as floats, losing digits; bodies with
+# a number that long (or a long digit run inside a string) use the stock parser
+LONG_NUMBER = re.compile(rb'\d{19}')
+
+
+class FastJSONParser(JSONParser):
+    """
+    JSONParser backed by orjson.
+
+    orjson only reads UTF-8 and always rejects NaN and Infinity, so other
+    encodings and non-strict parsing are handed to the stock parser. So are
+    bodies orjson cannot read exactly (very long numbers) or rejects, which
+    the stock parser then accepts or reports with its own error.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        data = stream.read()
+        if not LONG_NUMBER.search(data):
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                pass
+        return super().parse(io.BytesIO(data), media_type, parser_context)
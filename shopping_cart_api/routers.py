@@ -0,0 +1,32 @@
+from django.db import connections
+
+
+class ReadWriteRouter:
+    """
+    Send catalogue reads to the `read` connection and everything else to `default`.
+
+    With WAL journaling a second connection can read the committed catalogue
+    while cart writes hold the write lock on `default`. Reads issued inside a
+    transaction on `default` stay on it, so a transaction always sees its own
+    uncommitted writes.
+    """
+    read_alias = 'read'
+    write_alias = 'default'
+    read_app_labels = {'products'}
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in self.read_app_labels:
+            return self.write_alias
+        if connections[self.write_alias].in_atomic_block:
+            return self.write_alias
+        return self.read_alias
+
+    def db_for_write(self, model, **hints):
+        return self.write_alias
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases are connections to the same database file
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == self.write_alias
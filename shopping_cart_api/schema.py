@@ -0,0 +1,137 @@
+import functools
+import gzip
+import hashlib
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_safe
+from drf_yasg import openapi
+from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+from drf_yasg.views import get_schema_view
+from rest_framework import permissions
+
+try:
+    import brotli
+except ImportError:  # Optional: only gzip variants are produced without it
+    brotli = None
+
+from .compression import accepted_encodings
+
+api_info = openapi.Info(
+    title="Shopping Cart API",
+    default_version="v1",
+    description="API for managing products and shopping cart.",
+    contact=openapi.Contact(email="fdzikunu@stu.ucc.edu.gh"),
+    license=openapi.License(name="MIT License"),
+)
+
+# Swagger schema view
+schema_view = get_schema_view(
+    api_info,
+    public=True,
+    permission_classes=(permissions.AllowAny,),
+)
+
+SCHEMA_FORMATS = {
+    'json': ('swagger.json', 'application/json', OpenAPICodecJson),
+    'yaml': ('swagger.yaml', 'application/yaml', OpenAPICodecYaml),
+}
+
+# File suffix of each pregenerated variant, in order of preference when serving.
+CODING_SUFFIXES = {'br': 'br', 'gzip': 'gz'}
+
+
+def generate_schema(fmt):
+    """Walk every view and serializer once and return the encoded schema."""
+    generator = schema_view.generator_class(api_info)
+    schema = generator.get_schema(request=None, public=True)
+    codec = SCHEMA_FORMATS[fmt][2](validators=[])
+    return codec.encode(schema)
+
+
+def compress(content):
+    """Return the compressed variants of `content`, keyed by content-coding."""
+    variants = {'gzip': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(content)
+    return variants
+
+
+def get_schema_dir():
+    return Path(getattr(settings, 'OPENAPI_SCHEMA_DIR', settings.BASE_DIR / 'openapi'))
+
+
+def write_schema_files(directory=None):
+    """Write every schema format and its compressed variants; return the paths written."""
+    directory = Path(directory or get_schema_dir())
+    directory.mkdir(parents=True, exist_ok=True)
+    written = []
+    for fmt, (filename, _, _) in SCHEMA_FORMATS.items():
+        content = generate_schema(fmt)
+        files = {filename: content}
+        for coding, variant in compress(content).items():
+            files[f'{filename}.{CODING_SUFFIXES[coding]}'] = variant
+        for name, data in files.items():
+            path = directory / name
+            path.write_bytes(data)
+            written.append(path)
+    return written
+
+
+class SchemaDocument:
+    """An encoded schema with its compressed variants and a strong ETag."""
+
+    def __init__(self, content, content_type, variants):
+        self.content = content
+        self.content_type = content_type
+        self.variants = variants
+        self.etag = hashlib.sha256(content).hexdigest()[:32]
+
+
+@functools.lru_cache(maxsize=None)
+def get_schema_document(fmt):
+    """
+    Load the pregenerated schema from disk, or generate it once per process.
+
+    Memoized, so at most one schema generation happens per worker even when
+    `generate_schema` was not run at deploy time.
+    """
+    filename, content_type, _ = SCHEMA_FORMATS[fmt]
+    path = get_schema_dir() / filename
+    if path.exists():
+        content = path.read_bytes()
+        variants = {}
+        for coding, suffix in CODING_SUFFIXES.items():
+            variant = path.with_name(f'{filename}.{suffix}')
+            if variant.exists():
+                variants[coding] = variant.read_bytes()
+    else:
+        content = generate_schema(fmt)
+        variants = compress(content)
+    return SchemaDocument(content, content_type, variants)
+
+
+@require_safe
+def schema_file_view(request, format):
+    """Serve the schema with strong ETags, compression and long cache lifetimes."""
+    document = get_schema_document(format.lstrip('.'))
+    accepted = accepted_encodings(request)
+    coding = next((c for c in CODING_SUFFIXES if c in document.variants and c in accepted), None)
+
+    # Each representation gets its own strong validator
+    etag = f'"{document.etag}-{coding}"' if coding else f'"{document.etag}"'
+    max_age = getattr(settings, 'OPENAPI_SCHEMA_MAX_AGE', 86400)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(
+            document.variants[coding] if coding else document.content,
+            content_type=document.content_type,
+        )
+        if coding:
+            response['Content-Encoding'] = coding
+    response['ETag'] = etag
+    response['Cache-Control'] = f'public, max-age={max_age}'
+    response['Vary'] = 'Accept-Encoding'
+    return response
@@ -36,11 +36,16 @@ INSTALLED_APPS = [
     'rest_framework',
     'products',
     'cart',
+    'accounts',  # API token authentication
+    'shopping_cart_api',  # Project-level management commands and signals
     'drf_yasg',  # For Swagger documentation
 ]
 
 # Middleware for handling various request/response tasks
 MIDDLEWARE = [
+    'shopping_cart_api.middleware.PerformanceMiddleware',  # Server-Timing and /metrics (PERF_METRICS=1)
+    'shopping_cart_api.middleware.LoadSheddingMiddleware',  # 503 + Retry-After when saturated (LOAD_SHED_MAX_IN_FLIGHT)
+    'shopping_cart_api.middleware.CompressionMiddleware',  # zstd/br/gzip for dynamic responses
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -48,7 +53,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # For serving static files
+    'shopping_cart_api.middleware.AsyncWhiteNoiseMiddleware',  # For serving static files (async-capable WhiteNoise)
 ]
 
 ROOT_URLCONF = 'shopping_cart_api.urls'
@@ -72,13 +77,53 @@ TEMPLATES = [
 WSGI_APPLICATION = 'shopping_cart_api.wsgi.application'
 
 # Database configuration for SQLite (can be changed to another database in production)
+# SQLite tuned for concurrent use: WAL lets readers proceed while a write is in
+# progress, IMMEDIATE transactions take the write lock up front (so the busy
+# timeout applies instead of failing on lock upgrade), and connections persist
+# across requests so the pragmas are applied once per connection. WAL is
+# persistent, so `migrate` sets it once (post_migrate handler in
+# shopping_cart_api.signals) instead of every connection rewriting the file;
+# the pragmas below only last per connection.
+SQLITE_PRAGMAS = (
+    'PRAGMA synchronous=NORMAL;'
+    'PRAGMA mmap_size=268435456;'
+    'PRAGMA cache_size=-65536;'
+    'PRAGMA temp_store=MEMORY;'
+)
+SQLITE_BUSY_TIMEOUT = 20  # seconds
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': SQLITE_PRAGMAS,
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': SQLITE_BUSY_TIMEOUT,
+        },
+    },
+    # Read-only connection to the same file, used by ReadWriteRouter
+    'read': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': SQLITE_PRAGMAS + 'PRAGMA query_only=ON;',
+            'timeout': SQLITE_BUSY_TIMEOUT,
+        },
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+# Route catalogue reads to the `read` connection (DATABASE_READ_ROUTING=1)
+DATABASE_ROUTERS = (
+    ['shopping_cart_api.routers.ReadWriteRouter']
+    if os.environ.get('DATABASE_READ_ROUTING') == '1' else []
+)
+
 # Password validation settings
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -115,7 +160,139 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',  # By default, any user can access
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'accounts.authentication.TokenAuthentication',  # Tokens from POST /api/auth/token/
         'rest_framework.authentication.SessionAuthentication',  # For session-based authentication
-        'rest_framework.authentication.BasicAuthentication',  # For basic authentication (useful in development)
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'shopping_cart_api.renderers.FastJSONRenderer',  # orjson, JSONRenderer's output bar float notation
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'shopping_cart_api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'shopping_cart_api.throttling.TokenBucketThrottle',  # Per view `throttle_scope` (THROTTLE=1)
+    ],
+    # Reverse proxies in front of the app. Clients are identified by the
+    # address the last of them saw in X-Forwarded-For; with none, by
+    # REMOTE_ADDR, so a client cannot pick its own identity with the header.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES') or 0),
 }
+
+# Product catalogue pagination (keyset on name, id)
+PRODUCTS_PAGE_SIZE = 50
+PRODUCTS_MAX_PAGE_SIZE = 200
+
+# Catalogue response cache. Responses are cached per process (LocMemCache
+# evicts least-recently-used entries once MAX_ENTRIES is reached) under the
+# catalogue version, which lives in the 'shared' cache: a SQLite file every
+# worker process on the host opens, so a write in any worker invalidates the
+# responses cached by all of them. SHARED_CACHE_DB can point it at a tmpfs.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'products': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'products',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+    'shared': {
+        'BACKEND': 'shopping_cart_api.sqlite_cache.SQLiteCache',
+        'LOCATION': os.environ.get('SHARED_CACHE_DB') or BASE_DIR / 'cache.sqlite3',
+        'TIMEOUT': None,
+    },
+}
+PRODUCTS_CACHE_ALIAS = 'products'
+PRODUCTS_VERSION_CACHE_ALIAS = 'shared'
+PRODUCTS_CACHE_TIMEOUT = 300
+
+# Default number of ranges in the GET /api/products/facets/ price histogram
+PRODUCTS_FACET_PRICE_BUCKETS = 10
+
+# Maximum number of operations accepted by POST /api/cart/batch/
+CART_BATCH_MAX_OPERATIONS = 500
+
+# Rows validated and upserted per transaction by the bulk product import
+PRODUCTS_IMPORT_CHUNK_SIZE = 1000
+
+# Stock adjustments accepted by POST /api/products/inventory/, and applied per
+# transaction (one conditional UPDATE each) by it and `manage.py adjust_stock`
+PRODUCTS_INVENTORY_MAX_ADJUSTMENTS = 10000
+PRODUCTS_INVENTORY_CHUNK_SIZE = 1000
+
+# Pregenerated OpenAPI schema, written at deploy time by `manage.py generate_schema`.
+# Without it the schema is generated once per process on first request.
+OPENAPI_SCHEMA_DIR = BASE_DIR / 'openapi'
+OPENAPI_SCHEMA_MAX_AGE = 86400
+SWAGGER_SETTINGS = {
+    'SPEC_URL': '/swagger.json',
+    'SECURITY_DEFINITIONS': {
+        'Basic': {'type': 'basic'},
+        'Token': {'type': 'apiKey', 'name': 'Authorization', 'in': 'header'},
+    },
+}
+REDOC_SETTINGS = {'SPEC_URL': '/swagger.json'}
+
+# Serve product list/detail and cart list from native async views. Enable when
+# running under an ASGI server (uvicorn shopping_cart_api.asgi:application);
+# under WSGI the sync views are faster.
+ASYNC_API_VIEWS = os.environ.get('ASYNC_API_VIEWS') == '1'
+
+# Per-request timing middleware and the Prometheus /metrics endpoint. With
+# several worker processes, point PERF_METRICS_DIR at a directory they share;
+# each worker writes its aggregates there at most every FLUSH_INTERVAL seconds.
+PERF_METRICS_ENABLED = os.environ.get('PERF_METRICS') == '1'
+PERF_METRICS_DIR = os.environ.get('PERF_METRICS_DIR') or None
+PERF_METRICS_FLUSH_INTERVAL = 1.0
+
+# API tokens. Basic authentication is only accepted by POST /api/auth/token/,
+# so the password hash is checked once per token rather than once per request.
+# Verified tokens are trusted for AUTH_TOKEN_CACHE_TTL seconds without a
+# database lookup, which bounds how long other processes accept a revoked one.
+AUTH_TOKEN_TTL = 60 * 60 * 24
+AUTH_TOKEN_CACHE_TTL = 60
+AUTH_TOKEN_CACHE_SIZE = 10000
+
+# Dynamic response compression (CompressionMiddleware). Smaller responses are
+# not worth the CPU; zstd and br are offered when their packages are installed.
+# Only API types: HTML pages (admin, browsable API) carry CSRF tokens next to
+# reflected input, which compression would expose to BREACH.
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_CONTENT_TYPES = (
+    'application/json',
+    'application/x-ndjson',
+    'application/yaml',
+    'text/csv',
+)
+
+# Abandoned carts. Lines untouched for CART_EXPIRY seconds are deleted by
+# `manage.py purge_carts`, CART_PURGE_BATCH_SIZE rows per transaction so live
+# writes wait at most one short batch for the SQLite lock. Set
+# CART_PURGE_INTERVAL (seconds) to also purge from a thread in each server process.
+CART_EXPIRY = 60 * 60 * 24 * 30
+CART_PURGE_BATCH_SIZE = 1000
+CART_PURGE_PAUSE = 0.01
+CART_PURGE_INTERVAL = int(os.environ.get('CART_PURGE_INTERVAL') or 0) or None
+
+# Token-bucket throttling (429 + Retry-After), per view scope and per user or
+# client IP. Buckets are kept in THROTTLE_DB, a SQLite file every worker
+# process on the host shares; /dev/shm keeps it in memory. Rates are
+# 'num/period': bursts of up to num requests, refilled at num per period.
+THROTTLE_ENABLED = os.environ.get('THROTTLE') == '1'
+THROTTLE_DB = os.environ.get('THROTTLE_DB') or BASE_DIR / 'throttle.sqlite3'
+THROTTLE_RATES = {
+    'catalogue': '600/min',
+    'cart': '300/min',
+    'auth': '10/min',  # Per IP, counted before the password is checked
+}
+
+# Load shedding. Once a process is serving LOAD_SHED_MAX_IN_FLIGHT requests,
+# further ones get 503 with Retry-After at once instead of queueing. Size it
+# to the worker's threads (gthread) or its event loop's comfortable
+# concurrency (ASGI); a sync worker only ever serves one request.
+LOAD_SHED_MAX_IN_FLIGHT = int(os.environ.get('LOAD_SHED_MAX_IN_FLIGHT') or 0) or None
+LOAD_SHED_RETRY_AFTER = 1
+LOAD_SHED_EXEMPT_PATHS = ('/metrics',)
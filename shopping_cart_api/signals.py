@@ -0,0 +1,17 @@
+from django.db import connections
+
+
+def enable_wal(sender, using, **kwargs):
+    """
+    Switch an SQLite database to WAL journaling after migrate.
+
+    WAL is a persistent property of the database file, so it is set once
+    here rather than by every connection (which would rewrite the file's
+    header even for read-only commands). It cannot change inside a
+    transaction, which is why this is not a migration. Runs after each
+    app's migrations; once the file is in WAL mode the pragma does nothing.
+    """
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode=WAL')
@@ -0,0 +1,124 @@
+"""
+A Django cache backend in a SQLite file that every process on the host shares.
+
+Meant for small, hot state that all gunicorn workers must agree on, such as
+the catalogue version: a read is one primary-key SELECT, and `incr()` is a
+single UPDATE, so concurrent workers never lose an increment. Integers are
+stored as SQLite integers (which is what makes `incr()` atomic), anything
+else pickled. Put LOCATION on a tmpfs such as /dev/shm to keep it off the
+disk; the contents are a cache and may be lost.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = str(location)
+        self.local = threading.local()
+
+    def connection(self):
+        # A connection inherited across fork() must not be used by the child
+        if getattr(self.local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entry '
+                '(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL) WITHOUT ROWID'
+            )
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return self.local.conn
+
+    def encode(self, value):
+        return value if type(value) is int else pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def decode(self, value):
+        return value if isinstance(value, int) else pickle.loads(value)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self.connection().execute(
+            'INSERT INTO cache_entry (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires '
+            'WHERE expires IS NOT NULL AND expires <= ?',
+            (key, self.encode(value), self.get_backend_timeout(timeout), time.time()),
+        )
+        if cursor.rowcount:
+            self.cull()
+        return bool(cursor.rowcount)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self.connection().execute(
+            'SELECT value FROM cache_entry WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone()
+        return default if row is None else self.decode(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self.connection().execute(
+            'INSERT OR REPLACE INTO cache_entry (key, value, expires) VALUES (?, ?, ?)',
+            (key, self.encode(value), self.get_backend_timeout(timeout)),
+        )
+        self.cull()
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self.connection().execute(
+            'UPDATE cache_entry SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time()),
+        )
+        return bool(cursor.rowcount)
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return bool(self.connection().execute('DELETE FROM cache_entry WHERE key = ?', (key,)).rowcount)
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self.connection().execute(
+            'SELECT 1 FROM cache_entry WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone() is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self.connection().execute(
+            "UPDATE cache_entry SET value = value + ? "
+            "WHERE key = ? AND typeof(value) = 'integer' AND (expires IS NULL OR expires > ?) "
+            "RETURNING value",
+            (delta, key, time.time()),
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"Key '{key}' not found")
+        return row[0]
+
+    def clear(self):
+        self.connection().execute('DELETE FROM cache_entry')
+
+    def cull(self):
+        """Once over MAX_ENTRIES, drop expired entries, then 1/CULL_FREQUENCY of the rest."""
+        conn = self.connection()
+        (count,) = conn.execute('SELECT count(*) FROM cache_entry').fetchone()
+        if count <= self._max_entries:
+            return
+        conn.execute('DELETE FROM cache_entry WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+        (count,) = conn.execute('SELECT count(*) FROM cache_entry').fetchone()
+        if count > self._max_entries:
+            if self._cull_frequency == 0:
+                self.clear()
+            else:
+                conn.execute(
+                    'DELETE FROM cache_entry WHERE key IN '
+                    '(SELECT key FROM cache_entry ORDER BY key LIMIT ?)',
+                    (count // self._cull_frequency,),
+                )
@@ -0,0 +1,551 @@
+import base64
+import datetime
+import gzip
+import io
+import json
+import os
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import CommandError, call_command
+from django.db import connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.urls import get_resolver, resolve
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from cart.models import CartItem
+from products.models import Product
+from . import signals
+from .bench import SCENARIOS
+from .management.commands.startup_report import parse_importtime
+from .metrics import clear_worker_files, collect, install_query_recorder, registry, retire_worker_file
+from .middleware import LoadSheddingMiddleware
+from .parsers import FastJSONParser
+from .renderers import FastJSONRenderer
+from .routers import ReadWriteRouter
+from .schema import get_schema_document, write_schema_files
+from .sqlite_cache import SQLiteCache
+from .throttling import BucketStore, buckets
+from .warmup import iter_routes, sample_path, warm_up
+
+
+class SchemaTests(APITestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.schema_dir = Path(self.tmp.name)
+        override = override_settings(OPENAPI_SCHEMA_DIR=self.schema_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        get_schema_document.cache_clear()
+        self.addCleanup(get_schema_document.cache_clear)
+
+    def test_serves_pregenerated_file(self):
+        """Test that /swagger.json serves the file written by generate_schema"""
+        write_schema_files(self.schema_dir)
+        marker = json.loads((self.schema_dir / 'swagger.json').read_text())
+        marker['info']['title'] = 'Pregenerated'
+        (self.schema_dir / 'swagger.json').write_text(json.dumps(marker))
+        response = self.client.get('/swagger.json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['info']['title'], 'Pregenerated')
+        self.assertIn('max-age=', response['Cache-Control'])
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_falls_back_to_memoized_generation(self):
+        """Test that the schema is generated once per process when no file exists"""
+        response = self.client.get('/swagger.json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('/products/', json.loads(response.content)['paths'])
+        self.assertIs(get_schema_document('json'), get_schema_document('json'))
+        self.assertEqual(get_schema_document.cache_info().misses, 1)
+
+    def test_gzip_variant_and_conditional_get(self):
+        """Test compressed responses and 304s with per-encoding strong ETags"""
+        plain = self.client.get('/swagger.json')
+        compressed = self.client.get('/swagger.json', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        self.assertNotEqual(plain['ETag'], compressed['ETag'])
+        self.assertFalse(plain['ETag'].startswith('W/'))
+
+        response = self.client.get('/swagger.json', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=compressed['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        response = self.client.get('/swagger.json', HTTP_ACCEPT_ENCODING='gzip;q=0', HTTP_IF_NONE_MATCH=compressed['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_yaml_schema(self):
+        response = self.client.get('/swagger.yaml')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('application/yaml'))
+        self.assertEqual(self.client.post('/swagger.json').status_code, 405)
+
+
+class DatabaseTuningTests(TransactionTestCase):
+    databases = {'default', 'read'}
+
+    def pragma(self, alias, name):
+        with connections[alias].cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_on_connect(self):
+        self.assertEqual(self.pragma('default', 'synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma('default', 'temp_store'), 2)  # MEMORY
+        self.assertEqual(self.pragma('default', 'query_only'), 0)
+        self.assertEqual(self.pragma('read', 'query_only'), 1)
+
+    def test_wal_is_set_by_migrate_not_by_every_connection(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        default = connections['default']
+        wrapper = type(default)({**default.settings_dict, 'NAME': str(Path(tmp.name) / 'db.sqlite3')}, alias='wal')
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone()[0], 'delete')
+        connections['wal'] = wrapper
+        self.addCleanup(connections.__delitem__, 'wal')
+        signals.enable_wal(sender=apps.get_app_config('products'), using='wal')
+        with wrapper.cursor() as cursor:
+            self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+
+    def test_router_sends_catalogue_reads_to_read_connection(self):
+        router = ReadWriteRouter()
+        self.assertEqual(router.db_for_read(Product), 'read')
+        self.assertEqual(router.db_for_read(CartItem), 'default')
+        self.assertEqual(router.db_for_write(Product), 'default')
+        with transaction.atomic():
+            # Reads inside a write transaction must see its uncommitted rows
+            self.assertEqual(router.db_for_read(Product), 'default')
+        self.assertTrue(router.allow_migrate('default', 'products'))
+        self.assertFalse(router.allow_migrate('read', 'products'))
+
+
+class BenchCommandTests(APITestCase):
+    def run_bench(self, *args):
+        output = Path(tempfile.mkdtemp()) / 'bench.json'
+        self.addCleanup(output.unlink, missing_ok=True)
+        call_command('bench', '--products', '40', '--cart-items', '10', '--requests', '3',
+                     '--output', str(output), *args, stdout=io.StringIO())
+        return json.loads(output.read_text()), output
+
+    def test_drives_every_scenario_and_rolls_back(self):
+        results, _ = self.run_bench()
+        self.assertEqual(set(results['endpoints']), {scenario.name for scenario in SCENARIOS})
+        for name, metrics in results['endpoints'].items():
+            self.assertFalse([code for code in metrics['status_codes'] if code.startswith('5')], name)
+            self.assertLessEqual(metrics['p50_ms'], metrics['p99_ms'])
+        self.assertEqual(results['endpoints']['products:detail']['queries_per_request'], 1)
+        self.assertEqual(results['endpoints']['cart:detail']['status_codes'], {'200': 3})
+        self.assertEqual(results['endpoints']['auth:revoke']['status_codes'], {'204': 3})
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_scenarios_cover_every_route(self):
+        def state():
+            return {'products': [1], 'deletable': [1], 'cart_items': [1], 'tokens': ['t'], 'revocable': ['t'],
+                    'etags': {'product': '', 'cart': ''}, 'basic': ''}
+
+        requested = {resolve(scenario.build(0, state())[0]).url_name for scenario in SCENARIOS}
+        routes = {pattern.name for pattern, route in iter_routes(get_resolver()) if route and not route.startswith('admin/')}
+        self.assertLessEqual(routes, requested)
+
+    def test_rejects_seeds_too_small_for_every_scenario(self):
+        with self.assertRaisesMessage(CommandError, '--products must be at least 20'):
+            self.run_bench('--products', '5')
+        with self.assertRaisesMessage(CommandError, '--cart-items must be at least 1'):
+            call_command('bench', '--products', '40', '--cart-items', '0', stdout=io.StringIO())
+
+    def test_smallest_seed_runs_every_scenario(self):
+        results, _ = self.run_bench('--products', '20', '--cart-items', '1')
+        self.assertEqual(set(results['endpoints']), {scenario.name for scenario in SCENARIOS})
+        self.assertEqual(results['endpoints']['products:delete']['requests'], 2)
+        self.assertEqual(results['endpoints']['cart:delete']['requests'], 1)
+        self.assertEqual(results['endpoints']['cart:checkout']['status_codes'], {'201': 3})
+
+    def test_compare_fails_when_budget_exceeded(self):
+        _, baseline = self.run_bench('--only', 'products:detail')
+        budget = json.loads(baseline.read_text())
+        budget['endpoints']['products:detail'].update(queries_per_request=0, p95_ms=10000, p99_ms=10000)
+        baseline.write_text(json.dumps(budget))
+        with self.assertRaisesMessage(CommandError, 'queries_per_request 1 exceeds budget 0'):
+            self.run_bench('--only', 'products:detail', '--compare', str(baseline))
+
+
+@override_settings(PERF_METRICS_ENABLED=True, PERF_METRICS_DIR=None)
+class PerformanceMetricsTests(APITestCase):
+    def setUp(self):
+        registry.clear()
+        self.addCleanup(registry.clear)
+        Product.objects.create(
+            name="Metered",
+            category="Cat",
+            price=1,
+            image_thumbnail="http://example.com/thumbnail.jpg",
+            image_mobile="http://example.com/mobile.jpg",
+            image_tablet="http://example.com/tablet.jpg",
+            image_desktop="http://example.com/desktop.jpg",
+        )
+
+    def tmp_dir(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        return tmp.name
+
+    def test_server_timing_header(self):
+        response = self.client.get('/api/products/', {'page_size': 5})
+        header = response['Server-Timing']
+        for metric in ('db;dur=', 'view;dur=', 'render;dur=', 'total;dur='):
+            self.assertIn(metric, header)
+        self.assertIn('desc="1 queries"', header)
+
+    def test_metrics_aggregate_per_url_name(self):
+        self.client.get('/api/products/')
+        self.client.get('/api/products/')
+        self.client.get('/api/cart/')
+        self.client.get('/no-such-page/')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('http_requests_total{route="product-list-create",method="GET",status="200"} 2', body)
+        self.assertIn('http_requests_total{route="cart-list-create",method="GET",status="200"} 1', body)
+        self.assertIn('http_requests_total{route="unmatched",method="GET",status="404"} 1', body)
+        self.assertIn('http_request_duration_seconds_bucket{route="product-list-create",method="GET",le="+Inf"} 2', body)
+        self.assertIn('http_request_db_queries_total{route="product-list-create",method="GET"} 1', body)
+
+    def test_unknown_methods_share_one_label(self):
+        for method in ('BREW', 'X"}\nfake 1', 'PROPFIND'):
+            self.client.generic(method, '/api/products/')
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('http_requests_total{route="product-list-create",method="other",status="405"} 3', body)
+        self.assertNotIn('fake', body)
+
+    def test_metrics_merge_worker_files(self):
+        directory = Path(self.tmp_dir())
+        with override_settings(PERF_METRICS_DIR=str(directory)):
+            self.client.get('/api/products/')
+            other = registry.snapshot()
+            (directory / '999999.json').write_text(json.dumps(other))
+            body = self.client.get('/metrics').content.decode()
+        self.assertIn('http_requests_total{route="product-list-create",method="GET",status="200"} 2', body)
+        self.assertTrue((directory / f'{os.getpid()}.json').exists())
+
+    async def test_async_stack_records_queries(self):
+        # The test connection was opened before the async handler loaded the middleware
+        await sync_to_async(lambda: install_query_recorder(connections['default']))()
+        product = await Product.objects.aget()
+        response = await self.async_client.get(f'/api/products/{product.pk}/')
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+        self.assertIn('render;dur=', response['Server-Timing'])
+
+    def test_exited_workers_stay_counted_until_restart(self):
+        directory = Path(self.tmp_dir())
+        with override_settings(PERF_METRICS_DIR=str(directory)):
+            self.client.get('/api/products/')
+            registry.flush(directory, force=True)
+            (directory / '999999.json').write_text(json.dumps(registry.snapshot()))
+            retire_worker_file(directory, 999999)
+            self.assertFalse((directory / '999999.json').exists())
+            self.assertEqual(collect()['product-list-create GET']['duration']['count'], 2)
+            clear_worker_files(directory)
+            self.assertFalse(list(directory.iterdir()))
+
+    @override_settings(PERF_METRICS_ENABLED=False)
+    def test_disabled_adds_nothing(self):
+        response = self.client.get('/api/products/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+
+class FastJSONTests(SimpleTestCase):
+    def test_output_matches_stock_renderer(self):
+        data = {
+            'price': Decimal('19.99'),
+            'when': datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+            'day': datetime.date(2024, 5, 1),
+            'label': gettext_lazy("Products"),
+            'text': "caf\u00e9 \u2028 \u2029 \"quoted\"",
+            'nested': [{1: None, 'ok': True, 'ratio': 0.5}],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indented_output_uses_stock_renderer(self):
+        data = {'a': [1, 2]}
+        rendered = FastJSONRenderer().render(data, 'application/json; indent=4', {})
+        self.assertEqual(rendered, JSONRenderer().render(data, 'application/json; indent=4', {}))
+
+    def test_floats_differ_only_in_notation(self):
+        data = [0.1, -0.0, 1e16, 1e-07, 123456.789, 2.5e-300]
+        rendered = FastJSONRenderer().render(data)
+        self.assertEqual(rendered, b'[0.1,-0.0,1e16,1e-7,123456.789,2.5e-300]')
+        self.assertEqual(json.loads(rendered), json.loads(JSONRenderer().render(data)))
+        self.assertEqual(FastJSONRenderer().render([float('nan'), float('inf')]), b'[null,null]')
+
+    def test_decimals_and_wide_integers_match_stock_renderer(self):
+        data = {'prices': [Decimal('0.10'), Decimal('1E+2'), Decimal('-19.999')], 'ids': [2 ** 63 - 1, -(2 ** 63)]}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        data = {'big': 2 ** 64, 'huge': -(10 ** 30)}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_parser(self):
+        parser = FastJSONParser()
+        self.assertEqual(parser.parse(io.BytesIO(b'{"quantity": 2, "price": 1.5}')), {'quantity': 2, 'price': 1.5})
+        for body in (b'{"quantity": ', b'{"x": NaN}', b'{"x": Infinity}'):
+            with self.assertRaises(ParseError):
+                parser.parse(io.BytesIO(body))
+
+    def test_parser_keeps_wide_integers_and_floats_exact(self):
+        parser = FastJSONParser()
+        body = b'{"id": 123456789012345678901234567890, "max": 18446744073709551616, "ratio": 1e16, "small": 1e-7}'
+        self.assertEqual(parser.parse(io.BytesIO(body)), json.loads(body))
+        self.assertIsInstance(parser.parse(io.BytesIO(body))['id'], int)
+        # Lone surrogate escapes are rejected by orjson but accepted by the stock parser
+        self.assertEqual(parser.parse(io.BytesIO(b'{"s": "\\ud800"}')), {'s': '\ud800'})
+
+
+class CompressionTests(APITestCase):
+    def setUp(self):
+        Product.objects.bulk_create(
+            Product(
+                name=f"Compressed {i}",
+                category="Cat",
+                price=1,
+                image_thumbnail=f"http://example.com/{i}/thumbnail.jpg",
+                image_mobile=f"http://example.com/{i}/mobile.jpg",
+                image_tablet=f"http://example.com/{i}/tablet.jpg",
+                image_desktop=f"http://example.com/{i}/desktop.jpg",
+            )
+            for i in range(50)
+        )
+
+    def test_large_json_is_compressed(self):
+        plain = self.client.get('/api/products/')
+        response = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertLess(len(response.content), len(plain.content) / 4)
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    def test_small_refused_and_precompressed_responses_are_untouched(self):
+        product = Product.objects.first()
+        response = self.client.get(f'/api/products/{product.pk}/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+        response = self.client.get('/api/products/', HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertNotIn('Content-Encoding', response)
+        # The schema view serves its own pregenerated gzip variant
+        response = self.client.get('/swagger.json', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(b'"swagger"', gzip.decompress(response.content))
+
+    def test_html_pages_are_not_compressed(self):
+        # They carry CSRF tokens next to reflected input (BREACH)
+        response = self.client.get('/api/products/', HTTP_ACCEPT='text/html', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+        self.assertGreater(len(response.content), 1024)
+        self.assertNotIn('Content-Encoding', response)
+        response = self.client.get('/admin/login/', {'next': '/admin/?q=secret'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_streaming_export_is_compressed(self):
+        admin = User.objects.create_superuser(username="exporter", password=None)
+        self.client.force_authenticate(user=admin)
+        response = self.client.get('/api/products/export/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        lines = gzip.decompress(b''.join(response.streaming_content)).splitlines()
+        self.assertEqual(len(lines), 50)
+
+
+@override_settings(
+    THROTTLE_ENABLED=True,
+    THROTTLE_RATES={'catalogue': '2/min', 'cart': '2/min', 'auth': '2/min'},
+)
+class ThrottlingTests(APITestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = override_settings(THROTTLE_DB=Path(tmp.name) / 'throttle.sqlite3')
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user(username="throttled", password="throttled-pass")
+
+    def test_bucket_bursts_then_refills_at_the_rate(self):
+        for _ in range(3):
+            self.assertEqual(buckets.take('key', 3, 0.5, now=100), 0)
+        self.assertAlmostEqual(buckets.take('key', 3, 0.5, now=100), 2)
+        self.assertAlmostEqual(buckets.take('key', 3, 0.5, now=101), 1)
+        self.assertEqual(buckets.take('key', 3, 0.5, now=102), 0)
+        # Idle time refills no further than the capacity
+        for _ in range(3):
+            self.assertEqual(buckets.take('key', 3, 0.5, now=1000), 0)
+        self.assertGreater(buckets.take('key', 3, 0.5, now=1000), 0)
+
+    def test_buckets_are_shared_through_the_file(self):
+        other_process = BucketStore()
+        self.assertEqual(buckets.take('key', 1, 1, now=100), 0)
+        self.assertGreater(other_process.take('key', 1, 1, now=100), 0)
+
+    def test_prune_forgets_refilled_buckets(self):
+        buckets.take('old', 2, 2 / 60, now=100)
+        buckets.take('new', 2, 2 / 60, now=200)
+        buckets.prune(now=200)
+        keys = [row[0] for row in buckets.connection().execute('SELECT key FROM throttle_bucket')]
+        self.assertEqual(keys, ['new'])
+
+    def test_catalogue_is_throttled_per_ip_with_retry_after(self):
+        for _ in range(2):
+            self.assertEqual(self.client.get('/api/products/').status_code, 200)
+        response = self.client.get('/api/products/')
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(1 <= int(response['Retry-After']) <= 30)
+        # Other clients and other scopes have buckets of their own
+        self.assertEqual(self.client.get('/api/products/', REMOTE_ADDR='10.0.0.2').status_code, 200)
+        self.assertEqual(self.client.get('/api/cart/').status_code, 200)
+
+    def test_spoofed_forwarded_for_does_not_reset_the_bucket(self):
+        for i in range(2):
+            self.client.get('/api/products/', HTTP_X_FORWARDED_FOR=f'203.0.113.{i}')
+        response = self.client.get('/api/products/', HTTP_X_FORWARDED_FOR='203.0.113.99')
+        self.assertEqual(response.status_code, 429)
+        (count,) = buckets.connection().execute('SELECT count(*) FROM throttle_bucket').fetchone()
+        self.assertEqual(count, 1)
+
+    def test_forwarded_for_is_trusted_behind_configured_proxies(self):
+        rest_framework = {**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}
+        with override_settings(REST_FRAMEWORK=rest_framework):
+            for i in range(2):
+                self.client.get('/api/products/', HTTP_X_FORWARDED_FOR=f'203.0.113.{i}')
+                self.client.get('/api/products/', HTTP_X_FORWARDED_FOR=f'203.0.113.{i}')
+            response = self.client.get('/api/products/', HTTP_X_FORWARDED_FOR='198.51.100.7, 203.0.113.1')
+            self.assertEqual(response.status_code, 429)
+
+    def test_users_are_throttled_separately_from_their_ip(self):
+        for _ in range(2):
+            self.client.get('/api/cart/')
+        self.assertEqual(self.client.get('/api/cart/').status_code, 429)
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get('/api/cart/').status_code, 200)
+
+    def test_failed_passwords_are_throttled_before_checking(self):
+        wrong = base64.b64encode(b"throttled:wrong").decode()
+        right = base64.b64encode(b"throttled:throttled-pass").decode()
+        for _ in range(2):
+            response = self.client.post('/api/auth/token/', HTTP_AUTHORIZATION=f"Basic {wrong}")
+            self.assertEqual(response.status_code, 401)
+        response = self.client.post('/api/auth/token/', HTTP_AUTHORIZATION=f"Basic {right}")
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    @override_settings(THROTTLE_ENABLED=False)
+    def test_disabled_throttles_nothing(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get('/api/products/').status_code, 200)
+
+
+class LoadSheddingTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    @override_settings(LOAD_SHED_MAX_IN_FLIGHT=1, LOAD_SHED_RETRY_AFTER=2, LOAD_SHED_EXEMPT_PATHS=('/metrics',))
+    def test_sheds_requests_beyond_the_limit(self):
+        seen = {}
+
+        def get_response(request):
+            if request.path == '/api/cart/':
+                # Arrive while the outer request is still being served
+                seen['busy'] = middleware(self.factory.get('/api/products/'))
+                seen['exempt'] = middleware(self.factory.get('/metrics'))
+            return HttpResponse("ok")
+
+        middleware = LoadSheddingMiddleware(get_response)
+        self.assertEqual(middleware(self.factory.get('/api/cart/')).status_code, 200)
+        self.assertEqual(seen['busy'].status_code, 503)
+        self.assertEqual(seen['busy']['Retry-After'], '2')
+        self.assertEqual(seen['exempt'].status_code, 200)
+        self.assertEqual(middleware.in_flight, 0)
+
+    @override_settings(LOAD_SHED_MAX_IN_FLIGHT=None)
+    def test_disabled_without_a_limit(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            LoadSheddingMiddleware(lambda request: HttpResponse())
+
+
+class WarmupTests(SimpleTestCase):
+    def setUp(self):
+        get_schema_document.cache_clear()
+        self.addCleanup(get_schema_document.cache_clear)
+
+    def test_warm_up_before_fork_stays_off_the_database(self):
+        # SimpleTestCase refuses database queries
+        timings = warm_up(connect=False)
+        self.assertEqual(list(timings), ['urls', 'serializers', 'schema'])
+        self.assertGreater(timings['urls'][1], 20)
+        self.assertEqual(get_schema_document.cache_info().currsize, 2)
+
+    def test_every_api_route_gets_a_resolvable_sample(self):
+        routes = {pattern.name: route for pattern, route in iter_routes(get_resolver()) if route is not None}
+        self.assertEqual(sample_path(routes['product-detail']), '/api/products/1/')
+        for name in ('product-list-create', 'cart-detail', 'token-issue', 'metrics'):
+            self.assertEqual(resolve(sample_path(routes[name])).url_name, name)
+
+    def test_import_times_are_summed_per_package(self):
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       100 |        100 |   django.utils\n"
+            "import time:       250 |        350 | django\n"
+            "import time:      1000 |       1000 | rest_framework.fields\n"
+        )
+        self.assertEqual(parse_importtime(output), {'django': 350e-6, 'rest_framework': 1000e-6})
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / 'cache.sqlite3'
+        self.cache = SQLiteCache(self.path, {})
+
+    def test_entries_are_shared_between_instances(self):
+        other = SQLiteCache(self.path, {})
+        self.cache.set('obj', {'a': [1, Decimal('2.50')]})
+        self.assertEqual(other.get('obj'), {'a': [1, Decimal('2.50')]})
+        self.assertTrue(self.cache.add('counter', 10))
+        self.assertFalse(other.add('counter', 99))
+        self.assertEqual(other.incr('counter'), 11)
+        self.assertEqual(self.cache.get('counter'), 11)
+        self.assertIs(self.cache.get_or_set('flag', True), True)
+        with self.assertRaises(ValueError):
+            other.incr('obj')
+        with self.assertRaises(ValueError):
+            other.incr('missing')
+        self.assertTrue(other.delete('obj'))
+        self.assertIsNone(self.cache.get('obj'))
+
+    def test_expired_entries_are_gone_and_can_be_added_again(self):
+        self.cache.set('short', 1, timeout=-1)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertFalse(self.cache.has_key('short'))
+        self.assertTrue(self.cache.add('short', 2, timeout=None))
+        self.assertEqual(self.cache.get('short'), 2)
+
+    def test_culls_beyond_max_entries(self):
+        cache = SQLiteCache(self.path, {'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2}})
+        for i in range(30):
+            cache.set(f'key-{i}', i)
+        (count,) = cache.connection().execute('SELECT count(*) FROM cache_entry').fetchone()
+        self.assertLessEqual(count, 11)
+        self.assertEqual(cache.get('key-29'), 29)
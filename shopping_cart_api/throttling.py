@@ -0,0 +1,133 @@
+"""
+Token-bucket throttling with state shared by every worker process.
+
+Each (view scope, client) pair owns a bucket holding up to `num` tokens that
+refills at `num` per period, so a client may burst up to the whole allowance
+and is then held to the average rate. Buckets live in a small SQLite file
+(THROTTLE_DB) that all gunicorn workers on the host open; a request costs one
+UPSERT that refills, checks and takes a token atomically, so concurrent
+workers cannot both spend the last one. Put the file on a tmpfs such as
+/dev/shm to keep it off the disk; losing it only forgets who was throttled.
+"""
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Refill, then take a token only if a whole one is available. RETURNING
+# yields no row when the WHERE clause leaves the bucket untouched.
+TAKE = """
+    INSERT INTO throttle_bucket (key, tokens, stamp) VALUES (:key, :capacity - 1, :now)
+    ON CONFLICT (key) DO UPDATE SET
+        tokens = min(:capacity, tokens + max(:now - stamp, 0) * :rate) - 1,
+        stamp = max(:now, stamp)
+    WHERE min(:capacity, tokens + max(:now - stamp, 0) * :rate) >= 1
+    RETURNING tokens
+"""
+
+
+def parse_rate(rate):
+    """Return `(capacity, tokens_per_second)` for a DRF-style rate such as '100/min', or None."""
+    if rate is None:
+        return None
+    num, period = rate.split('/')
+    capacity = int(num)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+class BucketStore:
+    """Token buckets in a SQLite file, with one connection per thread and process."""
+
+    # Roughly one take in PRUNE_EVERY also deletes buckets that have refilled
+    PRUNE_EVERY = 1000
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def connection(self):
+        path = str(getattr(settings, 'THROTTLE_DB', ':memory:'))
+        # A connection inherited across fork() must not be used by the child
+        if getattr(self.local, 'key', None) != (os.getpid(), path):
+            conn = sqlite3.connect(path, timeout=1, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS throttle_bucket '
+                '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, stamp REAL NOT NULL) WITHOUT ROWID'
+            )
+            self.local.conn = conn
+            self.local.key = (os.getpid(), path)
+        return self.local.conn
+
+    def take(self, key, capacity, rate, now=None):
+        """Take a token from `key`'s bucket; return 0 if one was taken, else the seconds until one is."""
+        now = time.time() if now is None else now
+        conn = self.connection()
+        params = {'key': key, 'capacity': capacity, 'rate': rate, 'now': now}
+        if conn.execute(TAKE, params).fetchone() is not None:
+            if random.randrange(self.PRUNE_EVERY) == 0:
+                self.prune(now)
+            return 0
+        tokens, stamp = conn.execute('SELECT tokens, stamp FROM throttle_bucket WHERE key = ?', (key,)).fetchone()
+        available = min(capacity, tokens + max(now - stamp, 0) * rate)
+        return (1 - available) / rate
+
+    def prune(self, now=None):
+        """Delete buckets idle long enough to have refilled at every configured rate."""
+        rates = [parse_rate(rate) for rate in getattr(settings, 'THROTTLE_RATES', {}).values()]
+        idle = max((capacity / rate for capacity, rate in filter(None, rates)), default=0)
+        now = time.time() if now is None else now
+        self.connection().execute('DELETE FROM throttle_bucket WHERE stamp < ?', (now - idle,))
+
+    def clear(self):
+        self.connection().execute('DELETE FROM throttle_bucket')
+
+
+buckets = BucketStore()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle views that set `throttle_scope` at THROTTLE_RATES[scope].
+
+    Clients are identified by user id once authenticated, and by IP address
+    otherwise or when the view sets `throttle_by_ip` (views that throttle
+    before authenticating). Views without a scope, or whose scope has no
+    rate, are not throttled; nothing is throttled unless THROTTLE_ENABLED.
+    """
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def get_rate(self, view):
+        if not getattr(settings, 'THROTTLE_ENABLED', False):
+            return None
+        scope = getattr(view, 'throttle_scope', None)
+        return parse_rate(getattr(settings, 'THROTTLE_RATES', {}).get(scope))
+
+    def is_active(self, view):
+        return self.get_rate(view) is not None
+
+    def get_cache_key(self, request, view):
+        if not getattr(view, 'throttle_by_ip', False) and request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        return f'{view.throttle_scope}:{ident}'
+
+    def allow_request(self, request, view):
+        rate = self.get_rate(view)
+        if rate is None:
+            return True
+        capacity, per_second = rate
+        self.wait_seconds = buckets.take(self.get_cache_key(request, view), capacity, per_second)
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
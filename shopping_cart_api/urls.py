@@ -1,31 +1,21 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include, re_path
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
+from .metrics import metrics_view
+from .schema import schema_file_view, schema_view
 from .views import welcome_view
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
 
-# Swagger schema view
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Shopping Cart API",
-        default_version="v1",
-        description="API for managing products and shopping cart.",
-        contact=openapi.Contact(email="fdzikunu@stu.ucc.edu.gh"),
-        license=openapi.License(name="MIT License"),
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
+# The UI pages are tiny shells that fetch the pregenerated /swagger.json
+ui_cache_timeout = getattr(settings, 'OPENAPI_SCHEMA_MAX_AGE', 86400)
 
 urlpatterns = [
     path('', welcome_view),
     path('admin/', admin.site.urls),
     path('api/products/', include('products.urls')),
     path('api/cart/', include('cart.urls')),
-    re_path(r'^swagger(?P<format>\.json|\.yaml)$', schema_view.without_ui(cache_timeout=0), name='schema-json'),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    path('api/auth/', include('accounts.urls')),
+    path('metrics', metrics_view, name='metrics'),
+    re_path(r'^swagger(?P<format>\.json|\.yaml)$', schema_file_view, name='schema-json'),
+    path('swagger/', schema_view.with_ui('swagger', cache_timeout=ui_cache_timeout), name='schema-swagger-ui'),
+    path('redoc/', schema_view.with_ui('redoc', cache_timeout=ui_cache_timeout), name='schema-redoc'),
 ]
@@ -0,0 +1,111 @@
+"""
+Worker warmup: do the work Django and DRF defer to the first requests.
+
+URL resolvers compile their patterns and build reverse maps on first use,
+serializers build their field maps per class on first instantiation, the
+database connection runs its setup pragmas when opened, and the OpenAPI
+schema is loaded (or generated) on first request. `warm_up()` does all of it
+up front; gunicorn.conf.py runs it in the master before forking (so workers
+inherit the result) and in each worker before it accepts traffic.
+"""
+import json
+import re
+import time
+
+from django.db import connections
+from django.urls import URLResolver, get_resolver, resolve
+from django.urls.exceptions import Resolver404
+from django.urls.resolvers import RoutePattern
+
+# Sample values for path converters, used to build a resolvable URL per route
+CONVERTER_SAMPLES = {'int': '1', 'uuid': '00000000-0000-0000-0000-000000000000'}
+PARAMETER = re.compile(r'<(?:(?P<converter>[^>:]+):)?[^>]+>')
+
+
+def iter_routes(resolver, prefix=''):
+    """Yield `(pattern, route)` for every URL pattern; `route` is None below a regex pattern."""
+    # Populates the reverse maps (and imports included URLconfs) on the way
+    resolver.reverse_dict
+    for pattern in resolver.url_patterns:
+        pattern.pattern.regex  # Compiled lazily on first match otherwise
+        route = None
+        if prefix is not None and isinstance(pattern.pattern, RoutePattern):
+            route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            yield from iter_routes(pattern, route)
+        else:
+            pattern.callback
+            yield pattern, route
+
+
+def sample_path(route):
+    return '/' + PARAMETER.sub(lambda match: CONVERTER_SAMPLES.get(match['converter'], 'x'), route)
+
+
+def warm_urls():
+    """Compile every URL pattern and resolve one URL per route; return the number of routes."""
+    routes = 0
+    for pattern, route in iter_routes(get_resolver()):
+        routes += 1
+        if route is not None:
+            try:
+                resolve(sample_path(route))
+            except Resolver404:
+                pass  # A converter rejected the sample value; the pattern is compiled anyway
+    return routes
+
+
+def warm_serializers():
+    from cart.serializers import CartItemSerializer, OrderSerializer
+    from products.serializers import ProductSerializer
+
+    for serializer_class in (ProductSerializer, CartItemSerializer, OrderSerializer):
+        serializer_class().fields
+    return 3
+
+
+def warm_database():
+    """Open every configured connection (running its setup pragmas) and read from it."""
+    from products.models import Product
+
+    for alias in connections:
+        Product.objects.using(alias).exists()
+    return len(connections.all())
+
+
+def warm_schema():
+    from .schema import SCHEMA_FORMATS, get_schema_document
+
+    for fmt in SCHEMA_FORMATS:
+        get_schema_document(fmt)
+    return len(SCHEMA_FORMATS)
+
+
+def warm_up(connect=True):
+    """
+    Run each warmup step; return {step: (seconds, items warmed)}.
+
+    Pass connect=False before fork(): a database connection must not be
+    shared by the processes forked from this one.
+    """
+    steps = [('urls', warm_urls), ('serializers', warm_serializers), ('schema', warm_schema)]
+    if connect:
+        steps.insert(0, ('database', warm_database))
+    timings = {}
+    for name, step in steps:
+        started = time.perf_counter()
+        items = step()
+        timings[name] = (time.perf_counter() - started, items)
+    return timings
+
+
+def boot_report():
+    """Load the WSGI application and warm it up, printing phase timings as JSON (see startup_report)."""
+    started = time.perf_counter()
+    from .wsgi import application  # noqa: F401
+    loaded = time.perf_counter()
+    timings = warm_up()
+    print(json.dumps({
+        'load': loaded - started,
+        'warmup': {name: seconds for name, (seconds, _) in timings.items()},
+    }))